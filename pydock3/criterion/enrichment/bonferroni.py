@@ -1,9 +1,17 @@
+from typing import Dict, List, Optional, Union
 import os
+import re
+import uuid
+import hashlib
 import logging
+import functools
 
+import numpy as np
 import pandas as pd
 
+from pydock3.util import get_cache_dir_path
 from pydock3.criterion.enrichment import __file__ as ENRICHMENT_MODULE_INIT_PATH
+from pydock3.criterion.enrichment.random_classifier import get_monte_carlo_random_classifier_table
 
 #
 logger = logging.getLogger(__name__)
@@ -14,11 +22,128 @@ logger.setLevel(logging.DEBUG)
 ENRICHMENT_MODULE_PATH = os.path.dirname(ENRICHMENT_MODULE_INIT_PATH)
 RANDOM_DATA_DIR_PATH = os.path.join(ENRICHMENT_MODULE_PATH, "random_classifier_probability")
 MAX_TABLE_N_ACTIVES = 100
+RANDOM_CLASSIFIER_TABLE_COLUMN_NAMES = ["normalized_log_auc", "density", "prop", "cumul", "pval"]
+PACKED_TABLES_CACHE_DIR_NAME = "random_classifier_tables"
+PACKED_TABLES_CACHE_VERSION = 1
+
+
+def get_table_file_path(n_actives: int, tables_dir: str = RANDOM_DATA_DIR_PATH) -> str:
+    return os.path.join(tables_dir, f"table_{n_actives}_actives.df")
+
+
+def get_table_n_actives_list(tables_dir: str = RANDOM_DATA_DIR_PATH) -> List[int]:
+    return sorted(
+        int(match.group(1))
+        for match in (re.fullmatch(r"table_([0-9]+)_actives\.df", file_name) for file_name in os.listdir(tables_dir))
+        if match is not None
+    )
+
+
+def read_table_file(n_actives: int, tables_dir: str = RANDOM_DATA_DIR_PATH) -> np.ndarray:
+    return pd.read_csv(get_table_file_path(n_actives, tables_dir), sep=" ")[RANDOM_CLASSIFIER_TABLE_COLUMN_NAMES].to_numpy(dtype=np.float64)
+
+
+def pack_random_classifier_tables(tables_dir: str, packed_tables_file_path: str) -> str:
+    """Packs every `table_{n}_actives.df` file of `tables_dir` into a single array file that can be memory-mapped.
+    Rows are sorted by n_actives; columns are n_actives followed by `RANDOM_CLASSIFIER_TABLE_COLUMN_NAMES`."""
+
+    arrays = []
+    for n_actives in get_table_n_actives_list(tables_dir):
+        table = read_table_file(n_actives, tables_dir)
+        array = np.empty((table.shape[0], 1 + table.shape[1]), dtype=np.float64)
+        array[:, 0] = n_actives
+        array[:, 1:] = table
+        arrays.append(array)
+
+    # write atomically, since other processes may be reading the same cache
+    temp_file_path = f"{packed_tables_file_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_file_path, "wb") as f:
+        np.save(f, np.concatenate(arrays, axis=0))
+    os.replace(temp_file_path, packed_tables_file_path)
+
+    return packed_tables_file_path
+
+
+def get_packed_tables_file_path(tables_dir: str = RANDOM_DATA_DIR_PATH) -> str:
+    """Path of the packed copy of the tables of `tables_dir` in the user cache, keyed by the size & modification time
+    of every table file, so that editing a table invalidates its packed copy."""
+
+    signature = hashlib.sha1(str(PACKED_TABLES_CACHE_VERSION).encode("utf-8"))
+    signature.update(os.path.abspath(tables_dir).encode("utf-8"))
+    for n_actives in get_table_n_actives_list(tables_dir):
+        stat = os.stat(get_table_file_path(n_actives, tables_dir))
+        signature.update(f"{n_actives}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+
+    return os.path.join(get_cache_dir_path(PACKED_TABLES_CACHE_DIR_NAME), f"tables_{signature.hexdigest()}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_packed_tables(tables_dir: str) -> Optional[np.ndarray]:
+    """Packed tables of `tables_dir`, generated from the table files on first use (None if they cannot be cached)."""
+
+    try:
+        packed_tables_file_path = get_packed_tables_file_path(tables_dir)
+        if not os.path.isfile(packed_tables_file_path):
+            pack_random_classifier_tables(tables_dir, packed_tables_file_path)
+        return np.load(packed_tables_file_path, mmap_mode="r")
+    except Exception as e:  # the packed tables are an optimization only
+        logger.debug(f"Failed to load packed random classifier tables of {tables_dir}, reading table files instead: {e}")
+        return None
+
+
+def _load_table(n_actives: int, tables_dir: str) -> np.ndarray:
+    packed_tables = _load_packed_tables(tables_dir)
+    if packed_tables is not None:
+        start, stop = np.searchsorted(packed_tables[:, 0], [n_actives, n_actives + 1])
+        if start < stop:
+            return np.array(packed_tables[start:stop, 1:])
+
+    return read_table_file(n_actives, tables_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def get_random_classifier_performance_arrays(
+        n_actives: int,
+        tables_dir: str = RANDOM_DATA_DIR_PATH,
+        n_decoys: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Same as `get_random_classifier_performance_data` but returns a (read-only) NumPy array per column.
+    Each table is loaded once per process, from a memory-mapped packed copy of the table files of `tables_dir`
+    (generated in the user cache on first use).
+    """
+
+    #
+    if not isinstance(n_actives, int):
+        raise TypeError(f"n_actives must be an integer, not {type(n_actives)}")
+    if n_actives < 1:
+        raise ValueError(f"n_actives must be >= 1, not {n_actives}")
+
+    #
+    if n_actives > MAX_TABLE_N_ACTIVES and n_decoys is not None:
+        table = get_monte_carlo_random_classifier_table(n_actives, n_decoys)
+    else:
+        if n_actives > MAX_TABLE_N_ACTIVES:
+            n_actives_for_calculation = MAX_TABLE_N_ACTIVES
+            logger.warning(f"No table available for {n_actives} actives, reverting to {n_actives_for_calculation} actives for calculation (which is more strict). Supply n_decoys to simulate the table instead.")
+        else:
+            n_actives_for_calculation = n_actives
+        table = _load_table(n_actives_for_calculation, tables_dir)
+
+    #
+    arrays = {}
+    for i, column_name in enumerate(RANDOM_CLASSIFIER_TABLE_COLUMN_NAMES):
+        array = np.ascontiguousarray(table[:, i])
+        array.setflags(write=False)  # shared by every caller
+        arrays[column_name] = array
+
+    return arrays
 
 
 def get_random_classifier_performance_data(
         n_actives: int,
         tables_dir: str = RANDOM_DATA_DIR_PATH,
+        n_decoys: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Retrieves a DataFrame containing performance data for a random classifier.
@@ -29,28 +154,39 @@ def get_random_classifier_performance_data(
     - cumul: The cumulative proportion of the observed value under the null hypothesis.
     - pval: The p-value, indicating the statistical significance of the observed value.
 
+    If `n_actives` exceeds `MAX_TABLE_N_ACTIVES` and `n_decoys` is supplied, the table is simulated
+    (see `get_monte_carlo_random_classifier_table`). Otherwise, the table of `MAX_TABLE_N_ACTIVES` is used.
+
     :param n_actives: The number of active results in the dataset.
     :param tables_dir: The directory where the data tables are stored.
+    :param n_decoys: The number of decoy results in the dataset.
     :return: A DataFrame containing performance data for a random classifier.
     """
 
-    #
-    if not isinstance(n_actives, int):
-        raise TypeError(f"n_actives must be an integer, not {type(n_actives)}")
-    if n_actives < 1:
-        raise ValueError(f"n_actives must be >= 1, not {n_actives}")
+    arrays = get_random_classifier_performance_arrays(n_actives, tables_dir, n_decoys)
 
-    #
-    if n_actives > MAX_TABLE_N_ACTIVES:
-        n_actives_for_calculation = MAX_TABLE_N_ACTIVES
-        logger.warning(f"No table available for {n_actives} actives, reverting to {n_actives_for_calculation} actives for calculation (which is more strict).")
-    else:
-        n_actives_for_calculation = n_actives
+    return pd.DataFrame({column_name: arrays[column_name].copy() for column_name in RANDOM_CLASSIFIER_TABLE_COLUMN_NAMES})
 
-    #
-    df = pd.read_csv(f"{tables_dir}/table_{n_actives_for_calculation}_actives.df", sep=" ")
 
-    return df
+def get_random_classifier_p_value(
+        n_actives: int,
+        normalized_log_auc: Union[float, np.ndarray],
+        tables_dir: str = RANDOM_DATA_DIR_PATH,
+        n_decoys: Optional[int] = None,
+) -> Union[float, np.ndarray]:
+    """
+    :param n_actives: the number of actives in the retrospective dataset
+    :param normalized_log_auc: observed normalized LogAUC value(s)
+    :param tables_dir: the directory where the tables are
+    :param n_decoys: the number of decoys in the retrospective dataset (used if there are too many actives for the tables)
+    :return: the p-value of each observed value, i.e. that of the greatest tabulated value not exceeding it (1.0 below the table)
+    """
+
+    arrays = get_random_classifier_performance_arrays(n_actives, tables_dir, n_decoys)
+    indices = np.searchsorted(arrays["normalized_log_auc"], normalized_log_auc, side="right") - 1
+    p_values = np.where(indices >= 0, arrays["pval"][np.maximum(indices, 0)], 1.0)
+
+    return float(p_values) if np.ndim(p_values) == 0 else p_values
 
 
 def get_bonferroni_correction(
@@ -58,27 +194,29 @@ def get_bonferroni_correction(
         n_configurations: int,
         signif_level: float = 0.01,
         tables_dir: str = RANDOM_DATA_DIR_PATH,
+        n_decoys: Optional[int] = None,
 ) -> float:
     """
     :param n_actives: the number of actives in the retrospective dataset
     :param n_configurations: the number of docking configurations tested (i.e. number of different sets of parameters)
     :param signif_level: desired significance level of the test, .01 by default (who wants to be wrong 1/20 of the time)
     :param tables_dir: the directory where the tables are
+    :param n_decoys: the number of decoys in the retrospective dataset (used if there are too many actives for the tables)
     :return: the normalized LogAUC threshold above which the whole endeavor has beaten random at p < signif_level
     """
 
     #
-    df_random = get_random_classifier_performance_data(n_actives, tables_dir)
+    arrays = get_random_classifier_performance_arrays(n_actives, tables_dir, n_decoys)
 
     #
     threshold = float(signif_level / n_configurations)  # Bonferroni correction
-    valid_thresholds = df_random[df_random['pval'] <= threshold]['normalized_log_auc']
+    index = int(np.searchsorted(-arrays["pval"], -threshold, side="left"))  # p-values decrease along the table, so this is the first row with p-value <= threshold
 
     #
-    if valid_thresholds.empty:
+    if index == len(arrays["pval"]):
         raise ValueError("No threshold found (either too few actives or too many docking configurations tested)")
 
     #
-    normalized_log_auc_thresh = valid_thresholds.iloc[0]
+    normalized_log_auc_thresh = float(arrays["normalized_log_auc"][index])
 
     return normalized_log_auc_thresh
@@ -0,0 +1,182 @@
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+from scipy import stats
+
+from pydock3.criterion.enrichment.roc import get_default_alpha, get_num_actives_before_each_decoy, get_log_auc_interval_weights, get_normalized_log_auc_from_literal_log_auc
+from pydock3.criterion.enrichment.logauc import get_normalized_log_aucs_of_ranked_booleans
+
+
+#
+CONFIDENCE_INTERVAL_METHODS = ["bootstrap", "jackknife"]
+DEFAULT_CONFIDENCE_LEVEL = 0.95
+DEFAULT_NUM_BOOTSTRAP_RESAMPLES = 1000
+DEFAULT_MAX_NUM_ELEMENTS_PER_CHUNK = 50_000_000  # bounds the size of the index & boolean matrices of a chunk of resamples
+DEFAULT_RANDOM_STATE = 0
+NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK = 25  # resamples drawn from each random stream (fixed, so that the draws do not depend on the chunk size)
+
+
+def _validate_ranked_booleans(ranked_booleans: Iterable[bool]) -> Tuple[np.ndarray, int, int]:
+    ranked_booleans = np.asarray(ranked_booleans, dtype=bool)
+    if ranked_booleans.ndim != 1:
+        raise ValueError(f"Expected 1-D array of ranked booleans. Witnessed shape: {ranked_booleans.shape}")
+    num_actives = int(np.count_nonzero(ranked_booleans))
+    num_decoys = int(ranked_booleans.size - num_actives)
+    if num_actives < 2 or num_decoys < 2:
+        raise ValueError(f"Number of actives and number of decoys both must be at least 2 to resample!\n\tnum_actives={num_actives}\n\tnum_decoys={num_decoys}")
+
+    return ranked_booleans, num_actives, num_decoys
+
+
+def get_stratified_bootstrap_index_matrix(
+    ranked_booleans: np.ndarray,
+    num_resamples: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Index matrix (resamples x molecules) of stratified bootstrap resamples of a ranking.
+
+    Actives and decoys are drawn with replacement separately so that every resample has the same
+    number of each. Each row is sorted, so indexing the ranking with it gives a resample that is
+    still in ranked order."""
+
+    active_positions = np.flatnonzero(ranked_booleans)
+    decoy_positions = np.flatnonzero(~ranked_booleans)
+    index_matrix = np.concatenate(
+        [
+            active_positions[rng.integers(0, active_positions.size, size=(num_resamples, active_positions.size))],
+            decoy_positions[rng.integers(0, decoy_positions.size, size=(num_resamples, decoy_positions.size))],
+        ],
+        axis=1,
+    )
+    index_matrix.sort(axis=1)
+
+    return index_matrix
+
+
+def get_bootstrap_normalized_log_aucs(
+    ranked_booleans: Iterable[bool],
+    num_resamples: int = DEFAULT_NUM_BOOTSTRAP_RESAMPLES,
+    chunk_size: Optional[int] = None,
+    random_state: Union[None, int, np.random.Generator] = DEFAULT_RANDOM_STATE,
+) -> np.ndarray:
+    """Normalized LogAUC of each of `num_resamples` stratified bootstrap resamples of a ranking.
+
+    Resamples are drawn in blocks of `NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK`, block b from the b-th stream
+    spawned from `random_state`, so that the result does not depend on the chunk size. They are
+    evaluated `chunk_size` at a time, rounded down to whole blocks (by default, as many as fit in
+    `DEFAULT_MAX_NUM_ELEMENTS_PER_CHUNK` elements)."""
+
+    ranked_booleans, num_actives, num_decoys = _validate_ranked_booleans(ranked_booleans)
+    alpha = get_default_alpha(num_decoys)
+    if isinstance(random_state, np.random.Generator):
+        seed_sequence = np.random.SeedSequence(random_state.integers(0, np.iinfo(np.int64).max))
+    else:
+        seed_sequence = np.random.SeedSequence(random_state)
+    num_blocks = -(-num_resamples // NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK)
+    block_seed_sequences = seed_sequence.spawn(num_blocks)
+    if chunk_size is None:
+        chunk_size = DEFAULT_MAX_NUM_ELEMENTS_PER_CHUNK // ranked_booleans.size
+    num_blocks_per_chunk = max(1, chunk_size // NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK)
+
+    #
+    normalized_log_aucs = np.empty(num_resamples, dtype=np.float64)
+    for first_block_num in range(0, num_blocks, num_blocks_per_chunk):
+        block_nums = range(first_block_num, min(first_block_num + num_blocks_per_chunk, num_blocks))
+        start = first_block_num * NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK
+        stop = min((block_nums[-1] + 1) * NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK, num_resamples)
+        index_matrix = np.concatenate([
+            get_stratified_bootstrap_index_matrix(
+                ranked_booleans,
+                min(NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK, num_resamples - block_num * NUM_BOOTSTRAP_RESAMPLES_PER_BLOCK),
+                np.random.default_rng(block_seed_sequences[block_num]),
+            )
+            for block_num in block_nums
+        ])
+        normalized_log_aucs[start:stop] = get_normalized_log_aucs_of_ranked_booleans(ranked_booleans[index_matrix], alpha=alpha)
+
+    return normalized_log_aucs
+
+
+def get_jackknife_normalized_log_aucs(ranked_booleans: Iterable[bool]) -> np.ndarray:
+    """Normalized LogAUC of the ranking with each molecule left out in turn (actives first, then decoys, in ranked order).
+
+    Leaving out a molecule does not change the ranks of the others, so every leave-one-out value
+    follows from prefix / suffix sums over the full ranking, without building the resamples.
+    `alpha` is held at its value for the full ranking so that all values are on the same scale."""
+
+    ranked_booleans, num_actives, num_decoys = _validate_ranked_booleans(ranked_booleans)
+    alpha = get_default_alpha(num_decoys)
+    num_actives_before_each_decoy = get_num_actives_before_each_decoy(ranked_booleans).astype(np.float64)
+
+    # leaving out an active ranked after m decoys removes it from the count of every decoy from the m-th on
+    weights = get_log_auc_interval_weights(num_decoys, alpha)
+    suffix_sums_of_weights = np.append(np.cumsum(weights[::-1])[::-1], 0.)
+    num_decoys_before_each_active = np.cumsum(~ranked_booleans)[ranked_booleans]
+    active_left_out_literal_log_aucs = (
+        np.dot(num_actives_before_each_decoy, weights) - suffix_sums_of_weights[num_decoys_before_each_active]
+    ) / (num_actives - 1)
+
+    # leaving out the j-th decoy shifts every later decoy one interval to the left
+    weights = get_log_auc_interval_weights(num_decoys - 1, alpha)
+    sums_before = np.append(0., np.cumsum(num_actives_before_each_decoy[:-1] * weights))
+    sums_after = np.append(np.cumsum((num_actives_before_each_decoy[1:] * weights)[::-1])[::-1], 0.)
+    decoy_left_out_literal_log_aucs = (sums_before + sums_after) / num_actives
+
+    return get_normalized_log_auc_from_literal_log_auc(
+        np.concatenate([active_left_out_literal_log_aucs, decoy_left_out_literal_log_aucs]),
+        alpha,
+    )
+
+
+def get_bootstrap_confidence_interval(
+    ranked_booleans: Iterable[bool],
+    confidence_level: float = DEFAULT_CONFIDENCE_LEVEL,
+    num_resamples: int = DEFAULT_NUM_BOOTSTRAP_RESAMPLES,
+    chunk_size: Optional[int] = None,
+    random_state: Union[None, int, np.random.Generator] = DEFAULT_RANDOM_STATE,
+) -> Tuple[float, float]:
+    """Percentile bootstrap confidence interval of the normalized LogAUC of a ranking (reproducible unless `random_state` is None)."""
+
+    if not (0. < confidence_level < 1.):
+        raise ValueError(f"Confidence level must be in range (0, 1). Witnessed: {confidence_level}")
+
+    #
+    normalized_log_aucs = get_bootstrap_normalized_log_aucs(ranked_booleans, num_resamples=num_resamples, chunk_size=chunk_size, random_state=random_state)
+    tail = (1. - confidence_level) / 2.
+    lower, upper = np.quantile(normalized_log_aucs, [tail, 1. - tail])
+
+    return float(lower), float(upper)
+
+
+def get_jackknife_confidence_interval(
+    ranked_booleans: Iterable[bool],
+    confidence_level: float = DEFAULT_CONFIDENCE_LEVEL,
+) -> Tuple[float, float]:
+    """Normal-approximation confidence interval of the normalized LogAUC of a ranking, using the jackknife estimate of its standard error."""
+
+    if not (0. < confidence_level < 1.):
+        raise ValueError(f"Confidence level must be in range (0, 1). Witnessed: {confidence_level}")
+
+    #
+    ranked_booleans = np.asarray(ranked_booleans, dtype=bool)
+    normalized_log_aucs = get_jackknife_normalized_log_aucs(ranked_booleans)
+    n = normalized_log_aucs.size
+    standard_error = np.sqrt((n - 1) / n * np.sum((normalized_log_aucs - normalized_log_aucs.mean()) ** 2))
+    estimate = get_normalized_log_aucs_of_ranked_booleans(ranked_booleans)[0]
+    half_width = stats.norm.ppf(0.5 + confidence_level / 2.) * standard_error
+
+    return float(estimate - half_width), float(estimate + half_width)
+
+
+def get_confidence_interval(
+    ranked_booleans: Iterable[bool],
+    method: str = "bootstrap",
+    confidence_level: float = DEFAULT_CONFIDENCE_LEVEL,
+    **kwargs,
+) -> Tuple[float, float]:
+    if method == "bootstrap":
+        return get_bootstrap_confidence_interval(ranked_booleans, confidence_level=confidence_level, **kwargs)
+    elif method == "jackknife":
+        return get_jackknife_confidence_interval(ranked_booleans, confidence_level=confidence_level)
+    else:
+        raise ValueError(f"Confidence interval method must be one of: {CONFIDENCE_INTERVAL_METHODS}. Witnessed: {method}")
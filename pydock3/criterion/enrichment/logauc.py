@@ -1,7 +1,76 @@
 from typing import Iterable, Union, Optional
 
+import numpy as np
+
 from pydock3.criterion.criterion import Criterion
-from pydock3.criterion.enrichment.roc import ROC
+from pydock3.criterion.enrichment.roc import ROC, get_default_alpha, get_num_actives_before_each_decoy, get_expected_num_actives_before_each_decoy, get_log_auc_interval_weights, get_normalized_log_auc_from_literal_log_auc
+
+
+def get_ranked_booleans(energies: np.ndarray, is_active: Iterable[bool]) -> np.ndarray:
+    """Ranks the molecules of each row of `energies` (configurations x molecules) by energy and returns the active mask in ranked order.
+
+    Molecules with equal energy are ranked decoys first (pessimistic approach) and molecules
+    without an energy (NaN) are ranked last, as in `sort_by_energy_and_drop_duplicate_molecules`."""
+
+    energies = np.atleast_2d(np.asarray(energies, dtype=np.float64))
+    is_active = np.asarray(is_active, dtype=bool)
+    if energies.shape[1] != is_active.size:
+        raise ValueError(f"Number of columns of energy matrix ({energies.shape[1]}) must equal number of molecules ({is_active.size}).")
+
+    # pre-ordering decoys before actives lets a single stable argsort break ties pessimistically
+    decoys_first_order = np.argsort(is_active, kind="stable")
+    order = np.argsort(energies[:, decoys_first_order], axis=1, kind="stable")
+
+    return is_active[decoys_first_order][order]
+
+
+def get_normalized_log_aucs_of_ranked_booleans(ranked_booleans: np.ndarray, alpha: Optional[float] = None) -> np.ndarray:
+    """Normalized LogAUC of each row of `ranked_booleans` (rankings x molecules), all rows having the same number of actives."""
+
+    ranked_booleans = np.atleast_2d(np.asarray(ranked_booleans, dtype=bool))
+    num_actives = int(np.count_nonzero(ranked_booleans[0]))
+    num_decoys = int(ranked_booleans.shape[1] - num_actives)
+    if num_actives == 0 or num_decoys == 0:
+        raise ValueError(f"Number of actives and number of decoys both must be greater than zero!\n\tnum_actives={num_actives}\n\tnum_decoys={num_decoys}")
+    if alpha is None:
+        alpha = get_default_alpha(num_decoys)
+
+    #
+    weights = get_log_auc_interval_weights(num_decoys, alpha)
+    literal_log_aucs = (get_num_actives_before_each_decoy(ranked_booleans) @ weights) / num_actives
+
+    return get_normalized_log_auc_from_literal_log_auc(literal_log_aucs, alpha)
+
+
+def get_normalized_log_aucs(energies: np.ndarray, is_active: Iterable[bool], alpha: Optional[float] = None) -> np.ndarray:
+    """Normalized LogAUC of each configuration, given an energy matrix (configurations x molecules) and the active mask of the molecules.
+
+    Equivalent to calculating `NormalizedLogAUC` on each row separately, but done in one
+    vectorized pass."""
+
+    return get_normalized_log_aucs_of_ranked_booleans(get_ranked_booleans(energies, is_active), alpha=alpha)
+
+
+def get_tie_aware_normalized_log_aucs(energies: np.ndarray, is_active: Iterable[bool], alpha: Optional[float] = None) -> np.ndarray:
+    """Expected normalized LogAUC of each configuration over all orders of molecules with equal energy, given an
+    energy matrix (configurations x molecules) and the active mask of the molecules.
+
+    Unlike `get_normalized_log_aucs`, which ranks tied decoys before tied actives, this does not depend on how ties
+    are broken (see `get_expected_num_actives_before_each_decoy`)."""
+
+    is_active = np.asarray(is_active, dtype=bool)
+    num_actives = int(np.count_nonzero(is_active))
+    num_decoys = int(is_active.size - num_actives)
+    if num_actives == 0 or num_decoys == 0:
+        raise ValueError(f"Number of actives and number of decoys both must be greater than zero!\n\tnum_actives={num_actives}\n\tnum_decoys={num_decoys}")
+    if alpha is None:
+        alpha = get_default_alpha(num_decoys)
+
+    #
+    weights = get_log_auc_interval_weights(num_decoys, alpha)
+    literal_log_aucs = (np.atleast_2d(get_expected_num_actives_before_each_decoy(energies, is_active)) @ weights) / num_actives
+
+    return get_normalized_log_auc_from_literal_log_auc(literal_log_aucs, alpha)
 
 
 class NormalizedLogAUC(Criterion):
@@ -24,3 +93,48 @@ class NormalizedLogAUC(Criterion):
             roc.plot(save_path=image_save_path)
 
         return roc.normalized_log_auc
+
+    def calculate_batch(
+        self,
+        energies: np.ndarray,
+        is_active: Iterable[bool],
+    ) -> np.ndarray:
+        return get_normalized_log_aucs(energies, is_active)
+
+
+class TieAwareNormalizedLogAUC(Criterion):
+    """Expected normalized LogAUC over all orders of molecules with equal energy (see `ROC.from_energies`).
+
+    Like the other enrichment criteria, `calculate` takes the ranked booleans. Ties can only be accounted for if the
+    energies of the ranked molecules are supplied too; otherwise the ranking is taken to be strict."""
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def name(self) -> str:
+        return "tie_aware_normalized_log_auc"
+
+    def calculate(
+        self,
+        booleans: Iterable[bool],
+        image_save_path: Optional[str] = None,
+        energies: Optional[Iterable[float]] = None,
+    ) -> float:
+        if energies is None:
+            roc = ROC(booleans)
+        else:
+            roc = ROC.from_energies(energies, booleans)
+
+        # save plot
+        if image_save_path is not None:
+            roc.plot(save_path=image_save_path)
+
+        return roc.normalized_log_auc
+
+    def calculate_batch(
+        self,
+        energies: np.ndarray,
+        is_active: Iterable[bool],
+    ) -> np.ndarray:
+        return get_tie_aware_normalized_log_aucs(energies, is_active)
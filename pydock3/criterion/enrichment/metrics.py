@@ -0,0 +1,121 @@
+from typing import Iterable, Dict, Optional
+
+import numpy as np
+
+from pydock3.criterion.criterion import Criterion
+from pydock3.criterion.enrichment.roc import get_default_alpha, get_expected_num_actives_before_each_decoy, get_log_auc_interval_weights, get_normalized_log_auc_from_literal_log_auc
+
+
+#
+DEFAULT_ENRICHMENT_FACTOR_FRACTION = 0.01
+DEFAULT_BEDROC_ALPHA = 20.0
+
+
+def get_enrichment_metrics(
+    ranked_booleans: Iterable[bool],
+    enrichment_factor_fraction: float = DEFAULT_ENRICHMENT_FACTOR_FRACTION,
+    bedroc_alpha: float = DEFAULT_BEDROC_ALPHA,
+    energies: Optional[Iterable[float]] = None,
+) -> Dict[str, float]:
+    """Computes every enrichment metric of a ranking (best-scored molecule first) from the ranked active mask in one pass.
+
+    Metrics:
+        - normalized_log_auc: normalized LogAUC (see `ROC`)
+        - roc_auc: area under the ROC curve
+        - pr_auc: area under the precision-recall curve (average precision)
+        - enrichment_factor: enrichment factor at the top `enrichment_factor_fraction` of the ranking
+        - bedroc: Boltzmann-enhanced discrimination of ROC (Truchon & Bayly, 2007)
+        - tie_aware_normalized_log_auc: expected normalized LogAUC over all orders of tied molecules
+          (only if the `energies` of the ranked molecules are supplied, see `ROC.from_energies`)
+
+    As with `ROC`, ties are expected to have been broken beforehand (see
+    `sort_by_energy_and_drop_duplicate_molecules`)."""
+
+    ranked_booleans = np.asarray(ranked_booleans, dtype=bool)
+    num_molecules = ranked_booleans.size
+    num_actives_so_far = np.cumsum(ranked_booleans, dtype=np.int64)
+    num_actives = int(num_actives_so_far[-1]) if num_molecules > 0 else 0
+    num_decoys = num_molecules - num_actives
+    if num_actives == 0 or num_decoys == 0:
+        raise ValueError(f"Number of actives and number of decoys both must be greater than zero!\n\tnum_actives={num_actives}\n\tnum_decoys={num_decoys}")
+
+    #
+    num_actives_before_each_decoy = num_actives_so_far[~ranked_booleans]
+    ranks_of_actives = np.flatnonzero(ranked_booleans) + 1  # 1-based
+
+    # normalized LogAUC
+    alpha = get_default_alpha(num_decoys)
+    literal_log_auc = np.dot(get_log_auc_interval_weights(num_decoys, alpha), num_actives_before_each_decoy) / num_actives
+    normalized_log_auc = get_normalized_log_auc_from_literal_log_auc(literal_log_auc, alpha)
+
+    # ROC AUC (fraction of active-decoy pairs in which the active is ranked first)
+    roc_auc = num_actives_before_each_decoy.sum() / (num_actives * num_decoys)
+
+    # PR AUC (mean precision at the rank of each active)
+    pr_auc = np.mean(np.arange(1, num_actives + 1) / ranks_of_actives)
+
+    # enrichment factor
+    num_selected = max(1, int(np.floor(enrichment_factor_fraction * num_molecules)))
+    enrichment_factor = (num_actives_so_far[num_selected - 1] / num_selected) / (num_actives / num_molecules)
+
+    # BEDROC
+    ratio_of_actives = num_actives / num_molecules
+    rie = np.exp(-bedroc_alpha * ranks_of_actives / num_molecules).sum() / (
+        ratio_of_actives * (1. - np.exp(-bedroc_alpha)) / np.expm1(bedroc_alpha / num_molecules)
+    )
+    bedroc = (
+        rie * ratio_of_actives * np.sinh(bedroc_alpha / 2.) / (np.cosh(bedroc_alpha / 2.) - np.cosh(bedroc_alpha / 2. - bedroc_alpha * ratio_of_actives))
+        + 1. / (1. - np.exp(bedroc_alpha * (1. - ratio_of_actives)))
+    )
+
+    metrics = {
+        "normalized_log_auc": float(normalized_log_auc),
+        "roc_auc": float(roc_auc),
+        "pr_auc": float(pr_auc),
+        "enrichment_factor": float(enrichment_factor),
+        "bedroc": float(bedroc),
+    }
+
+    # tie-aware normalized LogAUC
+    if energies is not None:
+        expected_num_actives_before_each_decoy = get_expected_num_actives_before_each_decoy(energies, ranked_booleans)
+        literal_log_auc = np.dot(get_log_auc_interval_weights(num_decoys, alpha), expected_num_actives_before_each_decoy) / num_actives
+        metrics["tie_aware_normalized_log_auc"] = float(get_normalized_log_auc_from_literal_log_auc(literal_log_auc, alpha))
+
+    return metrics
+
+
+class EnrichmentMetricCriterion(Criterion):
+    """Criterion taking the value of one of the metrics of `get_enrichment_metrics`."""
+
+    METRIC_NAME = None
+
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def name(self) -> str:
+        return self.METRIC_NAME
+
+    def calculate(
+        self,
+        booleans: Iterable[bool],
+        image_save_path: Optional[str] = None,
+    ) -> float:
+        return get_enrichment_metrics(booleans)[self.METRIC_NAME]
+
+
+class ROCAUC(EnrichmentMetricCriterion):
+    METRIC_NAME = "roc_auc"
+
+
+class PRAUC(EnrichmentMetricCriterion):
+    METRIC_NAME = "pr_auc"
+
+
+class EnrichmentFactor(EnrichmentMetricCriterion):
+    METRIC_NAME = "enrichment_factor"
+
+
+class BEDROC(EnrichmentMetricCriterion):
+    METRIC_NAME = "bedroc"
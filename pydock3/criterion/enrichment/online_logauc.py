@@ -0,0 +1,70 @@
+from typing import Iterable, Tuple, Optional
+
+import numpy as np
+
+from pydock3.files import OutdockFileTailer
+from pydock3.criterion.enrichment.roc import get_default_alpha
+from pydock3.criterion.enrichment.logauc import get_ranked_booleans, get_normalized_log_aucs_of_ranked_booleans
+
+
+class OnlineLogAUCEstimator(object):
+    """
+    Tracks the normalized LogAUC of a docking configuration whose actives are done docking but whose decoys are
+    still docking, as the decoys' scores come in.
+
+    A decoy's best energy can only improve (decrease) as more of its poses are scored, and a decoy that has not been
+    scored yet can at best end up ranked last. Ranking the decoys seen so far at their current energies and the rest
+    after everything else therefore gives an upper bound on the final normalized LogAUC, which only decreases as
+    scores come in. (This assumes that every decoy ends up in the OUTDOCK file, as DOCK writes a line even for
+    molecules that fail to dock.)
+    """
+
+    def __init__(self, active_energies: Iterable[float], num_decoys: int):
+        self.active_energies = np.asarray(active_energies, dtype=np.float64)  # NaN for actives that failed to dock
+        self.num_decoys = num_decoys
+
+        #
+        self.decoy_id_to_energy = {}
+        self._outdock_file_tailer = None
+
+    @property
+    def num_decoys_seen(self) -> int:
+        return len(self.decoy_id_to_energy)
+
+    def add_decoy_scores(self, scores: Iterable[Tuple[str, float]]) -> None:
+        for decoy_id, energy in scores:
+            if energy < self.decoy_id_to_energy.get(decoy_id, np.inf):
+                self.decoy_id_to_energy[decoy_id] = energy
+
+    def update_from_partial_outdock_file(self, partial_outdock_file_path: str) -> None:
+        """Adds the decoy scores appended to the partial OUTDOCK file since the last update."""
+
+        if self._outdock_file_tailer is None or self._outdock_file_tailer.path != partial_outdock_file_path:
+            self._outdock_file_tailer = OutdockFileTailer(partial_outdock_file_path)
+
+        #
+        scores, restarted = self._outdock_file_tailer.read_new_scores()
+        if restarted:  # task was restarted, so scores seen so far may not be in the final OUTDOCK file
+            self.decoy_id_to_energy = {}
+        self.add_decoy_scores(scores)
+
+    def _get_normalized_log_auc(self, num_decoys: int) -> float:
+        decoy_energies = np.fromiter(self.decoy_id_to_energy.values(), dtype=np.float64, count=self.num_decoys_seen)
+        num_unseen_decoys = num_decoys - decoy_energies.size
+        energies = np.concatenate([self.active_energies, decoy_energies, np.full(num_unseen_decoys, np.nan)])  # NaN is ranked last
+        is_active = np.arange(energies.size) < self.active_energies.size
+
+        return float(get_normalized_log_aucs_of_ranked_booleans(get_ranked_booleans(energies, is_active), alpha=get_default_alpha(num_decoys))[0])
+
+    def get_upper_bound(self) -> float:
+        """Upper bound on the final normalized LogAUC, given the decoy scores seen so far."""
+
+        return self._get_normalized_log_auc(max(self.num_decoys, self.num_decoys_seen))
+
+    def get_estimate(self) -> Optional[float]:
+        """Normalized LogAUC of the running ROC of the decoys seen so far (None if no decoys have been seen)."""
+
+        if self.num_decoys_seen == 0:
+            return None
+
+        return self._get_normalized_log_auc(self.num_decoys_seen)
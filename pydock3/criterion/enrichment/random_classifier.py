@@ -0,0 +1,174 @@
+import os
+import uuid
+import logging
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from pydock3.util import get_cache_dir_path
+from pydock3.criterion.enrichment.roc import get_default_alpha, get_log_auc_interval_weights, get_normalized_log_auc_from_literal_log_auc
+from pydock3.criterion.enrichment.logauc import get_normalized_log_aucs_of_ranked_booleans
+
+#
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+#
+CACHE_DIR_NAME = "random_classifier"
+CACHE_VERSION = 1
+DEFAULT_NUM_SAMPLES = 20_000
+DEFAULT_RANDOM_STATE = 0
+DEFAULT_MAX_NUM_ELEMENTS_PER_CHUNK = 20_000_000  # bounds the size of the random key & boolean matrices of a chunk of samples
+TABLE_BIN_SIZE = 0.001  # same resolution as the shipped tables
+MIN_NUM_SAMPLES_IN_TAIL = 20  # p-values supported by fewer samples than this come from the tail approximation
+MIN_TAIL_APPROXIMATION_P_VALUE = 1e-12  # table extends until the p-value of the tail approximation falls below this
+MAX_TAIL_APPROXIMATION_GRID_SIZE = 2 ** 22
+
+
+def simulate_random_classifier_normalized_log_aucs(
+        n_actives: int,
+        n_decoys: int,
+        num_samples: int = DEFAULT_NUM_SAMPLES,
+        chunk_size: Optional[int] = None,
+        random_state: Union[None, int, np.random.Generator] = DEFAULT_RANDOM_STATE,
+) -> np.ndarray:
+    """Normalized LogAUC of each of `num_samples` uniformly random rankings of `n_actives` actives and `n_decoys` decoys.
+
+    Each chunk of `chunk_size` rankings is drawn as a matrix of random keys, whose `n_actives`
+    smallest keys per row mark the actives, and is evaluated in one call of the vectorized ROC path."""
+
+    if n_actives < 1 or n_decoys < 1:
+        raise ValueError(f"Number of actives and number of decoys both must be greater than zero!\n\tn_actives={n_actives}\n\tn_decoys={n_decoys}")
+    num_molecules = n_actives + n_decoys
+    alpha = get_default_alpha(n_decoys)
+    rng = np.random.default_rng(random_state)
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_MAX_NUM_ELEMENTS_PER_CHUNK // num_molecules)
+
+    #
+    normalized_log_aucs = np.empty(num_samples, dtype=np.float64)
+    for start in range(0, num_samples, chunk_size):
+        stop = min(start + chunk_size, num_samples)
+        keys = rng.random((stop - start, num_molecules))
+        kth_smallest_keys = np.partition(keys, n_actives - 1, axis=1)[:, n_actives - 1:n_actives]
+        normalized_log_aucs[start:stop] = get_normalized_log_aucs_of_ranked_booleans(keys <= kth_smallest_keys, alpha=alpha)
+
+    return normalized_log_aucs
+
+
+def get_independent_actives_survival_function(n_actives: int, n_decoys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Survival function of the normalized LogAUC of a random ranking, approximating the numbers of decoys ranked
+    before each active as independent (i.e., drawn with replacement), which is slightly conservative.
+
+    The literal LogAUC is then the mean of `n_actives` i.i.d. contributions, so its distribution is the
+    `n_actives`-fold convolution of a single active's, computed on a grid by FFT. Unlike sampling, this
+    resolves p-values far smaller than one over the number of samples.
+
+    :return: grid of normalized LogAUC values and, for each, the probability of a value at least as large
+    """
+
+    alpha = get_default_alpha(n_decoys)
+    weights = get_log_auc_interval_weights(n_decoys, alpha)
+    contributions = np.append(np.cumsum(weights[::-1])[::-1], 0.)  # of an active ranked after m decoys, for m = 0..n_decoys
+
+    # distribution of a single active's contribution, then of the sum of all of them
+    grid_step = max(contributions[0] * n_actives / MAX_TAIL_APPROXIMATION_GRID_SIZE, 1e-4)
+    pmf = np.bincount(np.rint(contributions / grid_step).astype(np.int64)) / contributions.size
+    grid_size = (pmf.size - 1) * n_actives + 1
+    fft_size = 1 << int(np.ceil(np.log2(grid_size)))
+    sum_pmf = np.maximum(np.fft.irfft(np.fft.rfft(pmf, fft_size) ** n_actives, fft_size)[:grid_size], 0.)
+    sum_pmf /= sum_pmf.sum()
+
+    #
+    normalized_log_aucs = get_normalized_log_auc_from_literal_log_auc(np.arange(grid_size) * grid_step / n_actives, alpha)
+    survival_function = np.cumsum(sum_pmf[::-1])[::-1]
+
+    return normalized_log_aucs, survival_function
+
+
+def get_random_classifier_table_from_samples(
+        normalized_log_aucs: np.ndarray,
+        n_actives: int,
+        n_decoys: int,
+        bin_size: float = TABLE_BIN_SIZE,
+) -> np.ndarray:
+    """
+    Tabulates samples of the null distribution in the format of the shipped tables: one row per bin, with columns
+    normalized_log_auc (start of bin), density, prop, cumul, and pval (probability of a value at least the start of the bin).
+
+    In the upper tail, where fewer than `MIN_NUM_SAMPLES_IN_TAIL` samples remain, p-values come from
+    `get_independent_actives_survival_function` instead, and the table is extended until they are negligible, so
+    that strict Bonferroni thresholds can still be found.
+    """
+
+    samples = np.sort(np.asarray(normalized_log_aucs, dtype=np.float64))
+    num_samples = samples.size
+    tail_grid, tail_survival_function = get_independent_actives_survival_function(n_actives, n_decoys)
+
+    #
+    first_bin_index = int(np.floor(samples[0] / bin_size))
+    last_tail_grid_index = min(int(np.searchsorted(-tail_survival_function, -MIN_TAIL_APPROXIMATION_P_VALUE)), tail_grid.size - 1)
+    last_bin_index = int(np.floor(max(samples[-1], tail_grid[last_tail_grid_index]) / bin_size))
+    bin_starts = np.arange(first_bin_index, last_bin_index + 1) * bin_size
+
+    #
+    num_samples_at_least = num_samples - np.searchsorted(samples, bin_starts, side="left")
+    pval = num_samples_at_least / num_samples
+
+    # tail approximation, kept non-increasing where it meets the sampled p-values
+    is_in_tail = num_samples_at_least < MIN_NUM_SAMPLES_IN_TAIL
+    if is_in_tail.any():
+        first_tail_index = int(np.argmax(is_in_tail))
+        tail_pval = tail_survival_function[np.minimum(np.searchsorted(tail_grid, bin_starts[first_tail_index:], side="left"), tail_grid.size - 1)]
+        pval[first_tail_index:] = np.minimum(tail_pval, pval[first_tail_index - 1] if first_tail_index > 0 else 1.)
+
+    #
+    prop = pval - np.append(pval[1:], 0.)
+    cumul = 1. - np.append(pval[1:], 0.)
+
+    return np.column_stack([bin_starts, prop / bin_size, prop, cumul, pval])
+
+
+def get_cache_file_path(n_actives: int, n_decoys: int, num_samples: int, random_state: int) -> str:
+    return os.path.join(
+        get_cache_dir_path(CACHE_DIR_NAME),
+        f"table_{n_actives}_actives_{n_decoys}_decoys_{num_samples}_samples_seed_{random_state}_v{CACHE_VERSION}.npy",
+    )
+
+
+def get_monte_carlo_random_classifier_table(
+        n_actives: int,
+        n_decoys: int,
+        num_samples: int = DEFAULT_NUM_SAMPLES,
+        random_state: int = DEFAULT_RANDOM_STATE,
+        use_cache: bool = True,
+) -> np.ndarray:
+    """Table of the normalized LogAUC null distribution of a random classifier (see `get_random_classifier_table_from_samples`),
+    simulated once per (n_actives, n_decoys) and cached under the user cache directory."""
+
+    #
+    cache_file_path = get_cache_file_path(n_actives, n_decoys, num_samples, random_state)
+    if use_cache and os.path.isfile(cache_file_path):
+        try:
+            return np.load(cache_file_path)
+        except Exception as e:
+            logger.warning(f"Failed to load cached random classifier table {cache_file_path}, regenerating: {e}")
+
+    #
+    logger.info(f"Simulating normalized LogAUC of {num_samples} random rankings of {n_actives} actives and {n_decoys} decoys")
+    table = get_random_classifier_table_from_samples(
+        simulate_random_classifier_normalized_log_aucs(n_actives, n_decoys, num_samples=num_samples, random_state=random_state),
+        n_actives,
+        n_decoys,
+    )
+
+    # write atomically, since other processes may be reading the same cache
+    if use_cache:
+        temp_file_path = f"{cache_file_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file_path, "wb") as f:
+            np.save(f, table)
+        os.replace(temp_file_path, cache_file_path)
+
+    return table
@@ -3,7 +3,6 @@ from dataclasses import dataclass
 import math
 
 import numpy as np
-from scipy import interpolate
 import matplotlib
 matplotlib.use('Agg')  # set the backend to Agg (no interactive plots)
 from matplotlib import pyplot as plt
@@ -17,18 +16,115 @@ class Point:
     y: float
 
 
+def get_default_alpha(num_decoys: int) -> float:
+    return float(1 / (num_decoys * np.e))
+
+
+def get_num_actives_before_each_decoy(booleans: np.ndarray) -> np.ndarray:
+    """For each decoy (in ranked order), the number of actives ranked before it.
+
+    `booleans` may be 1-D (one ranking) or 2-D (one ranking per row, each with the same number of
+    decoys), in which case the result has one row per ranking."""
+
+    booleans = np.asarray(booleans, dtype=bool)
+    num_actives_so_far = np.cumsum(booleans, axis=-1, dtype=np.int64)
+    if booleans.ndim == 1:
+        return num_actives_so_far[~booleans]
+    return num_actives_so_far[~booleans].reshape(booleans.shape[0], -1)
+
+
+def get_expected_num_actives_before_each_decoy(energies: np.ndarray, is_active: Iterable[bool]) -> np.ndarray:
+    """For each decoy (in ranked order), the expected number of actives ranked before it if molecules with equal
+    energy were ranked in uniformly random order, rather than decoys first.
+
+    Within a block of tied molecules with `a` actives and `d` decoys, the j-th decoy (1-based) is preceded in
+    expectation by `a * j / (d + 1)` of the block's actives, so the expected ROC curve rises linearly across each
+    tie block. Molecules without an energy (NaN) are ranked last, as one tie block. Since LogAUC is linear in these
+    counts, the LogAUC computed from them is the expected LogAUC over all tie-breaking orders, in O(n log n).
+
+    `energies` may be 1-D (one set of energies) or 2-D (configurations x molecules), in which case the result has
+    one row per configuration. `is_active` is the active mask of the molecules (columns)."""
+
+    energies = np.asarray(energies, dtype=np.float64)
+    is_1d = energies.ndim == 1
+    energies = np.atleast_2d(energies)
+    is_active = np.asarray(is_active, dtype=bool)
+    if energies.shape[1] != is_active.size:
+        raise ValueError(f"Number of columns of energy matrix ({energies.shape[1]}) must equal number of molecules ({is_active.size}).")
+    num_molecules = is_active.size
+    positions = np.arange(num_molecules)
+
+    #
+    order = np.argsort(energies, axis=1, kind="stable")
+    sorted_energies = np.take_along_axis(energies, order, axis=1)
+    ranked_booleans = is_active[order]
+
+    # tie blocks of the ranking (NaNs form one block)
+    is_tied_with_previous = (sorted_energies[:, 1:] == sorted_energies[:, :-1]) | (np.isnan(sorted_energies[:, 1:]) & np.isnan(sorted_energies[:, :-1]))
+    is_block_start = np.ones(energies.shape, dtype=bool)
+    is_block_start[:, 1:] = ~is_tied_with_previous
+    is_block_end = np.ones(energies.shape, dtype=bool)
+    is_block_end[:, :-1] = ~is_tied_with_previous
+    block_start_positions = np.maximum.accumulate(np.where(is_block_start, positions, 0), axis=1)
+    block_end_positions = np.minimum.accumulate(np.where(is_block_end, positions, num_molecules - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    #
+    num_actives_so_far = np.cumsum(ranked_booleans, axis=1, dtype=np.int64)
+    num_decoys_so_far = np.cumsum(~ranked_booleans, axis=1, dtype=np.int64)
+    num_actives_before_block = np.take_along_axis(num_actives_so_far - ranked_booleans, block_start_positions, axis=1)
+    num_decoys_before_block = np.take_along_axis(num_decoys_so_far - ~ranked_booleans, block_start_positions, axis=1)
+    num_actives_in_block = np.take_along_axis(num_actives_so_far, block_end_positions, axis=1) - num_actives_before_block
+    num_decoys_in_block = np.take_along_axis(num_decoys_so_far, block_end_positions, axis=1) - num_decoys_before_block
+    expected_num_actives_before = num_actives_before_block + num_actives_in_block * (num_decoys_so_far - num_decoys_before_block) / (num_decoys_in_block + 1)
+
+    #
+    expected_num_actives_before_each_decoy = expected_num_actives_before[~ranked_booleans].reshape(energies.shape[0], -1)
+    if is_1d:
+        return expected_num_actives_before_each_decoy[0]
+    return expected_num_actives_before_each_decoy
+
+
+def get_log_auc_interval_weights(num_decoys: int, alpha: float) -> np.ndarray:
+    """Weight of each decoy's interval [k/n, (k+1)/n) of the false positive rate in the LogAUC integral.
+
+    The ROC curve is a step function whose value on the k-th interval is the fraction of actives
+    ranked before the k-th decoy, so its integral over ln(x) on [alpha, 1] is a dot product of
+    those fractions with the lengths of the intervals (clipped to [alpha, 1]) in log space."""
+
+    upper = np.arange(1, num_decoys + 1, dtype=np.float64) / num_decoys
+    lower = np.maximum(np.arange(num_decoys, dtype=np.float64) / num_decoys, alpha)
+
+    return np.log(np.maximum(upper, lower)) - np.log(lower)  # zero for intervals entirely below alpha
+
+
+def get_normalized_log_auc_from_literal_log_auc(literal_log_auc: Union[float, np.ndarray], alpha: float) -> Union[float, np.ndarray]:
+    random_literal_log_auc = 1 - alpha
+    optimal_literal_log_auc = -np.log(alpha)
+    return (literal_log_auc - random_literal_log_auc) / (optimal_literal_log_auc - random_literal_log_auc)
+
+
 class ROC(object):
     def __init__(
         self,
         booleans: Iterable[bool],
         alpha: float = None,
+        num_actives_before_each_decoy: Optional[np.ndarray] = None,
     ):
+        """
+        ROC curve of a ranking, given the active mask of its molecules in ranked order (`booleans`).
+
+        If `num_actives_before_each_decoy` is supplied (e.g., the expected counts of
+        `get_expected_num_actives_before_each_decoy`, see `ROC.from_energies`), the curve is built from it instead
+        of from the order of `booleans`.
+        """
+
         #
         self.booleans = booleans
+        booleans = np.asarray(booleans, dtype=bool)
 
         #
-        self.num_actives = len([b for b in self.booleans if b])
-        self.num_decoys = len([b for b in self.booleans if not b])
+        self.num_actives = int(np.count_nonzero(booleans))
+        self.num_decoys = int(booleans.size - self.num_actives)
 
         # validate num actives and num decoys
         if self.num_actives == 0 or self.num_decoys == 0:
@@ -36,46 +132,32 @@ class ROC(object):
 
         # validate and set alpha
         if alpha is None:
-            alpha = float(1 / (self.num_decoys * np.e))
+            alpha = get_default_alpha(self.num_decoys)
         if not ((alpha > 0.0) and (alpha < 1.0)):
             raise ValueError("ROC alpha must be in range (0, 1)")
         self.alpha = alpha
 
-        # get ROC points
-        x_coords = []
-        y_coords = []
-        num_decoys_witnessed_so_far = 0
-        num_actives_witnessed_so_far = 0
-        last_bool_was_decoy = False
-        for b in self.booleans:
-            if b:
-                if num_decoys_witnessed_so_far == self.num_decoys:
-                    break  # last decoy has been seen, end of ROC, disregard remaining actives
-                num_actives_witnessed_so_far += 1
-                last_bool_was_decoy = False
-            else:
-                if not last_bool_was_decoy:
-                    x_coord = float(num_decoys_witnessed_so_far / self.num_decoys)
-                    y_coord = float(num_actives_witnessed_so_far / self.num_actives)
-                    x_coords.append(x_coord)
-                    y_coords.append(y_coord)
-                num_decoys_witnessed_so_far += 1
-                last_bool_was_decoy = True
-        self.x_coords = x_coords  # num points = num_decoys, each ith point represents interval [i/n, (i+1)/n]
-        self.y_coords = y_coords
+        # the k-th decoy's interval [k/n, (k+1)/n) has TPR equal to the fraction of actives ranked before it (actives ranked after the last decoy are disregarded)
+        if num_actives_before_each_decoy is None:
+            num_actives_before_each_decoy = get_num_actives_before_each_decoy(booleans)
+        elif len(num_actives_before_each_decoy) != self.num_decoys:
+            raise ValueError(f"Expected one count per decoy ({self.num_decoys}). Witnessed: {len(num_actives_before_each_decoy)}")
+        self.num_actives_before_each_decoy = np.asarray(num_actives_before_each_decoy)
+
+        # get ROC points (one per decoy at which the TPR changes, i.e., one per run of consecutive decoys if there are no ties)
+        is_point = np.ones(self.num_decoys, dtype=bool)
+        is_point[1:] = self.num_actives_before_each_decoy[1:] != self.num_actives_before_each_decoy[:-1]
+        decoy_nums_of_points = np.flatnonzero(is_point)
+        self.x_coords = (decoy_nums_of_points / self.num_decoys).tolist()  # num points = num_decoys, each ith point represents interval [i/n, (i+1)/n]
+        self.y_coords = (self.num_actives_before_each_decoy[decoy_nums_of_points] / self.num_actives).tolist()
         self.points = [
             Point(x_coord, y_coord)
             for x_coord, y_coord in zip(self.x_coords, self.y_coords)
         ]
 
         #
-        x_coords_for_interpolation = self.x_coords + [1.0]  # add point at x=1.0 to complete the last interval [(n-1)/n, 1.0]
-        y_coords_for_interpolation = self.y_coords + [self.y_coords[-1]]
-        self.f = lambda w: float(
-            interpolate.interp1d(
-                x_coords_for_interpolation, y_coords_for_interpolation, kind="previous"
-            )(w)
-        )
+        self._x_coords_array = np.asarray(self.x_coords + [1.0])  # add point at x=1.0 to complete the last interval [(n-1)/n, 1.0]
+        self._y_coords_array = np.asarray(self.y_coords + [self.y_coords[-1]])
 
         #
         self._literal_log_auc = self._get_literal_log_auc()
@@ -84,6 +166,28 @@ class ROC(object):
         #self.log_auc = self._get_log_auc()  # unnormalized LogAUC should probably be avoided entirely
         self.normalized_log_auc = self._get_normalized_log_auc()
 
+    @classmethod
+    def from_energies(cls, energies: Iterable[float], is_active: Iterable[bool], alpha: float = None) -> "ROC":
+        """Tie-aware ROC curve: the expected curve over all orders of molecules with equal energy (see
+        `get_expected_num_actives_before_each_decoy`), instead of the curve of ranking decoys first."""
+
+        energies = np.asarray(energies, dtype=np.float64)
+        is_active = np.asarray(is_active, dtype=bool)
+        order = np.lexsort((is_active, energies))  # decoys first within ties, NaN last
+
+        return cls(
+            is_active[order],
+            alpha=alpha,
+            num_actives_before_each_decoy=get_expected_num_actives_before_each_decoy(energies, is_active),
+        )
+
+    def f(self, w: float) -> float:
+        """TPR at FPR `w` (step function, continuous from the right)."""
+
+        if not (0.0 <= w <= 1.0):
+            raise ValueError(f"FPR must be in range [0, 1]. Witnessed: {w}")
+        return float(self._y_coords_array[np.searchsorted(self._x_coords_array, w, side="right") - 1])
+
     def _get_random_literal_log_auc(self) -> float:
         return float(1 - self.alpha)
     
@@ -91,32 +195,8 @@ class ROC(object):
         return -np.log(self.alpha)
 
     def _get_literal_log_auc(self) -> float:
-        # remove point at x=0.0 and add point at x=1.0
-        x_values = self.x_coords[1:] + [1.0]
-        y_values = self.y_coords[1:] + [self.y_coords[-1]]
-
-        #
-        weights = []
-        y_values_of_intervals = []
-        previous_x_value = self.alpha
-        previous_y_value = self.f(self.alpha)  # initialize according to point at x=alpha
-        for i, (current_x_value, current_y_value) in enumerate(
-            zip(x_values, y_values)
-        ):
-            if current_y_value == previous_y_value and (i + 1) != len(
-                y_values
-            ):  # add for last y no matter what
-                continue
-
-            #
-            y_values_of_intervals.append(previous_y_value)
-            weights.append(np.log(float(current_x_value / previous_x_value)))
-
-            #
-            previous_x_value = current_x_value
-            previous_y_value = current_y_value
-
-        return float(np.dot(weights, y_values_of_intervals).item())
+        weights = get_log_auc_interval_weights(self.num_decoys, self.alpha)
+        return float(np.dot(weights, self.num_actives_before_each_decoy) / self.num_actives)
     
     def _get_log_auc(self) -> float:
         return self._literal_log_auc / self._optimal_literal_log_auc
@@ -131,81 +211,109 @@ class ROC(object):
         figsize: Tuple[int, int] = (8, 8),
         dpi: int = 300,
     ) -> Tuple[plt.Figure, plt.Axes]:
-        #
-        if title is None:
-            title = "Linear-Log ROC Plot"
-
-        #
-        fig, ax = plt.subplots(figsize=figsize)
-
-        # draw curve of random classifier for reference
-        ax.semilogx(
-            [float(i / 1000) for i in range(0, 1001)],
-            [float(i / 1000) for i in range(0, 1001)],
-            "--",
-            linewidth=1,
-            color="Black",
-            label=f"random classifier",
-        )
-
-        # make plot of ROC curve of actives vs. decoys with log-scaled x-axis
-        x_coords_for_plot = self.x_coords + [1.0]  # add point at x=1.0 to complete the last interval [(n-1)/n, 1.0]
-        y_coords_for_plot = self.y_coords + [self.y_coords[-1]]
-        ax.step(
-            x_coords_for_plot,
-            y_coords_for_plot,
-            where="post",
-            label=f"ROC curve",
-        )
-
-        # add an extra label of normalized LogAUC (nothing extra will be plotted)
-        plt.plot([], [], " ", label=f"# of actives: {self.num_actives}")
-        plt.plot([], [], " ", label=f"# of decoys: {self.num_decoys}")
-        plt.plot(
-            [],
-            [],
-            " ",
-            label=f"x-axis interval: [{np.format_float_scientific(self.alpha, precision=3)}, 1.0]",
-        )
-        plt.plot(
-            [], [], " ", label=f"normalized LogAUC: {round(self.normalized_log_auc, 3)}"
+        return plot_roc_curve(
+            self.x_coords,
+            self.y_coords,
+            self.num_actives,
+            self.num_decoys,
+            self.alpha,
+            self.normalized_log_auc,
+            save_path=save_path,
+            title=title,
+            figsize=figsize,
+            dpi=dpi,
         )
 
-        # set legend
-        ax.legend(framealpha=0.75)
-
-        # set axis labels
-        ax.set_xlabel("false positive rate (i.e., top fraction of decoys accepted)")
-        ax.set_ylabel("true positive rate (i.e., top fraction of actives accepted)")
-
-        # set log scale x-axis
-        ax.set_xscale("log")
-
-        # set plot axis limits
-        ax.set_xlim(left=self.alpha, right=1.0)
-        ax.set_ylim(bottom=0.0, top=1.0)
-
-        # set axis ticks
-        order_of_magnitude = -math.floor(math.log(self.alpha, 10)) - 1
-        ax.set_xticks(
-            [self.alpha] + [float(10**x) for x in range(-order_of_magnitude, 1, 1)]
-        )
-        ax.set_yticks([float(j / 10) for j in range(0, 11)])
-
-        # set title
-        ax.set_title(title)
-
-        # save image and close
-        try:
-            plt.tight_layout()
-        except UserWarning:
-            pass
-
-        #
-        if save_path is not None:
-            plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
-
-        #
-        plt.close(fig)
 
-        return fig, ax
+def plot_roc_curve(
+    x_coords: Iterable[float],
+    y_coords: Iterable[float],
+    num_actives: int,
+    num_decoys: int,
+    alpha: float,
+    normalized_log_auc: float,
+    save_path: Optional[str] = None,
+    title: Optional[str] = None,
+    figsize: Tuple[int, int] = (8, 8),
+    dpi: int = 300,
+) -> Tuple[plt.Figure, plt.Axes]:
+    """Plots a linear-log ROC curve from its points (see `ROC`). Separate from `ROC` so that plots can be rendered from stored points."""
+
+    #
+    if title is None:
+        title = "Linear-Log ROC Plot"
+
+    #
+    fig, ax = plt.subplots(figsize=figsize)
+
+    # draw curve of random classifier for reference
+    ax.semilogx(
+        [float(i / 1000) for i in range(0, 1001)],
+        [float(i / 1000) for i in range(0, 1001)],
+        "--",
+        linewidth=1,
+        color="Black",
+        label=f"random classifier",
+    )
+
+    # make plot of ROC curve of actives vs. decoys with log-scaled x-axis
+    x_coords_for_plot = list(x_coords) + [1.0]  # add point at x=1.0 to complete the last interval [(n-1)/n, 1.0]
+    y_coords_for_plot = list(y_coords) + [y_coords[-1]]
+    ax.step(
+        x_coords_for_plot,
+        y_coords_for_plot,
+        where="post",
+        label=f"ROC curve",
+    )
+
+    # add an extra label of normalized LogAUC (nothing extra will be plotted)
+    plt.plot([], [], " ", label=f"# of actives: {num_actives}")
+    plt.plot([], [], " ", label=f"# of decoys: {num_decoys}")
+    plt.plot(
+        [],
+        [],
+        " ",
+        label=f"x-axis interval: [{np.format_float_scientific(alpha, precision=3)}, 1.0]",
+    )
+    plt.plot(
+        [], [], " ", label=f"normalized LogAUC: {round(normalized_log_auc, 3)}"
+    )
+
+    # set legend
+    ax.legend(framealpha=0.75)
+
+    # set axis labels
+    ax.set_xlabel("false positive rate (i.e., top fraction of decoys accepted)")
+    ax.set_ylabel("true positive rate (i.e., top fraction of actives accepted)")
+
+    # set log scale x-axis
+    ax.set_xscale("log")
+
+    # set plot axis limits
+    ax.set_xlim(left=alpha, right=1.0)
+    ax.set_ylim(bottom=0.0, top=1.0)
+
+    # set axis ticks
+    order_of_magnitude = -math.floor(math.log(alpha, 10)) - 1
+    ax.set_xticks(
+        [alpha] + [float(10**x) for x in range(-order_of_magnitude, 1, 1)]
+    )
+    ax.set_yticks([float(j / 10) for j in range(0, 11)])
+
+    # set title
+    ax.set_title(title)
+
+    # save image and close
+    try:
+        plt.tight_layout()
+    except UserWarning:
+        pass
+
+    #
+    if save_path is not None:
+        plt.savefig(save_path, dpi=dpi, bbox_inches='tight')
+
+    #
+    plt.close(fig)
+
+    return fig, ax
@@ -0,0 +1,170 @@
+import os
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Optional, List
+
+import numpy as np
+
+from pydock3.criterion.enrichment.roc import ROC, plot_roc_curve
+
+#
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+#
+DEFAULT_ROC_PLOT_DPI = 300
+DEFAULT_MAX_NUM_ROC_PLOT_RENDERING_WORKERS = 4
+
+
+@dataclass
+class ROCPlotData:
+    """The inputs of an ROC plot, small enough to be stored next to where the plot would go and rendered later."""
+    x_coords: np.ndarray
+    y_coords: np.ndarray
+    num_actives: int
+    num_decoys: int
+    alpha: float
+    normalized_log_auc: float
+
+    @classmethod
+    def from_roc(cls, roc: ROC) -> "ROCPlotData":
+        return cls(
+            x_coords=np.asarray(roc.x_coords, dtype=np.float64),
+            y_coords=np.asarray(roc.y_coords, dtype=np.float64),
+            num_actives=roc.num_actives,
+            num_decoys=roc.num_decoys,
+            alpha=roc.alpha,
+            normalized_log_auc=roc.normalized_log_auc,
+        )
+
+    @staticmethod
+    def get_data_file_path(image_save_path: str) -> str:
+        return f"{os.path.splitext(image_save_path)[0]}.npz"
+
+    def save(self, file_path: str) -> None:
+        # write atomically, since a renderer may be reading it
+        temp_file_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                x_coords=self.x_coords,
+                y_coords=self.y_coords,
+                num_actives=np.array(self.num_actives),
+                num_decoys=np.array(self.num_decoys),
+                alpha=np.array(self.alpha),
+                normalized_log_auc=np.array(self.normalized_log_auc),
+            )
+        os.replace(temp_file_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> "ROCPlotData":
+        with np.load(file_path) as data:
+            return cls(
+                x_coords=data["x_coords"],
+                y_coords=data["y_coords"],
+                num_actives=int(data["num_actives"]),
+                num_decoys=int(data["num_decoys"]),
+                alpha=float(data["alpha"]),
+                normalized_log_auc=float(data["normalized_log_auc"]),
+            )
+
+    def plot(self, save_path: Optional[str] = None, dpi: int = DEFAULT_ROC_PLOT_DPI):
+        return plot_roc_curve(
+            self.x_coords,
+            self.y_coords,
+            self.num_actives,
+            self.num_decoys,
+            self.alpha,
+            self.normalized_log_auc,
+            save_path=save_path,
+            dpi=dpi,
+        )
+
+
+def render_roc_plot(image_save_path: str, dpi: int = DEFAULT_ROC_PLOT_DPI) -> str:
+    """Renders the ROC plot whose data was saved next to `image_save_path`. Intended to be run in a worker process."""
+
+    ROCPlotData.load(ROCPlotData.get_data_file_path(image_save_path)).plot(save_path=image_save_path, dpi=dpi)
+
+    return image_save_path
+
+
+def render_roc_plot_if_missing(image_save_path: str, dpi: int = DEFAULT_ROC_PLOT_DPI) -> bool:
+    """Renders a deferred ROC plot on request. Returns whether the plot exists afterward."""
+
+    if os.path.exists(image_save_path):
+        return True
+    if not os.path.exists(ROCPlotData.get_data_file_path(image_save_path)):
+        return False
+
+    #
+    try:
+        render_roc_plot(image_save_path, dpi=dpi)
+    except Exception as e:
+        logger.warning(f"Failed to render ROC plot {image_save_path}: {e}")
+        return False
+
+    return True
+
+
+class ROCPlotRenderer(object):
+    """
+    Saves the data of each submitted ROC plot and renders the plot in a background process pool, so that the caller
+    never waits on matplotlib.
+
+    If `num_plots_to_render` is supplied, only plots submitted with a rank within it are rendered; the rest are only
+    recorded, and can be rendered later on request (see `render_roc_plot_if_missing`). Use as a context manager, or
+    call `wait` to block until all plots are rendered.
+    """
+
+    def __init__(
+        self,
+        dpi: int = DEFAULT_ROC_PLOT_DPI,
+        num_plots_to_render: Optional[int] = None,
+        num_workers: Optional[int] = None,
+    ):
+        self.dpi = dpi
+        self.num_plots_to_render = num_plots_to_render
+        if num_workers is None:
+            num_workers = min(DEFAULT_MAX_NUM_ROC_PLOT_RENDERING_WORKERS, os.cpu_count() or 1)
+        self.num_workers = max(1, num_workers)
+
+        #
+        self._executor = None  # started on first render, since many runs defer every plot
+        self._futures: List[Future] = []
+
+    def submit(self, plot_data: ROCPlotData, image_save_path: str, rank: Optional[int] = None) -> None:
+        # remove stale plot so that deferred plots are not mistaken for rendered ones
+        if os.path.exists(image_save_path):
+            os.remove(image_save_path)
+        plot_data.save(ROCPlotData.get_data_file_path(image_save_path))
+
+        #
+        if self.num_plots_to_render is not None and (rank is None or rank > self.num_plots_to_render):
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        self._futures.append(self._executor.submit(render_roc_plot, image_save_path, self.dpi))
+
+    def wait(self) -> None:
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"Failed to render ROC plot: {e}")
+        self._futures = []
+
+    def shutdown(self) -> None:
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "ROCPlotRenderer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.shutdown()
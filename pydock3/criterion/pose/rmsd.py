@@ -0,0 +1,210 @@
+import re
+import itertools
+import collections
+from typing import Iterable, List, Tuple, Dict, Optional
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from pydock3.criterion.criterion import Criterion
+from pydock3.files import Mol2File, Mol2Block, Mol2Headers
+from pydock3.blastermaster.pdb import PDBData
+
+
+#
+ATOM_MATCHING_METHODS = ["element", "name"]
+TWO_LETTER_ELEMENTS = ["Cl", "Br"]  # the only two-letter elements expected in a docked ligand
+MAX_NUM_ATOMS_TO_MATCH_BY_ENUMERATION = 6  # elements with at most this many atoms (720 matchings) are matched by trying every matching at once
+
+
+def get_element_of_atom_name(atom_name: str) -> str:
+    """Element of an atom name such as 'C12' or 'CL1' (leading digits, as in some PDB files, are ignored)."""
+
+    letters = re.sub(r"[^A-Za-z]", "", atom_name)
+    if letters[:2].capitalize() in TWO_LETTER_ELEMENTS:
+        return letters[:2].capitalize()
+
+    return letters[:1].upper()
+
+
+def load_reference_ligand(reference_ligand_file_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Atom names, elements, and coordinates (atoms x 3) of the heavy atoms of a reference ligand PDB file (e.g., xtal-lig.pdb)."""
+
+    pdb_data = PDBData(reference_ligand_file_path)
+    atom_names = np.array([name.strip() for name in pdb_data.atoms])
+    elements = []
+    for line, atom_name in zip(pdb_data.raw_data, atom_names):
+        element = line[76:78].strip().capitalize()  # element column is optional
+        elements.append(element if element else get_element_of_atom_name(atom_name))
+    elements = np.array(elements)
+    coords = np.array(pdb_data.coords, dtype=np.float64).reshape(-1, 3)
+
+    #
+    is_heavy = elements != "H"
+
+    return atom_names[is_heavy], elements[is_heavy], coords[is_heavy]
+
+
+def get_heavy_atoms_of_mol2_block(mol2_block: Mol2Block) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Atom names, elements (from the SYBYL atom types), and coordinates (atoms x 3) of the heavy atoms of a mol2 block."""
+
+    atom_rows = mol2_block.data_records[Mol2Headers.ATOM.name].data_rows
+    atom_names = np.array([row[1] for row in atom_rows])
+    elements = np.array([row[5].split(".")[0].capitalize() for row in atom_rows])
+    coords = np.array([[float(coord) for coord in row[2:5]] for row in atom_rows], dtype=np.float64).reshape(-1, 3)
+
+    #
+    is_heavy = elements != "H"
+
+    return atom_names[is_heavy], elements[is_heavy], coords[is_heavy]
+
+
+def get_molecule_name_of_mol2_block(mol2_block: Mol2Block) -> str:
+    return mol2_block.data_records[Mol2Headers.MOLECULE.name].data_rows[0][0]
+
+
+def get_pose_rmsds(
+    pose_coords: np.ndarray,
+    pose_atom_names: Iterable[str],
+    pose_elements: Iterable[str],
+    reference_coords: np.ndarray,
+    reference_atom_names: Iterable[str],
+    reference_elements: Iterable[str],
+    match_atoms_by: str = "element",
+) -> np.ndarray:
+    """
+    RMSD of each of a batch of poses (poses x atoms x 3), all having the same atoms, to a reference pose, without superposition.
+
+    If `match_atoms_by` is 'name', each reference atom is matched to the pose atom of the same name. If it is
+    'element', the atoms of each element are matched so as to minimize the RMSD, which is the symmetry-aware RMSD:
+    it does not depend on how symmetric groups or atom names happen to be numbered, and it is never greater than
+    the name-matched RMSD. The squared distances between all the atom pairs of every pose are computed in one
+    vectorized operation. Elements with at most `MAX_NUM_ATOMS_TO_MATCH_BY_ENUMERATION` atoms (e.g., heteroatoms)
+    are then matched for all poses at once by trying every matching; larger ones (e.g., carbons) are matched by
+    the Hungarian algorithm, one pose at a time.
+
+    Poses whose atoms cannot be matched to the reference's are given an RMSD of NaN.
+    """
+
+    pose_coords = np.asarray(pose_coords, dtype=np.float64)
+    if pose_coords.ndim == 2:
+        pose_coords = pose_coords[np.newaxis]
+    pose_atom_names = np.asarray(pose_atom_names)
+    pose_elements = np.asarray(pose_elements)
+    reference_coords = np.asarray(reference_coords, dtype=np.float64)
+    reference_atom_names = np.asarray(reference_atom_names)
+    reference_elements = np.asarray(reference_elements)
+    num_poses, num_atoms = pose_coords.shape[:2]
+
+    #
+    if num_atoms != reference_coords.shape[0] or num_atoms == 0:
+        return np.full(num_poses, np.nan)
+
+    #
+    if match_atoms_by == "name":
+        pose_atom_name_to_index = {atom_name: i for i, atom_name in enumerate(pose_atom_names)}
+        if len(pose_atom_name_to_index) != num_atoms or any(atom_name not in pose_atom_name_to_index for atom_name in reference_atom_names):
+            return np.full(num_poses, np.nan)
+        indices = np.array([pose_atom_name_to_index[atom_name] for atom_name in reference_atom_names])
+        sum_squared_distances = np.sum((pose_coords[:, indices, :] - reference_coords) ** 2, axis=(1, 2))
+    elif match_atoms_by == "element":
+        if collections.Counter(pose_elements.tolist()) != collections.Counter(reference_elements.tolist()):
+            return np.full(num_poses, np.nan)
+        sum_squared_distances = np.zeros(num_poses)
+        for element in np.unique(reference_elements):
+            element_pose_coords = pose_coords[:, pose_elements == element, :]
+            element_reference_coords = reference_coords[reference_elements == element]
+            squared_distances = np.sum((element_pose_coords[:, :, np.newaxis, :] - element_reference_coords[np.newaxis, np.newaxis, :, :]) ** 2, axis=3)  # poses x pose atoms x reference atoms
+            num_element_atoms = squared_distances.shape[1]
+            if num_element_atoms <= MAX_NUM_ATOMS_TO_MATCH_BY_ENUMERATION:
+                matchings = np.array(list(itertools.permutations(range(num_element_atoms))))  # matchings x pose atoms, giving the reference atom of each
+                sum_squared_distances += squared_distances[:, np.arange(num_element_atoms), matchings].sum(axis=2).min(axis=1)
+                continue
+            for i in range(num_poses):
+                row_indices, col_indices = linear_sum_assignment(squared_distances[i])
+                sum_squared_distances[i] += squared_distances[i, row_indices, col_indices].sum()
+    else:
+        raise ValueError(f"`match_atoms_by` must be one of: {ATOM_MATCHING_METHODS}. Witnessed: {match_atoms_by}")
+
+    return np.sqrt(sum_squared_distances / num_atoms)
+
+
+def get_pose_rmsds_of_mol2_blocks(
+    mol2_blocks: List[Mol2Block],
+    reference_ligand_file_path: str,
+    match_atoms_by: str = "element",
+) -> Dict[str, float]:
+    """Minimum RMSD to the reference ligand of the poses of each molecule in the supplied mol2 blocks (NaN for molecules whose atoms do not match the reference's)."""
+
+    reference_atom_names, reference_elements, reference_coords = load_reference_ligand(reference_ligand_file_path)
+
+    # poses with the same atoms are stacked so that each group is evaluated in one batch
+    atoms_to_molecule_names_and_coords = collections.defaultdict(lambda: ([], []))
+    for mol2_block in mol2_blocks:
+        atom_names, elements, coords = get_heavy_atoms_of_mol2_block(mol2_block)
+        molecule_names, coords_list = atoms_to_molecule_names_and_coords[(tuple(atom_names), tuple(elements))]
+        molecule_names.append(get_molecule_name_of_mol2_block(mol2_block))
+        coords_list.append(coords)
+
+    #
+    molecule_name_to_rmsd = {}
+    for (atom_names, elements), (molecule_names, coords_list) in atoms_to_molecule_names_and_coords.items():
+        rmsds = get_pose_rmsds(
+            np.stack(coords_list),
+            atom_names,
+            elements,
+            reference_coords,
+            reference_atom_names,
+            reference_elements,
+            match_atoms_by=match_atoms_by,
+        )
+        for molecule_name, rmsd in zip(molecule_names, rmsds):
+            molecule_name_to_rmsd[molecule_name] = np.fmin(molecule_name_to_rmsd.get(molecule_name, np.nan), rmsd)
+
+    return {molecule_name: float(rmsd) for molecule_name, rmsd in molecule_name_to_rmsd.items()}
+
+
+def get_pose_rmsds_of_mol2_file(
+    mol2_file_path: str,
+    reference_ligand_file_path: str,
+    match_atoms_by: str = "element",
+    molecule_names: Optional[Iterable[str]] = None,
+) -> Dict[str, float]:
+    """Minimum RMSD to the reference ligand of the poses of each molecule in a (possibly gzipped) mol2 file, e.g., the `test.mol2.gz` of a docking task.
+    If `molecule_names` is supplied, only the poses of those molecules are parsed."""
+
+    if molecule_names is None:
+        mol2_blocks = Mol2File.read_mol2_blocks(mol2_file_path)
+    else:
+        mol2_blocks = Mol2File.read_mol2_blocks_of_molecules(mol2_file_path, molecule_names)
+
+    return get_pose_rmsds_of_mol2_blocks(mol2_blocks, reference_ligand_file_path, match_atoms_by=match_atoms_by)
+
+
+class NegativePoseRMSD(Criterion):
+    """
+    Negative of the smallest RMSD to the reference ligand (e.g., xtal-lig.pdb) among the docked poses of the actives
+    whose heavy atoms match the reference's, so that, like every other criterion, higher is better.
+    """
+
+    def __init__(self, match_atoms_by: str = "element"):
+        super().__init__()
+
+        if match_atoms_by not in ATOM_MATCHING_METHODS:
+            raise ValueError(f"`match_atoms_by` must be one of: {ATOM_MATCHING_METHODS}. Witnessed: {match_atoms_by}")
+        self.match_atoms_by = match_atoms_by
+
+    @property
+    def name(self) -> str:
+        return "negative_pose_rmsd"
+
+    def calculate(
+        self,
+        mol2_file_path: str,
+        reference_ligand_file_path: str,
+    ) -> float:
+        rmsds = np.array(list(get_pose_rmsds_of_mol2_file(mol2_file_path, reference_ligand_file_path, match_atoms_by=self.match_atoms_by).values()), dtype=np.float64)
+        if np.all(np.isnan(rmsds)):
+            raise ValueError(f"No pose in {mol2_file_path} has heavy atoms matching those of reference ligand {reference_ligand_file_path}.")
+
+        return -float(np.nanmin(rmsds))
@@ -10,6 +10,11 @@
 #optional:
 # EXPORT_MOL2
 # SLEEP_SECONDS_AFTER_COPYING_OUTPUT
+# WRITE_MOL2_INDEX
+# WRITE_OUTDOCK_SCORES
+# PYTHON_EXEC
+# PARTIAL_OUTPUT_SYNC_SECONDS
+# DONE_MARKERS_DIR
 
 
 # set default for unset vars
@@ -19,12 +24,31 @@ fi
 if [[ -z $SLEEP_SECONDS_AFTER_COPYING_OUTPUT ]]; then
 	SLEEP_SECONDS_AFTER_COPYING_OUTPUT=0
 fi
+if [[ -z $WRITE_MOL2_INDEX ]]; then
+	WRITE_MOL2_INDEX=false
+fi
+if [[ -z $WRITE_OUTDOCK_SCORES ]]; then
+	WRITE_OUTDOCK_SCORES=false
+fi
+if [[ -z $PYTHON_EXEC ]]; then
+	PYTHON_EXEC=python3
+fi
+if [[ -z $PARTIAL_OUTPUT_SYNC_SECONDS ]]; then
+	PARTIAL_OUTPUT_SYNC_SECONDS=0
+fi
+if [[ -z $DONE_MARKERS_DIR ]]; then
+	DONE_MARKERS_DIR=${EXPORT_DEST}/done
+fi
 
 # get scheduler job / task IDs
 if ( ! [ -z $SLURM_ARRAY_JOB_ID ] ) && ( ! [ -z $SLURM_ARRAY_TASK_ID ] ); then
 	SCHEDULER_NAME="slurm"
 	JOB_ID=$SLURM_ARRAY_JOB_ID
 	TASK_ID=$SLURM_ARRAY_TASK_ID
+elif ( ! [ -z $LOCAL_ARRAY_JOB_ID ] ) && ( ! [ -z $LOCAL_ARRAY_TASK_ID ] ); then
+	SCHEDULER_NAME="local"
+	JOB_ID=$LOCAL_ARRAY_JOB_ID
+	TASK_ID=$LOCAL_ARRAY_TASK_ID
 elif ( ! [ -z $JOB_ID ] ) && ( ! [ -z $SGE_TASK_ID ] ); then
 	SCHEDULER_NAME="sge"
 	#JOB_ID=$JOB_ID # already set by SGE
@@ -50,6 +74,11 @@ log ARRAY_JOB_DOCKING_CONFIGURATIONS=$ARRAY_JOB_DOCKING_CONFIGURATIONS
 log INPUT_DIR=$INPUT_DIR
 log EXPORT_MOL2=$EXPORT_MOL2
 log SLEEP_SECONDS_AFTER_COPYING_OUTPUT=$SLEEP_SECONDS_AFTER_COPYING_OUTPUT
+log WRITE_MOL2_INDEX=$WRITE_MOL2_INDEX
+log WRITE_OUTDOCK_SCORES=$WRITE_OUTDOCK_SCORES
+log PYTHON_EXEC=$PYTHON_EXEC
+log PARTIAL_OUTPUT_SYNC_SECONDS=$PARTIAL_OUTPUT_SYNC_SECONDS
+log DONE_MARKERS_DIR=$DONE_MARKERS_DIR
 
 # validate required environmental variables
 for var in EXPORT_DEST DOCKFILES TMPDIR ARRAY_JOB_DOCKING_CONFIGURATIONS INPUT_DIR; do
@@ -59,6 +88,14 @@ for var in EXPORT_DEST DOCKFILES TMPDIR ARRAY_JOB_DOCKING_CONFIGURATIONS INPUT_D
 	fi
 done
 
+# post-processing steps run python on this node, so fail loudly rather than silently skip them
+if $WRITE_OUTDOCK_SCORES || $WRITE_MOL2_INDEX; then
+	if ! command -v $PYTHON_EXEC > /dev/null 2>&1; then
+		echo "PYTHON_EXEC ($PYTHON_EXEC) is not executable on $(hostname), but is required to write OUTDOCK scores / mol2 index" 1>&2
+		exit 1
+	fi
+fi
+
 # initialize all our important variables & directories
 JOB_DIR=${TMPDIR}/$(whoami)/${SCHEDULER_NAME}_${JOB_ID}_${TASK_ID}
 DOCKFILES_TEMP=$JOB_DIR/working/dockfiles
@@ -172,7 +209,24 @@ function notify_dock {
 
 trap notify_dock SIGUSR1
 
+# periodically sync the OUTDOCK written so far so that the head node can evaluate the task before it completes
+# (name must not contain "OUTDOCK" since cleanup counts those files)
+if [ $PARTIAL_OUTPUT_SYNC_SECONDS -gt 0 ]; then
+	(
+		while kill -0 $dockpid 2>/dev/null; do
+			sleep $PARTIAL_OUTPUT_SYNC_SECONDS
+			if [ -f $JOB_DIR/working/OUTDOCK ]; then
+				cp $JOB_DIR/working/OUTDOCK $OUTPUT/partial_dock_results.tmp && mv -f $OUTPUT/partial_dock_results.tmp $OUTPUT/partial_dock_results
+			fi
+		done
+	) &
+	syncpid=$!
+fi
+
 wait $dockpid
+if ! [ -z $syncpid ]; then
+	kill $syncpid 2>/dev/null
+fi
 sleep 5 # bash script seems to jump the gun and start cleanup prematurely when DOCK is interrupted. This is stupid but effective at preventing this
 
 # don't feel like editing DOCK src to change the exit code generated on interrupt, instead grep OUTDOCK for the telltale message
@@ -194,11 +248,29 @@ function cleanup {
 		nlog=0
 	fi
 
-	cp -p $JOB_DIR/working/OUTDOCK $OUTPUT/OUTDOCK.$nout
+	if $WRITE_OUTDOCK_SCORES; then
+	  # reduce OUTDOCK to a compact scores file here so that the head node need not parse it
+	  # (copied before OUTDOCK & the done marker since the done marker signals that the task is complete)
+	  $PYTHON_EXEC -m pydock3.docking.task_postprocessing write_outdock_scores $JOB_DIR/working/OUTDOCK || log "failed to write OUTDOCK scores"
+	  if [ -f $JOB_DIR/working/scores.npz ]; then
+	    cp -p $JOB_DIR/working/scores.npz $OUTPUT/scores.$nout.npz
+	  fi
+	fi
 
+	# poses are also copied before OUTDOCK, so that they can be evaluated as soon as the task is complete
 	if $EXPORT_MOL2; then
+	  if $WRITE_MOL2_INDEX; then
+	    # index poses by gzip member offset so that they can be extracted without decompressing the whole file
+	    $PYTHON_EXEC -m pydock3.docking.task_postprocessing write_mol2_index $JOB_DIR/working/test.mol2.gz || log "failed to write mol2 index"
+	  fi
 	  cp -p $JOB_DIR/working/test.mol2.gz $OUTPUT/test.mol2.gz.$nout
+	  if [ -f $JOB_DIR/working/test.mol2.gz.index ]; then
+	    cp -p $JOB_DIR/working/test.mol2.gz.index $OUTPUT/test.mol2.gz.$nout.index
+	  fi
   fi
+	cp -p $JOB_DIR/working/OUTDOCK $OUTPUT/OUTDOCK.$nout
+	rm -f $OUTPUT/partial_dock_results $OUTPUT/partial_dock_results.tmp
+
 	cp -p $LOG_OUT $OUTPUT/$nout.out
 	cp -p $LOG_ERR $OUTPUT/$nout.err
 
@@ -210,6 +282,11 @@ function cleanup {
 
 	chmod -R 777 $OUTPUT  # TODO: is this necessary? try to remove
 
+	# publish done marker last & atomically (by rename) so that the head node can detect completion with one watch / scan of the markers dir
+	# (names must not contain "OUTDOCK")
+	mkdir -p $DONE_MARKERS_DIR
+	echo $nout > $DONE_MARKERS_DIR/.${TASK_ID}.tmp && mv -f $DONE_MARKERS_DIR/.${TASK_ID}.tmp $DONE_MARKERS_DIR/${TASK_ID}
+
 	rm -rf $JOB_DIR
 
   sleep $SLEEP_SECONDS_AFTER_COPYING_OUTPUT  # apparently necessary in order to prevent bug witnessed using DockOpt with Slurm on Gimel where OUTDOCK fails to appear by the time job has left queue
@@ -0,0 +1,80 @@
+"""Post-processing of the output of a single docking task, run by `rundock.bash` on the compute node.
+
+Usage:
+    python -m pydock3.docking.task_postprocessing write_mol2_index <mol2_file_path>
+    python -m pydock3.docking.task_postprocessing write_outdock_scores <outdock_file_path>
+"""
+
+import gzip
+import logging
+import os
+import uuid
+
+import fire
+
+from pydock3.files import File, Mol2RecordScanner, Mol2IndexFile, OutdockScoresFile
+
+
+#
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+#
+DEFAULT_GZIP_MEMBER_SIZE = 1024 * 1024  # decompressed bytes per gzip member
+
+
+def rewrite_mol2_file_as_gzip_members(mol2_file_path: str, member_size: int = DEFAULT_GZIP_MEMBER_SIZE) -> None:
+    """Rewrites the supplied mol2 file as concatenated gzip members of about `member_size` decompressed bytes each.
+
+    Members only ever end at record boundaries, so that any pose can be read by seeking to the
+    start of the member containing it. The result is still a valid gzip file."""
+
+    temp_file_path = f"{mol2_file_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_file_path, "wb") as f:
+        pieces = []
+        num_buffered_bytes = 0
+        for record in Mol2RecordScanner(mol2_file_path).iter_records():
+            pieces.append(bytes(record))
+            num_buffered_bytes += len(record)
+            if num_buffered_bytes >= member_size:
+                f.write(gzip.compress(b"".join(pieces)))
+                pieces = []
+                num_buffered_bytes = 0
+        if pieces:
+            f.write(gzip.compress(b"".join(pieces)))
+    os.replace(temp_file_path, mol2_file_path)
+
+
+def write_mol2_index(mol2_file_path: str, reblock: bool = True, member_size: int = DEFAULT_GZIP_MEMBER_SIZE) -> None:
+    """Writes the index sidecar of the supplied mol2 file (see `Mol2IndexFile`).
+
+    If `reblock` is True and the mol2 file is gzipped, it is first rewritten as many small gzip
+    members, since DOCK writes a single gzip stream, which cannot be seeked into."""
+
+    File.validate_file_exists(mol2_file_path)
+
+    #
+    if reblock and File.file_is_gzipped(mol2_file_path):
+        rewrite_mol2_file_as_gzip_members(mol2_file_path, member_size=member_size)
+
+    #
+    index_file = Mol2IndexFile.create_for_mol2_file(mol2_file_path)
+    logger.info(f"Wrote mol2 index: {index_file.path}")
+
+
+def write_outdock_scores(outdock_file_path: str) -> None:
+    """Writes the scores file of the supplied OUTDOCK file (see `OutdockScoresFile`), so that the head node need not parse the OUTDOCK file."""
+
+    File.validate_file_exists(outdock_file_path)
+
+    #
+    scores_file = OutdockScoresFile.create_for_outdock_file(outdock_file_path)
+    logger.info(f"Wrote OUTDOCK scores: {scores_file.path}")
+
+
+if __name__ == "__main__":
+    fire.Fire({
+        "write_mol2_index": write_mol2_index,
+        "write_outdock_scores": write_outdock_scores,
+    })
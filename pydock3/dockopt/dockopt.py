@@ -13,6 +13,7 @@ from datetime import datetime, timedelta
 import tarfile
 import re
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 
 import networkx as nx
 import pandas as pd
@@ -39,6 +40,7 @@ from pydock3.files import (
     Dir,
     File,
     OutdockFile,
+    load_outdock_scores_dataframe,
 )
 from pydock3.blastermaster.util import (
     BLASTER_FILE_IDENTIFIER_TO_PROPER_BLASTER_FILE_NAME_DICT,
@@ -47,13 +49,19 @@ from pydock3.blastermaster.util import (
     BlasterFile,
     BlasterStep,
 )
-from pydock3.jobs import ArrayDockingJob
-from pydock3.job_schedulers import SlurmJobScheduler, SGEJobScheduler
+from pydock3.jobs import ArrayDockingJob, OUTDOCK_FILE_NAME
+from pydock3.job_schedulers import SlurmJobScheduler, SGEJobScheduler, LocalJobScheduler
 from pydock3.dockopt import __file__ as DOCKOPT_INIT_FILE_PATH
 from pydock3.retrodock.retrodock import log_job_submission_result, get_results_dataframe_from_actives_job_and_decoys_job_outdock_files, sort_by_energy_and_drop_duplicate_molecules
 from pydock3.blastermaster.util import DEFAULT_FILES_DIR_PATH
 from pydock3.dockopt.results import DockoptStepResultsManager, DockoptStepSequenceIterationResultsManager, DockoptStepSequenceResultsManager
-from pydock3.criterion.enrichment.logauc import NormalizedLogAUC
+from pydock3.criterion.criterion import Criterion
+from pydock3.criterion.enrichment.logauc import NormalizedLogAUC, TieAwareNormalizedLogAUC
+from pydock3.criterion.enrichment.metrics import ROCAUC, PRAUC, EnrichmentFactor, BEDROC, get_enrichment_metrics
+from pydock3.criterion.enrichment.confidence_interval import CONFIDENCE_INTERVAL_METHODS, get_confidence_interval
+from pydock3.criterion.enrichment.roc_plot import DEFAULT_ROC_PLOT_DPI
+from pydock3.criterion.enrichment.online_logauc import OnlineLogAUCEstimator
+from pydock3.criterion.pose.rmsd import NegativePoseRMSD
 from pydock3.dockopt.pipeline import PipelineComponent, PipelineComponentSequence, PipelineComponentSequenceIteration, Pipeline
 from pydock3.dockopt.parameters import DockoptComponentParametersManager
 from pydock3.dockopt.docking_configuration import DockingConfiguration, DockFileCoordinates, DockFileCoordinate, IndockFileCoordinate
@@ -69,15 +77,171 @@ logger.setLevel(logging.DEBUG)
 SCHEDULER_NAME_TO_CLASS_DICT = {
     "sge": SGEJobScheduler,
     "slurm": SlurmJobScheduler,
+    "local": LocalJobScheduler,
 }
 
 #
-CRITERION_CLASS_DICT = {"normalized_log_auc": NormalizedLogAUC}
+CRITERION_CLASS_DICT = {
+    "normalized_log_auc": NormalizedLogAUC,
+    "tie_aware_normalized_log_auc": TieAwareNormalizedLogAUC,
+    "roc_auc": ROCAUC,
+    "pr_auc": PRAUC,
+    "enrichment_factor": EnrichmentFactor,
+    "bedroc": BEDROC,
+    "negative_pose_rmsd": NegativePoseRMSD,
+}
 
 #
 MIN_SECONDS_BETWEEN_QUEUE_CHECKS = 2
 MIN_SECONDS_BETWEEN_TASK_OUTPUT_DETECTION_REATTEMPTS = 30
 MIN_SECONDS_BETWEEN_TASK_OUTPUT_LOADING_REATTEMPTS = 30
+MIN_SECONDS_BETWEEN_PARTIAL_TASK_OUTPUT_CHECKS = 60
+MIN_SECONDS_BETWEEN_SUBMISSION_WINDOW_REFILLS = 10
+DEFAULT_MAX_NUM_RESULT_PROCESSING_WORKERS = 4
+
+
+@dataclass
+class RetrodockTaskResult:
+    """Summary of the results of a retrodock task, small enough to be cheaply returned by a worker process."""
+    task_id: str
+    actives_outdock_file_path: Optional[str] = None
+    decoys_outdock_file_path: Optional[str] = None
+    criterion_value: Optional[float] = None
+    criterion_confidence_interval: Optional[Tuple[float, float]] = None
+    enrichment_metrics: Optional[Dict[str, float]] = None  # every metric of `get_enrichment_metrics`, whichever the criterion
+    num_actives_scored: int = 0
+    num_decoys_scored: int = 0
+    num_active_db2_files_scored: int = 0
+    num_decoy_db2_files_scored: int = 0
+    processing_seconds: float = 0.
+    loading_error: Optional[str] = None  # set if the OUTDOCK files could not be loaded
+    criterion_error: Optional[str] = None  # set if the OUTDOCK files were loaded but the criterion could not be evaluated (re-docking would not help)
+
+
+def process_retrodock_task_outdock_files(
+        task_id: str,
+        actives_outdock_file_path: str,
+        decoys_outdock_file_path: str,
+        criterion: Criterion,
+        confidence_interval_method: Optional[str] = None,
+        actives_mol2_file_path: Optional[str] = None,
+        reference_ligand_file_path: Optional[str] = None,
+) -> RetrodockTaskResult:
+    """Load the OUTDOCK files of a completed retrodock task and evaluate the criterion (and, if `confidence_interval_method` is supplied, its confidence interval). Intended to be run in a worker process.
+
+    Pose criteria are evaluated on the poses of the actives in `actives_mol2_file_path` against the ligand in `reference_ligand_file_path`."""
+
+    start_time = time.time()
+    task_result = RetrodockTaskResult(
+        task_id=task_id,
+        actives_outdock_file_path=actives_outdock_file_path,
+        decoys_outdock_file_path=decoys_outdock_file_path,
+    )
+
+    # load outdock files and get dataframe
+    try:
+        # get dataframe of actives job results and decoys job results combined
+        df = get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
+            actives_outdock_file_path, decoys_outdock_file_path
+        )
+    except Exception:
+        try:
+            time.sleep(0.01)  # sleep for a bit and try again
+            df = get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
+                actives_outdock_file_path, decoys_outdock_file_path
+            )
+        except Exception as e:
+            task_result.loading_error = str(e)
+            return task_result
+
+    # count scored molecules
+    task_result.num_active_db2_files_scored = df[df['is_active'].astype(bool)]['db2_file_path'].nunique()
+    task_result.num_decoy_db2_files_scored = df[~df['is_active'].astype(bool)]['db2_file_path'].nunique()
+
+    # sort dataframe by total energy score and drop duplicate molecules
+    df = sort_by_energy_and_drop_duplicate_molecules(df)
+    task_result.num_actives_scored = int(df['is_active'].sum())
+    task_result.num_decoys_scored = int(len(df) - task_result.num_actives_scored)
+
+    # calculate all enrichment metrics of this job's docking set-up from the one sorted ranking
+    booleans = df["is_active"].to_numpy(dtype=bool)
+    task_result.enrichment_metrics = get_enrichment_metrics(booleans, energies=df["total_energy"].to_numpy(dtype=float))
+    if criterion.name in task_result.enrichment_metrics:
+        task_result.criterion_value = task_result.enrichment_metrics[criterion.name]
+    elif isinstance(criterion, NegativePoseRMSD):
+        try:
+            task_result.criterion_value = criterion.calculate(actives_mol2_file_path, reference_ligand_file_path)
+        except Exception as e:
+            task_result.criterion_error = str(e)
+            return task_result
+    else:
+        task_result.criterion_value = float(criterion.calculate(booleans))
+    if confidence_interval_method is not None and isinstance(criterion, NormalizedLogAUC):
+        try:
+            task_result.criterion_confidence_interval = get_confidence_interval(booleans, method=confidence_interval_method)
+        except ValueError as e:  # e.g., too few actives or decoys scored to resample (re-docking would not help)
+            logger.warning(f"Skipping confidence interval of task {task_id}: {e}")
+
+    #
+    task_result.processing_seconds = time.time() - start_time
+
+    return task_result
+
+
+class SubmissionWindow(object):
+    """
+    Docking configurations awaiting submission, released so that at most `size` of them are on the job scheduler
+    at a time. Configurations are released when the window is empty or, to batch submissions, at most once every
+    `min_seconds_between_refills`.
+    """
+
+    def __init__(
+        self,
+        docking_configurations: Iterable[DockingConfiguration],
+        size: int,
+        min_seconds_between_refills: float = MIN_SECONDS_BETWEEN_SUBMISSION_WINDOW_REFILLS,
+    ):
+        if size < 1:
+            raise ValueError(f"Submission window size must be at least 1. Witnessed: {size}")
+        self.size = size
+        self.min_seconds_between_refills = min_seconds_between_refills
+
+        #
+        self.docking_configurations_awaiting_submission = collections.deque(docking_configurations)
+        self.task_ids_in_window = set()
+        self._datetime_last_refilled = datetime.min
+
+    @property
+    def num_docking_configurations_awaiting_submission(self) -> int:
+        return len(self.docking_configurations_awaiting_submission)
+
+    def pop_docking_configurations_to_submit(self) -> List[DockingConfiguration]:
+        """Docking configurations to submit now to refill the window (possibly none). They count as in the window until released."""
+
+        if self.num_docking_configurations_awaiting_submission == 0 or len(self.task_ids_in_window) >= self.size:
+            return []
+        if len(self.task_ids_in_window) > 0 and datetime.now() < (self._datetime_last_refilled + timedelta(seconds=self.min_seconds_between_refills)):
+            return []
+
+        #
+        self._datetime_last_refilled = datetime.now()
+        docking_configurations_to_submit = [
+            self.docking_configurations_awaiting_submission.popleft()
+            for _ in range(min(self.size - len(self.task_ids_in_window), self.num_docking_configurations_awaiting_submission))
+        ]
+        self.task_ids_in_window.update(str(dc.configuration_num) for dc in docking_configurations_to_submit)
+
+        return docking_configurations_to_submit
+
+    def release(self, task_id: str) -> None:
+        """Frees the slot of a task that has left the job scheduler queue (complete, cancelled, or given up on)."""
+
+        self.task_ids_in_window.discard(task_id)
+
+    def hold(self, task_id: str) -> None:
+        """Takes a slot for a task that was resubmitted after it had been released."""
+
+        self.task_ids_in_window.add(task_id)
 
 
 @dataclass
@@ -92,7 +256,13 @@ class DockoptPipelineComponentRunFuncArgSet:  # TODO: rename?
     sleep_seconds_after_copying_output: int = 0
     export_decoys_mol2: bool = False
     delete_intermediate_files: bool = False
-    max_scheduler_jobs_running_at_a_time: Optional[int] = None
+    max_scheduler_jobs_running_at_a_time: Optional[int] = None  # if set, tasks are submitted in a window that keeps at most this many array tasks queued or running
+    num_result_processing_workers: Optional[int] = None
+    confidence_interval_method: Optional[str] = None
+    early_termination_sync_seconds: int = 0  # if > 0, decoys' partial OUTDOCKs are synced at this interval & tasks that can no longer make the top n are cancelled
+    write_outdock_scores: bool = False  # if True, each task writes a compact scores file next to its OUTDOCK (requires this python on the compute nodes)
+    roc_plot_dpi: int = DEFAULT_ROC_PLOT_DPI
+    num_roc_plots_to_render: Optional[int] = None  # if set, only the ROC plots of the best this many jobs of each step are rendered (the rest on request)
 
 
 class Dockopt(Script):
@@ -189,7 +359,13 @@ class Dockopt(Script):
         sleep_seconds_after_copying_output: int = 0,
         export_decoys_mol2: bool = False,
         delete_intermediate_files: bool = False,
-        #max_scheduler_jobs_running_at_a_time: Optional[str] = None,  # TODO
+        max_scheduler_jobs_running_at_a_time: Optional[int] = None,
+        num_result_processing_workers: Optional[int] = None,
+        confidence_interval_method: Optional[str] = None,
+        early_termination_sync_seconds: int = 0,
+        write_outdock_scores: bool = False,
+        roc_plot_dpi: int = DEFAULT_ROC_PLOT_DPI,
+        num_roc_plots_to_render: Optional[int] = None,
         force_redock: bool = False,
         force_rewrite_results: bool = False,
         force_rewrite_report: bool = False,
@@ -226,6 +402,26 @@ class Dockopt(Script):
             )
             return
 
+        if max_scheduler_jobs_running_at_a_time is not None and max_scheduler_jobs_running_at_a_time < 2:
+            logger.error(
+                "max_scheduler_jobs_running_at_a_time flag must be at least 2 (each docking configuration runs as one actives task & one decoys task)"
+            )
+            return
+
+        if confidence_interval_method is not None and confidence_interval_method not in CONFIDENCE_INTERVAL_METHODS:
+            logger.error(
+                f"confidence_interval_method flag must be one of: {CONFIDENCE_INTERVAL_METHODS}"
+            )
+            return
+
+        if roc_plot_dpi < 1:
+            logger.error("roc_plot_dpi flag must be at least 1")
+            return
+
+        if num_roc_plots_to_render is not None and num_roc_plots_to_render < 0:
+            logger.error("num_roc_plots_to_render flag must be at least 0")
+            return
+
         #
         try:
             scheduler = SCHEDULER_NAME_TO_CLASS_DICT[scheduler]()
@@ -259,7 +455,13 @@ class Dockopt(Script):
             sleep_seconds_after_copying_output=sleep_seconds_after_copying_output,
             export_decoys_mol2=export_decoys_mol2,
             delete_intermediate_files=delete_intermediate_files,
-            #max_scheduler_jobs_running_at_a_time=max_scheduler_jobs_running_at_a_time,  # TODO: move checking of this to this class?
+            max_scheduler_jobs_running_at_a_time=max_scheduler_jobs_running_at_a_time,
+            num_result_processing_workers=num_result_processing_workers,
+            confidence_interval_method=confidence_interval_method,
+            early_termination_sync_seconds=early_termination_sync_seconds,
+            write_outdock_scores=write_outdock_scores,
+            roc_plot_dpi=roc_plot_dpi,
+            num_roc_plots_to_render=num_roc_plots_to_render,
         )
 
         #
@@ -352,6 +554,14 @@ class DockoptStep(PipelineComponent):
             reset=False,
         )
 
+        # crystal ligand, against which pose criteria are evaluated (named as it was copied in above, whether supplied or backup)
+        self.reference_ligand_file_path = os.path.join(
+            self.working_dir.path,
+            new_backup_file_names[blaster_file_names.index(BLASTER_FILE_IDENTIFIER_TO_PROPER_BLASTER_FILE_NAME_DICT['ligand_file'])],
+        )
+        if isinstance(self.criterion, NegativePoseRMSD) and not File.file_exists(self.reference_ligand_file_path):
+            raise Exception(f"Criterion `{self.criterion.name}` requires a reference ligand file, but none was found: {self.reference_ligand_file_path}")
+
         #
         self.best_retrodock_jobs_dir = Dir(
             path=os.path.join(self.component_dir.path, BEST_RETRODOCK_JOBS_DIR_NAME),
@@ -754,6 +964,59 @@ class DockoptStep(PipelineComponent):
 
         return new_dc_kwargs_sorted
 
+    @staticmethod
+    def _submit_docking_configurations(
+        docking_configurations: List[DockingConfiguration],
+        chunk_to_array_jobs: Dict[int, List[ArrayDockingJob]],
+        max_task_array_size: int,
+        force_redock: bool,
+    ) -> None:
+        """Submits the tasks of the supplied docking configurations, one submission per array job."""
+
+        chunk_id_to_task_ids = collections.defaultdict(list)
+        for dc in docking_configurations:
+            chunk_id_to_task_ids[(int(dc.configuration_num) - 1) // max_task_array_size].append(str(dc.configuration_num))
+
+        #
+        for chunk_id, task_ids in chunk_id_to_task_ids.items():
+            for array_job in chunk_to_array_jobs[chunk_id]:
+                sub_result, procs = array_job.submit_tasks(
+                    task_ids,
+                    skip_if_complete=(not force_redock),
+                )
+                log_job_submission_result(array_job, sub_result, procs)
+
+    def get_upper_bound_of_incomplete_task_criterion_value(
+        self,
+        task_id: str,
+        actives_array_job: ArrayDockingJob,
+        decoys_array_job: ArrayDockingJob,
+        task_id_to_online_log_auc_estimator: Dict[str, OnlineLogAUCEstimator],
+    ) -> Optional[float]:
+        """Upper bound on the final normalized LogAUC of a task whose actives are done docking but whose decoys are
+        still docking, from the decoy scores synced so far. None if no bound is available yet."""
+
+        if not actives_array_job.task_is_complete(task_id) or decoys_array_job.task_is_complete(task_id):
+            return None
+        partial_outdock_file_path = decoys_array_job.get_partial_outdock_file_path(task_id)
+        if not File.file_exists(partial_outdock_file_path):
+            return None
+
+        #
+        try:
+            if task_id not in task_id_to_online_log_auc_estimator:
+                df = load_outdock_scores_dataframe(os.path.join(actives_array_job.job_dir.path, task_id, OUTDOCK_FILE_NAME))
+                active_energies = pd.to_numeric(df["Total"], errors="coerce").groupby(df["id_num"].astype(str)).min()
+                task_id_to_online_log_auc_estimator[task_id] = OnlineLogAUCEstimator(
+                    active_energies.to_numpy(), self.retrospective_dataset.num_molecules_in_decoy_class
+                )
+            estimator = task_id_to_online_log_auc_estimator[task_id]
+            estimator.update_from_partial_outdock_file(partial_outdock_file_path)
+            return estimator.get_upper_bound()
+        except Exception as e:
+            logger.debug(f"Failed to bound criterion value of incomplete task {task_id}: {e}")
+            return None
+
     def run(
             self, 
             component_run_func_arg_set: DockoptPipelineComponentRunFuncArgSet,
@@ -763,6 +1026,10 @@ class DockoptStep(PipelineComponent):
         ) -> pd.DataFrame:
         """Run this component of the pipeline."""
 
+        # ROC plot settings of the best jobs, which the results manager saves once this returns
+        self.results_manager.roc_plot_dpi = component_run_func_arg_set.roc_plot_dpi
+        self.results_manager.num_roc_plots_to_render = component_run_func_arg_set.num_roc_plots_to_render
+
         # run necessary steps to get all dock files
         logger.info("Generating docking configurations")
         for dc in self.docking_configurations:
@@ -830,21 +1097,36 @@ class DockoptStep(PipelineComponent):
                     sleep_seconds_after_copying_output=component_run_func_arg_set.sleep_seconds_after_copying_output,
                     # max_reattempts=component_run_func_arg_set.retrodock_job_max_reattempts,  # TODO
                     export_mol2=should_export_mol2,
-                )
-                sub_result, procs = array_job.submit_all_tasks(
-                    skip_if_complete=(not force_redock),
+                    write_outdock_scores=component_run_func_arg_set.write_outdock_scores,
+                    partial_output_sync_seconds=(component_run_func_arg_set.early_termination_sync_seconds if sub_dir_name == 'decoys' else 0),
+                    max_tasks_running_at_a_time=component_run_func_arg_set.max_scheduler_jobs_running_at_a_time,
                 )
                 chunk_array_jobs.append(array_job)
-                log_job_submission_result(array_job, sub_result, procs)
 
             chunk_to_array_jobs[i] = chunk_array_jobs
 
-        # make a queue of tuples containing job-relevant data for processing
-        docking_configurations_processing_queue = collections.deque(deepcopy(self.docking_configurations))
+        # submit retrodock jobs, either all at once or, if the number of scheduler jobs running at a time is limited,
+        # in a window that is refilled as tasks finish (each docking configuration takes two slots: actives & decoys)
+        if component_run_func_arg_set.max_scheduler_jobs_running_at_a_time is None:
+            submission_window = None
+            for chunk_array_jobs in chunk_to_array_jobs.values():
+                for array_job in chunk_array_jobs:
+                    sub_result, procs = array_job.submit_all_tasks(
+                        skip_if_complete=(not force_redock),
+                    )
+                    log_job_submission_result(array_job, sub_result, procs)
+            docking_configurations_processing_queue = collections.deque(deepcopy(self.docking_configurations))
+        else:
+            submission_window = SubmissionWindow(
+                deepcopy(self.docking_configurations),
+                size=max(1, component_run_func_arg_set.max_scheduler_jobs_running_at_a_time // 2),
+            )
+            logger.info(f"Submitting tasks in a window of at most {submission_window.size} docking configurations at a time")
+            docking_configurations_processing_queue = collections.deque()
 
         # process results of docking jobs
         logger.info(
-            f"Awaiting / processing ({len(docking_configurations_processing_queue)} tasks in total)"
+            f"Awaiting / processing ({len(self.docking_configurations)} tasks in total)"
         )
         data_dicts = []
         task_id_to_num_reattempts_dict = collections.defaultdict(int)
@@ -853,177 +1135,272 @@ class DockoptStep(PipelineComponent):
         max_task_output_detection_reattempts = 1
         max_task_output_loading_reattempts = 1
         datetime_queue_was_last_checked = datetime.min
-        task_id_to_datetime_task_output_detection_was_last_attempted_dict = {str(d.configuration_num): datetime.min for d in docking_configurations_processing_queue}
-        task_id_to_datetime_task_output_loading_was_last_attempted_dict = {str(d.configuration_num): datetime.min for d in docking_configurations_processing_queue}
-        while len(docking_configurations_processing_queue) > 0:
-            docking_configuration = docking_configurations_processing_queue.popleft()
-            task_id = str(docking_configuration.configuration_num)
-            chunk_id = (int(task_id) - 1) // max_task_array_size  # Determine which chunk this task belongs to
-            array_jobs = chunk_to_array_jobs[chunk_id]  # Get the corresponding array jobs for this task
+        task_id_to_datetime_task_output_detection_was_last_attempted_dict = {str(d.configuration_num): datetime.min for d in self.docking_configurations}
+        task_id_to_datetime_task_output_loading_was_last_attempted_dict = {str(d.configuration_num): datetime.min for d in self.docking_configurations}
+
+        # tasks whose decoys are still docking are cancelled once they provably cannot make the top n (only possible for normalized LogAUC)
+        early_termination_is_enabled = component_run_func_arg_set.early_termination_sync_seconds > 0 and isinstance(self.criterion, NormalizedLogAUC)
+        task_id_to_online_log_auc_estimator = {}
+        task_id_to_datetime_partial_task_output_was_last_checked_dict = {str(d.configuration_num): datetime.min for d in self.docking_configurations}
+        cancelled_task_ids = set()
+
+        # OUTDOCK files of completed tasks are loaded & evaluated by a pool of worker processes so that the polling loop never waits on them
+        if component_run_func_arg_set.num_result_processing_workers is None:
+            num_result_processing_workers = min(DEFAULT_MAX_NUM_RESULT_PROCESSING_WORKERS, os.cpu_count() or 1)
+        else:
+            num_result_processing_workers = max(1, component_run_func_arg_set.num_result_processing_workers)
+        task_id_to_docking_configuration_and_future = {}
+        with ProcessPoolExecutor(max_workers=num_result_processing_workers) as result_processing_executor:
+            while (
+                len(docking_configurations_processing_queue) > 0
+                or len(task_id_to_docking_configuration_and_future) > 0
+                or (submission_window is not None and submission_window.num_docking_configurations_awaiting_submission > 0)
+            ):
+                # submit more tasks as tasks in the submission window finish
+                if submission_window is not None:
+                    docking_configurations_to_submit = submission_window.pop_docking_configurations_to_submit()
+                    if docking_configurations_to_submit:
+                        self._submit_docking_configurations(docking_configurations_to_submit, chunk_to_array_jobs, max_task_array_size, force_redock)
+                        docking_configurations_processing_queue.extend(docking_configurations_to_submit)
+
+                # handle results returned by worker processes
+                for task_id, (docking_configuration, future) in list(task_id_to_docking_configuration_and_future.items()):
+                    if not future.done():
+                        continue
+                    del task_id_to_docking_configuration_and_future[task_id]
+                    chunk_id = (int(task_id) - 1) // max_task_array_size  # Determine which chunk this task belongs to
+                    array_jobs = chunk_to_array_jobs[chunk_id]  # Get the corresponding array jobs for this task
 
-            actives_outdock_file_path = os.path.join(self.retrodock_jobs_dir.path, 'actives', task_id, 'OUTDOCK.0')
-            decoys_outdock_file_path = os.path.join(self.retrodock_jobs_dir.path, 'decoys', task_id, 'OUTDOCK.0')
+                    #
+                    try:
+                        task_result = future.result()
+                    except Exception as e:  # e.g., worker process died
+                        task_result = RetrodockTaskResult(
+                            task_id=task_id,
+                            actives_outdock_file_path=os.path.join(self.retrodock_jobs_dir.path, 'actives', task_id, OUTDOCK_FILE_NAME),
+                            decoys_outdock_file_path=os.path.join(self.retrodock_jobs_dir.path, 'decoys', task_id, OUTDOCK_FILE_NAME),
+                            loading_error=f"{type(e).__name__}: {e}",
+                        )
 
-            #
-            if any([not array_job.task_is_complete(task_id) for array_job in array_jobs]):  # one or both OUTDOCK files do not exist yet
-                time.sleep(
-                    0.01
-                )  # sleep for a bit
+                    # if outdock files failed to be parsed then re-attempt task
+                    if task_result.loading_error is not None:
+                        #
+                        if datetime.now() < (task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] + timedelta(seconds=MIN_SECONDS_BETWEEN_TASK_OUTPUT_LOADING_REATTEMPTS)):
+                            task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] = datetime.now()
+                            docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
+                            continue  # move on to next result in order to more efficiently use time between reattempts
+                        task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] = datetime.now()
 
-                #
-                datetime_now = datetime.now()
-                if datetime_now < (datetime_queue_was_last_checked + timedelta(seconds=MIN_SECONDS_BETWEEN_QUEUE_CHECKS)):
-                    docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
-                    continue  # move on to next in queue in order to more efficiently use time between queue checks
+                        #
+                        task_id_to_num_task_output_loading_failed_attempts_dict[task_id] += 1
+                        logger.warning(f"Failed to load output for task {task_id} due to error: {task_result.loading_error}")
 
-                #
-                datetime_queue_was_last_checked = datetime.now()
-                if any([job.task_failed(task_id) for job in array_jobs]):
-                    #
-                    if datetime.now() < (task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] + timedelta(seconds=MIN_SECONDS_BETWEEN_TASK_OUTPUT_DETECTION_REATTEMPTS)):
-                        task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] = datetime.now()
+                        #
+                        if task_id_to_num_task_output_loading_failed_attempts_dict[task_id] > max_task_output_detection_reattempts:
+                            if task_id_to_num_reattempts_dict[task_id] + 1 > component_run_func_arg_set.retrodock_job_max_reattempts:
+                                logger.warning(
+                                    f"Maximum allowed attempts ({component_run_func_arg_set.retrodock_job_max_reattempts + 1}) exhausted for task {task_id}"
+                                )
+                                if not component_run_func_arg_set.allow_failed_retrodock_jobs:
+                                    raise Exception(
+                                        f"Failed to complete task {task_id} after {component_run_func_arg_set.retrodock_job_max_reattempts + 1} attempts."
+                                    )
+                                continue  # move on without re-attempting failed task (already released from the submission window)
+                            else:
+                                for array_job, outdock_file_path in zip(array_jobs, [task_result.actives_outdock_file_path, task_result.decoys_outdock_file_path]):
+                                    try:
+                                        _ = OutdockFile(outdock_file_path).get_dataframe()  # only resubmit if outdock file can't be loaded
+                                    except Exception as e:
+                                        array_job.submit_task(
+                                            task_id,
+                                            skip_if_complete=False,
+                                        )
+                                task_id_to_num_reattempts_dict[task_id] += 1
+                                if submission_window is not None:
+                                    submission_window.hold(task_id)
+                                logger.info(
+                                    f"Re-attempting task {task_id} (attempt {task_id_to_num_reattempts_dict[task_id] + 1} of at most {component_run_func_arg_set.retrodock_job_max_reattempts + 1})"
+                                )
+                        else:
+                            logger.warning(
+                                f"Failed to load output for task {task_id}. Will move on in queue and re-attempt once it cycles back around."
+                            )
+
+                        #
                         docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
-                        continue  # move on to next in queue in order to more efficiently use time between queue checks
-                    task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] = datetime.now()
+                        continue  # move on to next result
+
+                    # criterion failures are deterministic, so the task is not re-attempted
+                    if task_result.criterion_error is not None:
+                        logger.warning(f"Failed to evaluate {self.criterion.name} for task {task_id} due to error: {task_result.criterion_error}")
+                        if not component_run_func_arg_set.allow_failed_retrodock_jobs:
+                            raise Exception(
+                                f"Failed to evaluate {self.criterion.name} for task {task_id}: {task_result.criterion_error}"
+                            )
+                        continue  # move on to next result without re-attempting task
 
                     #
-                    task_id_to_num_task_output_detection_failed_attempts_dict[task_id] += 1
-                    logger.warning(f"Failed to detect output for task {task_id}")
+                    logger.info(
+                        f"Task {task_id} complete. Loaded both OUTDOCK files."
+                    )
+                    logger.debug(
+                        f"Task {task_id}: {task_result.num_actives_scored} actives & {task_result.num_decoys_scored} decoys scored. Results processed in {task_result.processing_seconds:.2f} seconds."
+                    )
 
-                    #
-                    if task_id_to_num_task_output_detection_failed_attempts_dict[task_id] > max_task_output_detection_reattempts:
-                        if task_id_to_num_reattempts_dict[task_id] + 1 > component_run_func_arg_set.retrodock_job_max_reattempts:
-                            logger.warning(
-                                f"Maximum allowed attempts ({component_run_func_arg_set.retrodock_job_max_reattempts + 1}) exhausted for task {task_id}"
-                            )
-                            if not component_run_func_arg_set.allow_failed_retrodock_jobs:
-                                raise Exception(
-                                    f"Failed to complete task {task_id} after {component_run_func_arg_set.retrodock_job_max_reattempts + 1} attempts."
-                                )
-                            continue  # move on to next in queue without re-attempting failed task
-                        else:
-                            # re-attempt incomplete task(s)
-                            for array_job in array_jobs:
-                                if array_job.task_failed(task_id):
-                                    array_job.submit_task(
-                                        task_id,
-                                        skip_if_complete=False,
-                                    )
-                            task_id_to_num_reattempts_dict[task_id] += 1
-                            task_id_to_num_task_output_detection_failed_attempts_dict[task_id] = 0  # reset task failures counter
-                            logger.info(
-                                f"Re-attempting task {task_id} (attempt {task_id_to_num_reattempts_dict[task_id] + 1} of at most {component_run_func_arg_set.retrodock_job_max_reattempts + 1})"
-                            )
-                    else:
-                        # task must have timed out / failed for one or both jobs
-                        logger.warning(
-                            f"Failed to detect output for task {task_id}. Will move on in queue and re-attempt once it cycles back around."
-                        )
-                        time.sleep(1)
+                    # validate scored molecules
+                    if task_result.num_active_db2_files_scored != self.retrospective_dataset.num_db2_files_in_active_class:
+                        raise Exception(
+                            f"Retrospective dataset has {self.retrospective_dataset.num_db2_files_in_active_class} DB2 files in active class but only detected {task_result.num_active_db2_files_scored} while processing retrodock job for task {task_id}")
+                    if task_result.num_decoy_db2_files_scored != self.retrospective_dataset.num_db2_files_in_decoy_class:
+                        raise Exception(
+                            f"Retrospective dataset has {self.retrospective_dataset.num_db2_files_in_decoy_class} DB2 files in decoy class but only detected {task_result.num_decoy_db2_files_scored} while processing retrodock job for task {task_id}")
+
+                    # make data dict for this configuration num
+                    data_dict = docking_configuration.to_dict()
+
+                    # add enrichment metrics and criterion value of this job's docking set-up
+                    if task_result.enrichment_metrics is not None:
+                        data_dict.update(task_result.enrichment_metrics)
+                    if task_result.criterion_value is not None:
+                        data_dict[self.criterion.name] = task_result.criterion_value
+                    if task_result.criterion_confidence_interval is not None:
+                        data_dict[f"{self.criterion.name}_ci_lower"], data_dict[f"{self.criterion.name}_ci_upper"] = task_result.criterion_confidence_interval
+
+                    # save data_dict for this job
+                    data_dicts.append(data_dict)
 
                 #
-                docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
-                continue  # move on to next in queue
-
-            # load outdock files and get dataframe
-            try:
-                # get dataframe of actives job results and decoys job results combined
-                df = get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
-                    actives_outdock_file_path, decoys_outdock_file_path
-                )
-            except Exception as e:  # if outdock files failed to be parsed then re-attempt task
-                try:
-                    time.sleep(0.01)  # sleep for a bit and try again
-                    df = get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
-                        actives_outdock_file_path, decoys_outdock_file_path
-                    )
-                except Exception as e:
+                if len(docking_configurations_processing_queue) == 0:
+                    time.sleep(0.01)  # only waiting on worker processes
+                    continue
+
+                #
+                docking_configuration = docking_configurations_processing_queue.popleft()
+                task_id = str(docking_configuration.configuration_num)
+                chunk_id = (int(task_id) - 1) // max_task_array_size  # Determine which chunk this task belongs to
+                array_jobs = chunk_to_array_jobs[chunk_id]  # Get the corresponding array jobs for this task
+
+                actives_outdock_file_path = os.path.join(self.retrodock_jobs_dir.path, 'actives', task_id, 'OUTDOCK.0')
+                decoys_outdock_file_path = os.path.join(self.retrodock_jobs_dir.path, 'decoys', task_id, 'OUTDOCK.0')
+
+                #
+                if any([not array_job.task_is_complete(task_id) for array_job in array_jobs]):  # one or both OUTDOCK files do not exist yet
+                    time.sleep(
+                        0.01
+                    )  # sleep for a bit
+
                     #
-                    if datetime.now() < (task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] + timedelta(seconds=MIN_SECONDS_BETWEEN_TASK_OUTPUT_LOADING_REATTEMPTS)):
-                        task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] = datetime.now()
+                    datetime_now = datetime.now()
+                    if datetime_now < (datetime_queue_was_last_checked + timedelta(seconds=MIN_SECONDS_BETWEEN_QUEUE_CHECKS)):
                         docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
                         continue  # move on to next in queue in order to more efficiently use time between queue checks
-                    task_id_to_datetime_task_output_loading_was_last_attempted_dict[task_id] = datetime.now()
-
-                    #
-                    task_id_to_num_task_output_loading_failed_attempts_dict[task_id] += 1
-                    logger.warning(f"Failed to load output for task {task_id} due to error: {e}")
 
                     #
-                    if task_id_to_num_task_output_loading_failed_attempts_dict[task_id] > max_task_output_detection_reattempts:
-                        if task_id_to_num_reattempts_dict[task_id] + 1 > component_run_func_arg_set.retrodock_job_max_reattempts:
-                            logger.warning(
-                                f"Maximum allowed attempts ({component_run_func_arg_set.retrodock_job_max_reattempts + 1}) exhausted for task {task_id}"
+                    datetime_queue_was_last_checked = datetime.now()
+
+                    # cancel task if it can no longer make the top n
+                    if early_termination_is_enabled and datetime.now() >= (task_id_to_datetime_partial_task_output_was_last_checked_dict[task_id] + timedelta(seconds=MIN_SECONDS_BETWEEN_PARTIAL_TASK_OUTPUT_CHECKS)):
+                        task_id_to_datetime_partial_task_output_was_last_checked_dict[task_id] = datetime.now()
+                        upper_bound = self.get_upper_bound_of_incomplete_task_criterion_value(task_id, *array_jobs, task_id_to_online_log_auc_estimator)
+                        criterion_values = sorted([data_dict[self.criterion.name] for data_dict in data_dicts], reverse=True)
+                        if upper_bound is not None and len(criterion_values) >= self.top_n and upper_bound < criterion_values[self.top_n - 1]:
+                            _, decoys_array_job = array_jobs
+                            decoys_array_job.cancel_task(task_id)
+                            cancelled_task_ids.add(task_id)
+                            if submission_window is not None:
+                                submission_window.release(task_id)
+                            task_id_to_online_log_auc_estimator.pop(task_id, None)
+                            logger.info(
+                                f"Cancelled task {task_id}: its {self.criterion.name} can be at most {upper_bound:.4f} but the top {self.top_n} tasks so far all exceed {criterion_values[self.top_n - 1]:.4f}"
                             )
-                            if not component_run_func_arg_set.allow_failed_retrodock_jobs:
-                                raise Exception(
-                                    f"Failed to complete task {task_id} after {component_run_func_arg_set.retrodock_job_max_reattempts + 1} attempts."
+                            continue  # drop task from queue
+
+                    if any([job.task_failed(task_id) for job in array_jobs]):
+                        #
+                        if datetime.now() < (task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] + timedelta(seconds=MIN_SECONDS_BETWEEN_TASK_OUTPUT_DETECTION_REATTEMPTS)):
+                            task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] = datetime.now()
+                            docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
+                            continue  # move on to next in queue in order to more efficiently use time between queue checks
+                        task_id_to_datetime_task_output_detection_was_last_attempted_dict[task_id] = datetime.now()
+
+                        #
+                        task_id_to_num_task_output_detection_failed_attempts_dict[task_id] += 1
+                        logger.warning(f"Failed to detect output for task {task_id}")
+
+                        #
+                        if task_id_to_num_task_output_detection_failed_attempts_dict[task_id] > max_task_output_detection_reattempts:
+                            if task_id_to_num_reattempts_dict[task_id] + 1 > component_run_func_arg_set.retrodock_job_max_reattempts:
+                                logger.warning(
+                                    f"Maximum allowed attempts ({component_run_func_arg_set.retrodock_job_max_reattempts + 1}) exhausted for task {task_id}"
                                 )
-                            continue  # move on to next in queue without re-attempting failed task
-                        else:
-                            for array_job, outdock_file_path in zip(array_jobs, [actives_outdock_file_path, decoys_outdock_file_path]):
-                                try:
-                                    _ = OutdockFile(outdock_file_path).get_dataframe()  # only resubmit if outdock file can't be loaded
-                                except Exception as e:
-                                    array_job.submit_task(
-                                        task_id,
-                                        skip_if_complete=False,
+                                if not component_run_func_arg_set.allow_failed_retrodock_jobs:
+                                    raise Exception(
+                                        f"Failed to complete task {task_id} after {component_run_func_arg_set.retrodock_job_max_reattempts + 1} attempts."
                                     )
-                            task_id_to_num_reattempts_dict[task_id] += 1
-                            logger.info(
-                                f"Re-attempting task {task_id} (attempt {task_id_to_num_reattempts_dict[task_id] + 1} of at most {component_run_func_arg_set.retrodock_job_max_reattempts + 1})"
+                                if submission_window is not None:
+                                    submission_window.release(task_id)
+                                continue  # move on to next in queue without re-attempting failed task
+                            else:
+                                # re-attempt incomplete task(s)
+                                for array_job in array_jobs:
+                                    if array_job.task_failed(task_id):
+                                        array_job.submit_task(
+                                            task_id,
+                                            skip_if_complete=False,
+                                        )
+                                task_id_to_num_reattempts_dict[task_id] += 1
+                                task_id_to_num_task_output_detection_failed_attempts_dict[task_id] = 0  # reset task failures counter
+                                logger.info(
+                                    f"Re-attempting task {task_id} (attempt {task_id_to_num_reattempts_dict[task_id] + 1} of at most {component_run_func_arg_set.retrodock_job_max_reattempts + 1})"
+                                )
+                        else:
+                            # task must have timed out / failed for one or both jobs
+                            logger.warning(
+                                f"Failed to detect output for task {task_id}. Will move on in queue and re-attempt once it cycles back around."
                             )
-                    else:
-                        logger.warning(
-                            f"Failed to load output for task {task_id}. Will move on in queue and re-attempt once it cycles back around."
-                        )
-                        time.sleep(1)
+                            time.sleep(1)
 
                     #
                     docking_configurations_processing_queue.append(docking_configuration)  # move to back of queue
                     continue  # move on to next in queue
 
-            #
-            logger.info(
-                f"Task {task_id} complete. Loaded both OUTDOCK files."
-            )
-
-            # validate scored molecules
-            num_active_db2_files_scored = df[df['is_active'].astype(bool)]['db2_file_path'].nunique()
-            num_decoy_db2_files_scored = df[~df['is_active'].astype(bool)]['db2_file_path'].nunique()
-
-            if num_active_db2_files_scored != self.retrospective_dataset.num_db2_files_in_active_class:
-                raise Exception(
-                    f"Retrospective dataset has {self.retrospective_dataset.num_db2_files_in_active_class} DB2 files in active class but only detected {num_active_db2_files_scored} while processing retrodock job for task {task_id}")
-            if num_decoy_db2_files_scored != self.retrospective_dataset.num_db2_files_in_decoy_class:
-                raise Exception(
-                    f"Retrospective dataset has {self.retrospective_dataset.num_db2_files_in_decoy_class} DB2 files in decoy class but only detected {num_decoy_db2_files_scored} while processing retrodock job for task {task_id}")
-
-            # sort dataframe by total energy score and drop duplicate molecules
-            df = sort_by_energy_and_drop_duplicate_molecules(df)
-
-            # make data dict for this configuration num
-            data_dict = docking_configuration.to_dict()
-
-            # get ROC and calculate normalized LogAUC of this job's docking set-up
-            if isinstance(self.criterion, NormalizedLogAUC):  # TODO: generalize `self.criterion` such that this ad hoc check is not necessary
-                booleans = df["is_active"]
-                data_dict[self.criterion.name] = self.criterion.calculate(booleans)
+                # load & evaluate outdock files in a worker process
+                if submission_window is not None:
+                    submission_window.release(task_id)  # task has left the job scheduler queue
+                task_id_to_docking_configuration_and_future[task_id] = (
+                    docking_configuration,
+                    result_processing_executor.submit(
+                        process_retrodock_task_outdock_files,
+                        task_id,
+                        actives_outdock_file_path,
+                        decoys_outdock_file_path,
+                        self.criterion,
+                        component_run_func_arg_set.confidence_interval_method,
+                        os.path.join(self.retrodock_jobs_dir.path, 'actives', task_id, 'test.mol2.gz.0'),
+                        self.reference_ligand_file_path,
+                    ),
+                )
 
-            # save data_dict for this job
-            data_dicts.append(data_dict)
+        #
+        for chunk_array_jobs in chunk_to_array_jobs.values():
+            for array_job in chunk_array_jobs:
+                array_job.close()
 
         # write jobs completion status
         num_tasks_successful = len(data_dicts)
         logger.info(
             f"Finished {num_tasks_successful} out of {len(self.docking_configurations)} tasks."
         )
+        if cancelled_task_ids:
+            logger.info(
+                f"Cancelled {len(cancelled_task_ids)} tasks that could not make the top {self.top_n}."
+            )
 
         #
-        if num_tasks_successful != len(self.docking_configurations):
+        if num_tasks_successful + len(cancelled_task_ids) != len(self.docking_configurations):
             if not component_run_func_arg_set.allow_failed_retrodock_jobs:
                 raise Exception(
-                    f"Failed {len(self.docking_configurations) - num_tasks_successful} out of {len(self.docking_configurations)} tasks. Failed tasks are not allowed. Exiting."
+                    f"Failed {len(self.docking_configurations) - num_tasks_successful - len(cancelled_task_ids)} out of {len(self.docking_configurations)} tasks. Failed tasks are not allowed. Exiting."
                 )
 
         #
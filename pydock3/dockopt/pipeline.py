@@ -8,7 +8,9 @@ import logging
 import pandas as pd
 
 from pydock3.files import Dir
-from pydock3.criterion.enrichment.logauc import NormalizedLogAUC
+from pydock3.criterion.enrichment.logauc import NormalizedLogAUC, TieAwareNormalizedLogAUC
+from pydock3.criterion.enrichment.metrics import ROCAUC, PRAUC, EnrichmentFactor, BEDROC
+from pydock3.criterion.pose.rmsd import NegativePoseRMSD
 
 if TYPE_CHECKING:
     from pydock3.dockopt.results import ResultsManager
@@ -21,7 +23,13 @@ logger.setLevel(logging.DEBUG)
 
 #
 CRITERION_DICT = {
-    "normalized_log_auc": NormalizedLogAUC
+    "normalized_log_auc": NormalizedLogAUC,
+    "tie_aware_normalized_log_auc": TieAwareNormalizedLogAUC,
+    "roc_auc": ROCAUC,
+    "pr_auc": PRAUC,
+    "enrichment_factor": EnrichmentFactor,
+    "bedroc": BEDROC,
+    "negative_pose_rmsd": NegativePoseRMSD,
 }
 
 
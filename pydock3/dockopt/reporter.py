@@ -11,6 +11,8 @@ from scipy.interpolate import griddata
 import plotly.graph_objs as go
 
 from pydock3.util import sort_list_by_another_list
+from pydock3.criterion.enrichment.logauc import NormalizedLogAUC
+from pydock3.criterion.enrichment.roc_plot import render_roc_plot_if_missing
 from pydock3.criterion.enrichment.bonferroni import get_bonferroni_correction, get_random_classifier_performance_data
 from pydock3.files import File
 from pydock3.retrodock.retrodock import ROC_PLOT_FILE_NAME, ENERGY_TERMS_PLOT_FILE_NAME, CHARGE_PLOT_FILE_NAME
@@ -78,9 +80,10 @@ class HTMLReporter(Reporter):
         #
         figures = []
 
-        # Add histogram showing signicance cutoff
-        hist = self.get_criterion_dist_histogram(df, pipeline_component.criterion.name, pipeline_component)
-        figures.append(hist)
+        # Add histogram showing signicance cutoff (null distribution only exists for normalized LogAUC, which is recorded whatever the criterion)
+        if NormalizedLogAUC().name in df.columns:
+            hist = self.get_criterion_dist_histogram(df, NormalizedLogAUC().name, pipeline_component)
+            figures.append(hist)
 
         # Add plot images to figures
         df_to_iter = pipeline_component.get_top_results_dataframe().head(top_n_jobs_to_show)
@@ -94,7 +97,7 @@ class HTMLReporter(Reporter):
             ))
 
             roc_file_path = os.path.join(best_job_dir_path, ROC_PLOT_FILE_NAME)
-            if os.path.exists(roc_file_path):
+            if render_roc_plot_if_missing(roc_file_path):  # plot may have been deferred
                 figures.append(roc_file_path)
 
             energy_plot_file_path = os.path.join(best_job_dir_path, ENERGY_TERMS_PLOT_FILE_NAME)
@@ -186,7 +189,10 @@ class HTMLReporter(Reporter):
         )
 
         #
-        df_random = get_random_classifier_performance_data(n_actives=pipeline_component.retrospective_dataset.num_molecules_in_active_class)
+        df_random = get_random_classifier_performance_data(
+            n_actives=pipeline_component.retrospective_dataset.num_molecules_in_active_class,
+            n_decoys=pipeline_component.retrospective_dataset.num_molecules_in_decoy_class,
+        )
         bin_size = 0.01  # TODO: figure out how to generalize all this to work with any criterion
         bin_start_random = df_random['normalized_log_auc'].min() // bin_size * bin_size  # round down to nearest bin_size
         bin_end_random = df_random['normalized_log_auc'].max() // bin_size * bin_size + bin_size  # round up to nearest bin_size
@@ -205,6 +211,7 @@ class HTMLReporter(Reporter):
             n_actives=pipeline_component.retrospective_dataset.num_molecules_in_active_class,
             n_configurations=pipeline_component.num_total_docking_configurations_thus_far,
             signif_level=p_value,
+            n_decoys=pipeline_component.retrospective_dataset.num_molecules_in_decoy_class,
         )
 
         #
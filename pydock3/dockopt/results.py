@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, NoReturn
+from typing import TYPE_CHECKING, NoReturn, Optional
 import os
 import glob
 import logging
@@ -12,6 +12,7 @@ from pydock3.dockopt.util import BEST_RETRODOCK_JOBS_DIR_NAME
 from pydock3.dockopt.docking_configuration import DockingConfiguration
 from pydock3.jobs import OUTDOCK_FILE_NAME
 from pydock3.dockopt.reporter import HTMLReporter
+from pydock3.criterion.enrichment.roc_plot import ROCPlotRenderer, DEFAULT_ROC_PLOT_DPI
 from pydock3.retrodock.retrodock import ROC_PLOT_FILE_NAME, ENERGY_TERMS_PLOT_FILE_NAME, CHARGE_PLOT_FILE_NAME, str_to_float, get_results_dataframe_from_actives_job_and_decoys_job_outdock_files, process_retrodock_job_results
 if TYPE_CHECKING:
     from pydock3.dockopt.pipeline import PipelineComponent
@@ -89,8 +90,10 @@ class DockoptPipelineComponentResultsManager(ResultsManager):
 
 class DockoptStepResultsManager(DockoptPipelineComponentResultsManager):
 
-    def __init__(self, results_file_name: str):
+    def __init__(self, results_file_name: str, roc_plot_dpi: int = DEFAULT_ROC_PLOT_DPI, num_roc_plots_to_render: Optional[int] = None):
         super().__init__(results_file_name)
+        self.roc_plot_dpi = roc_plot_dpi
+        self.num_roc_plots_to_render = num_roc_plots_to_render  # rest are rendered on request; None to render all
 
     def save_best_retrodock_jobs(self, pipeline_component: PipelineComponent):
         # reset best jobs dir
@@ -100,50 +103,53 @@ class DockoptStepResultsManager(DockoptPipelineComponentResultsManager):
         logger.debug(
             f"Copying top {pipeline_component.top_n} retrodock jobs to {pipeline_component.best_retrodock_jobs_dir.path}"
         )
-        for i, row in pipeline_component.get_top_results_dataframe().iterrows():
-            #
-            dc = DockingConfiguration.from_dict(row.to_dict())
-
-            #
-            dst_best_job_dir = Dir(os.path.join(pipeline_component.best_retrodock_jobs_dir.path, f"rank={i+1}-step={dc.component_id}-conf={dc.configuration_num}"), create=True, reset=True)
-            best_job_dockfiles_dir = Dir(
-                os.path.join(dst_best_job_dir.path, "dockfiles"),
-                create=True,
-                reset=True,
-            )  # create best job dockfiles dir
-
-            # create symbolic links instead of copying in order to save time & space
-            dock_files = dc.get_dock_files(pipeline_component.pipeline_dir.path)
-            for field in fields(dock_files):
-                dock_file = getattr(dock_files, field.name)
-                create_relative_symlink(dock_file.path, os.path.join(best_job_dockfiles_dir.path, dock_file.name), target_is_directory=False)
-
-            indock_file = dc.get_indock_file(pipeline_component.pipeline_dir.path)
-            create_relative_symlink(indock_file.path, os.path.join(best_job_dockfiles_dir.path, indock_file.name), target_is_directory=False)
-
-            src_retrodock_job_actives_dir_path = os.path.join(pipeline_component.retrodock_jobs_dir.path, "actives", str(dc.configuration_num))
-            src_retrodock_job_decoys_dir_path = os.path.join(pipeline_component.retrodock_jobs_dir.path, "decoys", str(dc.configuration_num))
-
-            dst_retrodock_job_actives_dir_path = os.path.join(dst_best_job_dir.path, "actives")
-            dst_retrodock_job_decoys_dir_path = os.path.join(dst_best_job_dir.path, "decoys")
-
-            create_relative_symlink(
-                src_retrodock_job_actives_dir_path,
-                dst_retrodock_job_actives_dir_path,
-                target_is_directory=True,
-            )
-            create_relative_symlink(
-                src_retrodock_job_decoys_dir_path,
-                dst_retrodock_job_decoys_dir_path,
-                target_is_directory=True,
-            )
-
-            # save plots and other info
-            process_retrodock_job_results(
-                actives_outdock_file_path=os.path.join(dst_retrodock_job_actives_dir_path, OUTDOCK_FILE_NAME),
-                decoys_outdock_file_path=os.path.join(dst_retrodock_job_decoys_dir_path, OUTDOCK_FILE_NAME),
-                save_dir_path=dst_best_job_dir.path,
-            )
+        with ROCPlotRenderer(dpi=self.roc_plot_dpi, num_plots_to_render=self.num_roc_plots_to_render) as roc_plot_renderer:
+            for i, row in pipeline_component.get_top_results_dataframe().iterrows():
+                #
+                dc = DockingConfiguration.from_dict(row.to_dict())
+
+                #
+                dst_best_job_dir = Dir(os.path.join(pipeline_component.best_retrodock_jobs_dir.path, f"rank={i+1}-step={dc.component_id}-conf={dc.configuration_num}"), create=True, reset=True)
+                best_job_dockfiles_dir = Dir(
+                    os.path.join(dst_best_job_dir.path, "dockfiles"),
+                    create=True,
+                    reset=True,
+                )  # create best job dockfiles dir
+
+                # create symbolic links instead of copying in order to save time & space
+                dock_files = dc.get_dock_files(pipeline_component.pipeline_dir.path)
+                for field in fields(dock_files):
+                    dock_file = getattr(dock_files, field.name)
+                    create_relative_symlink(dock_file.path, os.path.join(best_job_dockfiles_dir.path, dock_file.name), target_is_directory=False)
+
+                indock_file = dc.get_indock_file(pipeline_component.pipeline_dir.path)
+                create_relative_symlink(indock_file.path, os.path.join(best_job_dockfiles_dir.path, indock_file.name), target_is_directory=False)
+
+                src_retrodock_job_actives_dir_path = os.path.join(pipeline_component.retrodock_jobs_dir.path, "actives", str(dc.configuration_num))
+                src_retrodock_job_decoys_dir_path = os.path.join(pipeline_component.retrodock_jobs_dir.path, "decoys", str(dc.configuration_num))
+
+                dst_retrodock_job_actives_dir_path = os.path.join(dst_best_job_dir.path, "actives")
+                dst_retrodock_job_decoys_dir_path = os.path.join(dst_best_job_dir.path, "decoys")
+
+                create_relative_symlink(
+                    src_retrodock_job_actives_dir_path,
+                    dst_retrodock_job_actives_dir_path,
+                    target_is_directory=True,
+                )
+                create_relative_symlink(
+                    src_retrodock_job_decoys_dir_path,
+                    dst_retrodock_job_decoys_dir_path,
+                    target_is_directory=True,
+                )
+
+                # save plots and other info
+                process_retrodock_job_results(
+                    actives_outdock_file_path=os.path.join(dst_retrodock_job_actives_dir_path, OUTDOCK_FILE_NAME),
+                    decoys_outdock_file_path=os.path.join(dst_retrodock_job_decoys_dir_path, OUTDOCK_FILE_NAME),
+                    save_dir_path=dst_best_job_dir.path,
+                    roc_plot_renderer=roc_plot_renderer,
+                    rank=i + 1,
+                )
 
 
 class DockoptStepSequenceIterationResultsManager(DockoptPipelineComponentResultsManager):
@@ -1,5 +1,5 @@
 import copy
-from typing import List, Tuple, Union, Optional, Dict, Any, TextIO, Generator
+from typing import List, Tuple, Union, Optional, Dict, Any, TextIO, Generator, Iterable
 from enum import Enum
 import collections
 import logging
@@ -8,7 +8,10 @@ import shutil
 import pathlib
 from datetime import datetime
 import tarfile
+import csv
+import io
 import gzip
+import zlib
 import re
 import uuid
 import time
@@ -693,6 +696,53 @@ class DB2File(File):
         return None
 
 
+def get_npz_arrays_of_dataframe(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Converts a dataframe of numeric, nullable integer, and categorical columns into arrays that `np.savez` can store without pickling."""
+
+    arrays = {
+        "column_names": np.array([str(column_name) for column_name in df.columns]),
+        "column_kinds": np.array([""] * len(df.columns), dtype="<U16"),
+    }
+    for i, column_name in enumerate(df.columns):
+        column = df[column_name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays["column_kinds"][i] = "categorical"
+            arrays[f"column_{i}_codes"] = column.cat.codes.to_numpy()
+            arrays[f"column_{i}_categories"] = np.array([str(category).encode("utf-8") for category in column.cat.categories], dtype=bytes)
+        elif isinstance(column.dtype, pd.api.extensions.ExtensionDtype):  # e.g., nullable integer
+            arrays["column_kinds"][i] = str(column.dtype)
+            values = column.to_numpy(dtype=column.dtype.numpy_dtype, na_value=0)
+            if values.dtype.kind == "i":
+                values = pd.to_numeric(values, downcast="integer")  # counts are small
+            arrays[f"column_{i}_values"] = values
+            arrays[f"column_{i}_mask"] = column.isna().to_numpy()
+        else:
+            arrays["column_kinds"][i] = "numpy"
+            arrays[f"column_{i}_values"] = column.to_numpy()
+
+    return arrays
+
+
+def load_dataframe_from_npz_arrays(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Inverse of `get_npz_arrays_of_dataframe`."""
+
+    data = {}
+    for i, (column_name, column_kind) in enumerate(zip(arrays["column_names"], arrays["column_kinds"])):
+        column_name, column_kind = str(column_name), str(column_kind)
+        if column_kind == "categorical":
+            data[column_name] = pd.Categorical.from_codes(
+                arrays[f"column_{i}_codes"],
+                categories=[category.decode("utf-8") for category in arrays[f"column_{i}_categories"]],
+            )
+        elif column_kind == "numpy":
+            data[column_name] = arrays[f"column_{i}_values"]
+        else:
+            data[column_name] = pd.array(arrays[f"column_{i}_values"].astype(pd.api.types.pandas_dtype(column_kind).numpy_dtype), dtype=column_kind)
+            data[column_name][arrays[f"column_{i}_mask"]] = pd.NA
+
+    return pd.DataFrame(data, columns=[str(column_name) for column_name in arrays["column_names"]])
+
+
 class OutdockFile(File):
 
     COLUMN_NAMES = [  # TODO: This depends on the version of DOCK 3 being used. Figure out how to make this more robust.
@@ -719,111 +769,337 @@ class OutdockFile(File):
         "Total",
     ]
 
+    INT_COLUMN_NAMES = ["mol#", "flexiblecode", "matched", "nscored", "hac", "setnum", "matnum", "rank"]
+    CATEGORICAL_COLUMN_NAMES = ["db2_file_path", "id_num"]
+    HEADER_LINE_NON_COLUMN_TOKENS = ["+", "="]
+
+    CACHE_DIR_NAME = ".dataframe_cache"  # next to the OUTDOCK file (name must not contain "OUTDOCK", see rundock.bash)
+    CACHE_FILE_NAME_PREFIX = "parsed_"
+    CACHE_VERSION = 1
+
     def __init__(self, path: str, validate_existence: bool = False):
         super().__init__(path=path, validate_existence=validate_existence)
 
-    def get_dataframe(self):
+    def get_dataframe(self, use_cache: bool = True):
+        """
+        Returns the dataframe of the score lines of the OUTDOCK file (see `parse_dataframe`).
+
+        If `use_cache` is True, the dataframe is loaded from the columnar cache if the cached
+        copy was parsed from a file of the same path, size, and modification time. Otherwise, the
+        file is parsed and the cache is updated. The cache is kept in a subdirectory of the OUTDOCK
+        file's directory, with one entry per OUTDOCK file, so it is overwritten when the file changes
+        and deleted along with the job.
+        """
+
+        if use_cache:
+            df = self.load_cached_dataframe()
+            if df is not None:
+                return df
+
+        #
+        df = self.parse_dataframe()
+        if use_cache:
+            try:
+                self.save_cached_dataframe(df)
+            except Exception as e:  # the cache is an optimization only
+                logger.debug(f"Failed to cache dataframe of OutdockFile {self.path}: {e}")
+
+        return df
+
+    @property
+    def cache_file_path(self) -> str:
+        """Path of the cached copy of the parsed dataframe (e.g., `.dataframe_cache/parsed_OUTDOCK.0.npz` for `OUTDOCK.0`)."""
+
+        return os.path.join(
+            File.get_dir_path_of_file(self.path),
+            self.CACHE_DIR_NAME,
+            f"{self.CACHE_FILE_NAME_PREFIX}{File.get_file_name_of_file(self.path)}.npz",
+        )
+
+    def get_source_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def load_cached_dataframe(self) -> Optional[pd.DataFrame]:
+        """Returns the cached dataframe, or None if there is no up-to-date cached dataframe."""
+
+        try:
+            cache_file_path = self.cache_file_path
+            if not os.path.isfile(cache_file_path):
+                return None
+            with np.load(cache_file_path, allow_pickle=False) as npz:
+                if (
+                    int(npz["cache_version"]) != self.CACHE_VERSION
+                    or str(npz["source_path"]) != self.path
+                    or tuple(int(x) for x in npz["source_signature"]) != self.get_source_signature()
+                ):
+                    return None
+                return load_dataframe_from_npz_arrays(npz)
+        except Exception as e:
+            logger.debug(f"Failed to load cached dataframe of OutdockFile {self.path}: {e}")
+            return None
+
+    def save_cached_dataframe(self, df: pd.DataFrame) -> None:
+        arrays = get_npz_arrays_of_dataframe(df)
+        arrays["cache_version"] = np.array(self.CACHE_VERSION)
+        arrays["source_path"] = np.array(self.path)
+        arrays["source_signature"] = np.array(self.get_source_signature(), dtype=np.int64)
+
+        # write atomically, since other processes may be reading the same cache
+        cache_file_path = self.cache_file_path
+        os.makedirs(File.get_dir_path_of_file(cache_file_path), exist_ok=True)
+        temp_file_path = f"{cache_file_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp_file_path, cache_file_path)
+
+    def parse_dataframe(self):
+        """
+        Parses the score lines of the OUTDOCK file into a dataframe with one row per line.
+
+        The file is read in a single pass. Score lines are tokenized into a preallocated array,
+        which is then converted column by column: counts to nullable integers, names to
+        categoricals, and everything else (energies, time, charge) to float32. Lines within a
+        db2 file's block that are not score lines yield rows of NaN.
+
+        Columns are named from the header line, so that variants of `COLUMN_NAMES` (which
+        depend on the version of DOCK 3 used) are tolerated. Columns of `COLUMN_NAMES` that are
+        absent from the header are filled with NaN.
+        """
+
         File.validate_file_exists(self.path)
         with open(self.path, "r", errors="ignore") as f:
             #
-            lines = [x.strip() for x in f.readlines()]
-
-            #
-            if not lines[-1].startswith("elapsed time (sec):"):  # TODO: This depends on the version of DOCK 3 being used. Figure out how to make this more robust.
-                raise Exception(f"Final line of OutdockFile {self.path} does not begin with 'elapsed time (sec):', indicating a failure of some kind.")
+            column_names = None
+            first_db2_line = None
+            db2_file_path_code = None  # code of db2 file whose block is currently open
+            db2_file_path_to_code = {}
+            row_db2_file_path_codes = []
+            score_lines = []  # score line of each row, or "" for a row of NaN
+            line = ""
+            for line in f:
+                line = line.strip()
+                is_db2_line = line.endswith(".db2") or line.endswith(".db2.gz")  # TODO: this is quite brittle. find a better way.
+
+                # find header line
+                if column_names is None:
+                    if is_db2_line and first_db2_line is None:
+                        first_db2_line = line
+                    if line.startswith(self.COLUMN_NAMES[0]) and line.endswith(self.COLUMN_NAMES[-1]):  # TODO: unfortunately this brittle solution will have to do for now, since this is the only way to be compatible with both DOCK 3.7 and 3.8
+                        column_names = [token for token in line.split() if token not in self.HEADER_LINE_NON_COLUMN_TOKENS]
+                        if first_db2_line is not None:  # e.g., "Input ligand: [...]" line preceding header line
+                            db2_file_path_code = self._get_db2_file_path_code(first_db2_line, db2_file_path_to_code)
+                    continue
+
+                # db2 file lines alternately open & close a db2 file's block
+                if is_db2_line:
+                    if db2_file_path_code is None:
+                        db2_file_path_code = self._get_db2_file_path_code(line, db2_file_path_to_code)
+                    else:
+                        db2_file_path_code = None
+                    continue
 
-            # find first ligand line ("Input ligand: [...]")
-            first_db2_line_index = None
-            for i, line in enumerate(lines):
-                if line.strip().endswith(".db2") or line.strip().endswith(".db2.gz"):
-                    first_db2_line_index = i
-                    break
+                #
+                if db2_file_path_code is not None:
+                    first_token = line.split(None, 1)[0] if line else ""
+                    score_lines.append(line if first_token.isdigit() else "")
+                    row_db2_file_path_codes.append(db2_file_path_code)
 
             #
-            header_line_index = None
-            for i, line in enumerate(lines):
-                if line.strip().startswith(self.COLUMN_NAMES[0]) and line.strip().endswith(self.COLUMN_NAMES[-1]):  # TODO: unfortunately this brittle solution will have to do for now, since this is the only way to be compatible with both DOCK 3.7 and 3.8
-                    header_line_index = i
-                    break
-            if header_line_index is None:
+            if not line.startswith("elapsed time (sec):"):  # TODO: This depends on the version of DOCK 3 being used. Figure out how to make this more robust.
+                raise Exception(f"Final line of OutdockFile {self.path} does not begin with 'elapsed time (sec):', indicating a failure of some kind.")
+            if column_names is None:
                 raise Exception(
                     f"Header line not found when reading OutdockFile: {self.path}"
                 )
+            if db2_file_path_code is not None:
+                raise Exception(f"Cannot parse OutdockFile: {self.path}")
 
-            #
-            lines = [lines[first_db2_line_index]] + lines[header_line_index + 1 :]
+        # tokenize all score lines at once (blank lines yield rows of NaN, as do missing trailing columns)
+        if score_lines:
+            df = pd.read_csv(
+                io.StringIO("\n".join(score_lines)),
+                sep=r"\s+",
+                header=None,
+                names=column_names,
+                usecols=range(len(column_names)),
+                skip_blank_lines=False,
+                quoting=csv.QUOTE_NONE,
+                dtype={column_name: str for column_name in column_names if column_name in self.CATEGORICAL_COLUMN_NAMES},
+            )
+        else:
+            df = pd.DataFrame(columns=column_names)
 
-            #
-            db2_file_line_indices = [
-                i
-                for i, line in enumerate(lines)
-                if line.endswith(".db2") or line.endswith(".db2.gz")
-            ]  # TODO: this is quite brittle. find a better way.
-            if len(db2_file_line_indices) % 2 != 0:
-                raise Exception(f"Cannot parse OutdockFile: {self.path}")
+        #
+        data = {
+            "db2_file_path": pd.Categorical.from_codes(
+                np.asarray(row_db2_file_path_codes, dtype=np.int32),
+                categories=list(db2_file_path_to_code.keys()),
+            ),
+        }
+        for column_name in column_names:
+            data[column_name] = self._convert_column(column_name, df[column_name])
+        for column_name in self.COLUMN_NAMES:
+            if column_name not in data:
+                data[column_name] = np.full(len(score_lines), np.nan, dtype=np.float32)
+
+        return pd.DataFrame(data)
 
-            #
-            open_file_line_indices = [
-                db2_file_line_indices[i]
-                for i in range(len(db2_file_line_indices))
-                if i % 2 == 0
-            ]
-            close_file_line_indices = [
-                db2_file_line_indices[i]
-                for i in range(len(db2_file_line_indices))
-                if i % 2 == 1
-            ]
+    @staticmethod
+    def _get_db2_file_path_code(line: str, db2_file_path_to_code: Dict[str, int]) -> int:
+        db2_file_path = line.replace("open the file:", "").replace("Input ligand:", "").strip()
+        return db2_file_path_to_code.setdefault(db2_file_path, len(db2_file_path_to_code))
 
-            #
-            new_close_file_line_indices = []
-            for close_file_line_index in close_file_line_indices:
-                new_close_file_line_index = close_file_line_index
-                if (
-                    "close the file:" not in lines[close_file_line_index]
-                ):  # apparently necessary if path is too long b/c Fortran is wacky
-                    new_close_file_line_index -= 1
-                new_close_file_line_indices.append(close_file_line_index)
-            close_file_line_indices = new_close_file_line_indices
+    @classmethod
+    def _convert_column(cls, column_name: str, values: pd.Series) -> Union[np.ndarray, pd.Categorical, pd.api.extensions.ExtensionArray]:
+        if column_name in cls.CATEGORICAL_COLUMN_NAMES:
+            return pd.Categorical(values)
 
-            #
-            data = []
-            db2_file_paths = []
-            df_column_names = ["db2_file_path"] + self.COLUMN_NAMES
-            for open_file_line_index, close_file_line_index in zip(
-                open_file_line_indices, close_file_line_indices
-            ):
-                db2_file_path = (
-                    lines[open_file_line_index]
-                    .replace("open the file:", "")
-                    .replace("Input ligand:", "")
-                    .strip()
-                )
-                db2_file_paths.append(db2_file_path)
-                for data_row_line_index in range(
-                    open_file_line_index + 1, close_file_line_index
-                ):
-                    data_row_line = lines[data_row_line_index]
-                    data_row = data_row_line.strip().split()
-                    if data_row[0].isdigit():
-                        data_row = [db2_file_path] + data_row
-                    else:
-                        data_row = [db2_file_path] + [
-                            np.nan for _ in range(len(self.COLUMN_NAMES))
-                        ]
+        #
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors="coerce")
+        floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        if column_name in cls.INT_COLUMN_NAMES:
+            finite = floats[~np.isnan(floats)]
+            if np.array_equal(finite, np.round(finite)):
+                return pd.array(floats, dtype="Int64")
 
-                    # pad missing columns with NaN
-                    if len(data_row) != len(df_column_names):
-                        num_missing = len(df_column_names) - len(data_row)
-                        data_row += [np.nan for _ in range(num_missing)]
+        return floats.astype(np.float32)
 
-                    #
-                    data_row_dict = {
-                        column_name: data_row[i]
-                        for i, column_name in enumerate(df_column_names)
-                    }
-                    data.append(data_row_dict)
 
-            return pd.DataFrame.from_records(data)
+class OutdockScoresFile(File):
+    """
+    Compact binary (.npz) copy of the scores in an OUTDOCK file, written on the compute node at the end of a docking task.
+
+    Holds only the columns needed to evaluate docking results (see `COLUMN_NAMES`), so that the
+    head node does not need to parse the OUTDOCK file itself. The size and modification time (in
+    whole seconds, which `cp -p` preserves) of the OUTDOCK file it was made from are recorded, so
+    that a scores file that has gone stale is not used.
+
+    The file is named `scores.{n}.npz` for `OUTDOCK.{n}` (`rundock.bash` numbers its outputs by
+    counting files whose names contain "OUTDOCK", so the name must not).
+    """
+
+    COLUMN_NAMES = ["db2_file_path", "id_num", "charge", "elect", "vdW", "psol", "asol", "Total"]
+    FILE_NAME_PREFIX = "scores"
+    FILE_EXTENSION = ".npz"
+
+    def __init__(self, path: str, validate_existence: bool = False):
+        super().__init__(path=path, validate_existence=validate_existence)
+
+    @staticmethod
+    def get_scores_file_path(outdock_file_path: str) -> str:
+        outdock_file_name = File.get_file_name_of_file(outdock_file_path)
+        suffix = outdock_file_name[len("OUTDOCK"):]  # e.g., ".0"
+        return os.path.join(
+            File.get_dir_path_of_file(outdock_file_path),
+            f"{OutdockScoresFile.FILE_NAME_PREFIX}{suffix}{OutdockScoresFile.FILE_EXTENSION}",
+        )
+
+    @staticmethod
+    def get_source_signature(outdock_file_path: str) -> Tuple[int, int]:
+        stat = os.stat(outdock_file_path)
+        return stat.st_size, int(stat.st_mtime)
+
+    @staticmethod
+    def create_for_outdock_file(outdock_file_path: str) -> "OutdockScoresFile":
+        """Parses the supplied OUTDOCK file and writes its scores file."""
+
+        source_signature = OutdockScoresFile.get_source_signature(outdock_file_path)
+        df = OutdockFile(outdock_file_path).parse_dataframe()
+        scores_file = OutdockScoresFile(OutdockScoresFile.get_scores_file_path(outdock_file_path))
+        scores_file.write(df[OutdockScoresFile.COLUMN_NAMES], source_signature)
+
+        return scores_file
+
+    def write(self, df: pd.DataFrame, source_signature: Tuple[int, int]) -> None:
+        arrays = get_npz_arrays_of_dataframe(df)
+        arrays["source_signature"] = np.array(source_signature, dtype=np.int64)
+
+        # write atomically, since the head node may read it as soon as it appears
+        temp_file_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temp_file_path, self.path)
+
+    def read(self) -> Tuple[Tuple[int, int], pd.DataFrame]:
+        """Returns (source_signature, dataframe)."""
+
+        with np.load(self.path, allow_pickle=False) as npz:
+            source_signature = tuple(int(x) for x in npz["source_signature"])
+            df = load_dataframe_from_npz_arrays(npz)
+
+        return source_signature, df
+
+
+class OutdockFileTailer(object):
+    """
+    Incrementally reads the score lines of an OUTDOCK file that is still being written (or a copy of one that
+    is periodically replaced by a longer copy). Each call returns only what was appended since the last call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.incomplete_line = b""
+
+    def read_new_scores(self) -> Tuple[List[Tuple[str, float]], bool]:
+        """
+        Returns the (id_num, Total) pairs of the score lines appended since the last call, and whether the file was
+        found to have been restarted (i.e., is now shorter than what was already read), in which case reading starts
+        over from the beginning and previously returned scores should be discarded.
+        """
+
+        #
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return [], False
+        restarted = size < self.offset
+        if restarted:
+            self.offset = 0
+            self.incomplete_line = b""
+
+        #
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        lines = (self.incomplete_line + data).split(b"\n")
+        self.incomplete_line = lines.pop()  # last line may still be being written
+
+        #
+        scores = []
+        for line in lines:
+            tokens = line.split()
+            if len(tokens) < 3 or not tokens[0].isdigit():  # score lines start with the molecule number
+                continue
+            try:
+                scores.append((tokens[1].decode(), float(tokens[-1])))  # Total is the last column
+            except ValueError:
+                continue
+
+        return scores, restarted
+
+
+def load_outdock_scores_dataframe(outdock_file_path: str) -> pd.DataFrame:
+    """
+    Returns a dataframe of the scores in the supplied OUTDOCK file, with the columns in `OutdockScoresFile.COLUMN_NAMES`.
+
+    Loads the scores file written alongside the OUTDOCK file on the compute node if there is an
+    up-to-date one. Otherwise, falls back to `OutdockFile.get_dataframe` (and its cache).
+    """
+
+    scores_file = OutdockScoresFile(OutdockScoresFile.get_scores_file_path(outdock_file_path))
+    if scores_file.exists:
+        try:
+            source_signature, df = scores_file.read()
+            if source_signature == OutdockScoresFile.get_source_signature(outdock_file_path):
+                return df
+        except Exception as e:
+            logger.debug(f"Failed to read OutdockScoresFile {scores_file.path}: {e}")
+
+    return OutdockFile(outdock_file_path).get_dataframe()[OutdockScoresFile.COLUMN_NAMES]
 
 
 class Mol2Headers(Enum):
@@ -1073,6 +1349,325 @@ class Mol2Block(object):
         return records
 
 
+MOL2_RECORD_START_MARKER = b"##########                 Name:"
+MOL2_RECORD_HEADER_FIELD_PATTERN = re.compile(rb"^#{10}[ \t]+([^:\n]+?):[ \t]*([^\n]*?)[ \t\r]*$", re.MULTILINE)
+
+
+class Mol2RecordScanner(object):
+    """
+    Streams the records of a (possibly gzipped) mol2 file written by DOCK.
+
+    A record begins at a "##########                 Name:" header line (the first line of the
+    comment block DOCK writes above each pose) and runs until the next such line. Any text
+    preceding the first header line is yielded as a record of its own, so a mol2 file with no
+    DOCK header lines is yielded as a single record.
+
+    Decompressed data is read in large chunks and record boundaries are located with
+    `bytes.find`, so no per-character or per-line work is done in Python. Records are yielded
+    as `memoryview` slices of the chunk they were found in; use `bytes(record)` to keep a copy
+    that does not pin the whole chunk in memory.
+
+    Scanning may start part-way through the file, at the start of a gzip member (given by its
+    offset in the compressed file and the offset of its first byte in the decompressed data).
+    The members encountered are recorded in `member_offsets` as
+    (compressed_offset, decompressed_offset) tuples. For files that are not gzipped, the two
+    offsets are the same.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        chunk_size: int = 4 * 1024 * 1024,
+        record_start_marker: bytes = MOL2_RECORD_START_MARKER,
+        start_compressed_offset: int = 0,
+        start_decompressed_offset: int = 0,
+    ):
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.record_start_marker = record_start_marker
+        self.start_compressed_offset = start_compressed_offset
+        self.start_decompressed_offset = start_decompressed_offset
+        self.num_bytes_read = 0  # decompressed bytes yielded so far
+        self.member_offsets = []
+
+    @property
+    def decompressed_position(self) -> int:
+        return self.start_decompressed_offset + self.num_bytes_read
+
+    def iter_chunks(self) -> Generator[bytes, None, None]:
+        """Yields chunks of decompressed data. Concatenated gzip members are supported."""
+
+        with open(self.file_path, "rb") as f:
+            if File.file_is_gzipped(self.file_path):
+                f.seek(self.start_compressed_offset)
+                chunk_compressed_offset = self.start_compressed_offset
+                decompressor = None
+                while True:
+                    compressed_chunk = f.read(self.chunk_size)
+                    if not compressed_chunk:
+                        break
+                    while compressed_chunk:
+                        if decompressor is None:  # start of a gzip member
+                            decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+                            self.member_offsets.append((chunk_compressed_offset, self.decompressed_position))
+                        chunk = decompressor.decompress(compressed_chunk)
+                        if chunk:
+                            self.num_bytes_read += len(chunk)
+                            yield chunk
+                        if not decompressor.eof:
+                            chunk_compressed_offset += len(compressed_chunk)
+                            break
+                        chunk_compressed_offset += len(compressed_chunk) - len(decompressor.unused_data)
+                        compressed_chunk = decompressor.unused_data
+                        decompressor = None
+                if decompressor is not None:
+                    chunk = decompressor.flush()
+                    if chunk:
+                        self.num_bytes_read += len(chunk)
+                        yield chunk
+            else:
+                f.seek(self.start_decompressed_offset)
+                self.member_offsets.append((self.start_decompressed_offset, self.start_decompressed_offset))
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self.num_bytes_read += len(chunk)
+                    yield chunk
+
+    def iter_records_with_offsets(self) -> Generator[Tuple[int, memoryview], None, None]:
+        """Yields (offset, record) tuples, where `offset` is the position of the record in the decompressed data."""
+
+        boundary = b"\n" + self.record_start_marker
+        pending = b""
+        pending_offset = self.start_decompressed_offset
+        for chunk in self.iter_chunks():
+            data = pending + chunk if pending else chunk
+            view = memoryview(data)
+
+            #
+            start = 0
+            while True:
+                next_boundary = data.find(boundary, start + 1)
+                if next_boundary == -1:
+                    break
+                end = next_boundary + 1
+                yield pending_offset + start, view[start:end]
+                start = end
+
+            # keep the trailing (possibly incomplete) record for the next chunk
+            pending = data[start:]
+            pending_offset += start
+
+        if pending:
+            yield pending_offset, memoryview(pending)
+
+    def iter_records(self) -> Generator[memoryview, None, None]:
+        for _, record in self.iter_records_with_offsets():
+            yield record
+
+    @staticmethod
+    def get_record_header_fields(record: Union[bytes, memoryview]) -> Dict[str, str]:
+        """Parses the "##########   Field: value" header lines of a record into a dict."""
+
+        header = bytes(record[:4096])
+        header_end = header.find(MOL2_HEADER_INDICATOR.encode())
+        if header_end == -1 and len(record) > len(header):
+            header = bytes(record)
+            header_end = header.find(MOL2_HEADER_INDICATOR.encode())
+        if header_end != -1:
+            header = header[:header_end]
+
+        return {
+            key.strip().decode("utf-8", errors="ignore"): value.decode("utf-8", errors="ignore")
+            for key, value in MOL2_RECORD_HEADER_FIELD_PATTERN.findall(header)
+        }
+
+
+Mol2IndexEntry = collections.namedtuple(
+    "Mol2IndexEntry",
+    [
+        "name",
+        "total_energy",
+        "member_compressed_offset",
+        "member_decompressed_offset",
+        "record_offset",
+        "record_length",
+    ],
+)
+
+
+class Mol2IndexFile(File):
+    """
+    Sidecar index of the poses in a mol2 file written by DOCK, stored next to it as `{mol2 file}.index`.
+
+    Each line maps a pose (molecule name and total energy) to the offset and length of its record
+    in the decompressed data, along with the gzip member in which the record begins. A pose can
+    therefore be read by seeking to that member and decompressing only as far as the end of the
+    record, instead of decompressing and parsing the whole file.
+
+    The first line records the size and modification time (in whole seconds, which `cp -p`
+    preserves) of the mol2 file the index was built from, so that an index that has gone stale is
+    not used.
+    """
+
+    FILE_SUFFIX = ".index"
+    HEADER_PREFIX = "# mol2_index"
+
+    def __init__(self, path: str, validate_existence: bool = False):
+        super().__init__(path=path, validate_existence=validate_existence)
+
+    @staticmethod
+    def get_index_file_path(mol2_file_path: str) -> str:
+        return f"{mol2_file_path}{Mol2IndexFile.FILE_SUFFIX}"
+
+    @staticmethod
+    def get_source_signature(mol2_file_path: str) -> Tuple[int, int]:
+        stat = os.stat(mol2_file_path)
+        return stat.st_size, int(stat.st_mtime)
+
+    def write(self, entries: List[Mol2IndexEntry], source_signature: Tuple[int, int]) -> None:
+        """Writes the index atomically, so that readers never see a partially-written index."""
+
+        source_size, source_mtime = source_signature
+        temp_file_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_file_path, "w") as f:
+            f.write(f"{self.HEADER_PREFIX}\tsource_size={source_size}\tsource_mtime={source_mtime}\n")
+            for entry in entries:
+                f.write("\t".join(str(value) for value in entry) + "\n")
+        os.replace(temp_file_path, self.path)
+
+    def read(self) -> Tuple[Tuple[int, int], List[Mol2IndexEntry]]:
+        """Returns (source_signature, entries)."""
+
+        with open(self.path, "r") as f:
+            header_tokens = f.readline().rstrip("\n").split("\t")
+            if header_tokens[0] != self.HEADER_PREFIX:
+                raise Exception(f"Mol2IndexFile {self.path} does not begin with '{self.HEADER_PREFIX}'.")
+            header_dict = dict(token.split("=", 1) for token in header_tokens[1:])
+            source_signature = (int(header_dict["source_size"]), int(header_dict["source_mtime"]))
+
+            entries = []
+            for line in f:
+                name, total_energy, *offsets = line.rstrip("\n").split("\t")
+                entries.append(Mol2IndexEntry(name, float(total_energy), *[int(x) for x in offsets]))
+
+        return source_signature, entries
+
+    @staticmethod
+    def load_entries_if_fresh(mol2_file_path: str) -> Optional[List[Mol2IndexEntry]]:
+        """Returns the entries of the index of the supplied mol2 file, or None if there is no up-to-date index."""
+
+        index_file = Mol2IndexFile(Mol2IndexFile.get_index_file_path(mol2_file_path))
+        if not index_file.exists:
+            return None
+        try:
+            source_signature, entries = index_file.read()
+        except Exception as e:
+            logger.debug(f"Failed to read Mol2IndexFile {index_file.path}: {e}")
+            return None
+        if source_signature != Mol2IndexFile.get_source_signature(mol2_file_path):
+            return None
+
+        return entries
+
+    @staticmethod
+    def get_entries_from_records(
+        records_with_offsets: Iterable[Tuple[int, Union[bytes, memoryview]]],
+        member_offsets: List[Tuple[int, int]],
+    ) -> Generator[Tuple[Mol2IndexEntry, Union[bytes, memoryview]], None, None]:
+        """Yields (entry, record) tuples for the pose records among those supplied.
+
+        `member_offsets` is the (growing) list of gzip members seen so far by the scanner
+        producing the records, e.g. `Mol2RecordScanner.member_offsets`."""
+
+        member_index = 0
+        for offset, record in records_with_offsets:
+            header_fields = Mol2RecordScanner.get_record_header_fields(record)
+            if "Name" not in header_fields:
+                continue  # not a pose
+            while member_index + 1 < len(member_offsets) and member_offsets[member_index + 1][1] <= offset:
+                member_index += 1
+            member_compressed_offset, member_decompressed_offset = member_offsets[member_index]
+            entry = Mol2IndexEntry(
+                header_fields["Name"],
+                float(header_fields.get("Total Energy", 99999)),
+                member_compressed_offset,
+                member_decompressed_offset,
+                offset,
+                len(record),
+            )
+            yield entry, record
+
+    @staticmethod
+    def create_for_mol2_file(mol2_file_path: str) -> "Mol2IndexFile":
+        """Scans the supplied mol2 file and writes its index."""
+
+        source_signature = Mol2IndexFile.get_source_signature(mol2_file_path)
+        scanner = Mol2RecordScanner(mol2_file_path)
+        entries = [
+            entry
+            for entry, _ in Mol2IndexFile.get_entries_from_records(
+                scanner.iter_records_with_offsets(), scanner.member_offsets
+            )
+        ]
+        index_file = Mol2IndexFile(Mol2IndexFile.get_index_file_path(mol2_file_path))
+        index_file.write(entries, source_signature)
+
+        return index_file
+
+    @staticmethod
+    def read_records(mol2_file_path: str, entries: List[Mol2IndexEntry]) -> Dict[int, bytes]:
+        """Reads the records of the supplied index entries, returning a dict of record offset to record.
+
+        Records are read in file order. Where a needed record lies in a later gzip member than
+        the current read position, decompression restarts at that member instead of continuing
+        through the data in between. For a single-member file, decompression stops at the end of
+        the last needed record."""
+
+        is_gzipped = File.file_is_gzipped(mol2_file_path)
+        offset_to_record = {}
+        scanner = None
+        chunks = None
+        buffer = b""  # decompressed data starting at `buffer_offset`
+        buffer_offset = 0
+        for entry in sorted(entries, key=lambda x: x.record_offset):
+            if is_gzipped:
+                start_offsets = (entry.member_compressed_offset, entry.member_decompressed_offset)
+            else:
+                start_offsets = (entry.record_offset, entry.record_offset)  # can seek straight to the record
+            if (scanner is None) or (start_offsets[1] > scanner.decompressed_position):
+                scanner = Mol2RecordScanner(
+                    mol2_file_path,
+                    chunk_size=1024 * 1024,
+                    start_compressed_offset=start_offsets[0],
+                    start_decompressed_offset=start_offsets[1],
+                )
+                chunks = scanner.iter_chunks()
+                buffer = b""
+                buffer_offset = start_offsets[1]
+
+            #
+            record_end = entry.record_offset + entry.record_length
+            while buffer_offset + len(buffer) < record_end:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    raise Exception(f"Mol2 file {mol2_file_path} ended before the end of the record at offset {entry.record_offset}. Is its index stale?")
+                if buffer_offset + len(buffer) <= entry.record_offset:  # nothing buffered is part of the record
+                    buffer_offset += len(buffer)
+                    buffer = chunk
+                else:
+                    buffer += chunk
+            start = entry.record_offset - buffer_offset
+            offset_to_record[entry.record_offset] = buffer[start:start + entry.record_length]
+
+            # records do not overlap, so data up to the end of this record is no longer needed
+            buffer = buffer[start + entry.record_length:]
+            buffer_offset = record_end
+
+        return offset_to_record
+
+
 class Mol2File(File):
     def __init__(self, path: str, validate_existence: bool = False):
         super().__init__(path=path, validate_existence=validate_existence)
@@ -1095,7 +1690,7 @@ class Mol2File(File):
 
         Assumptions:
         ------------
-        - The file is well-formatted according to the Mol2 standard.
+        - The file is well-formatted according to the Mol2 standard. It may be gzipped.
         - The Mol2Block class is available and properly defined.
 
         Example Usage:
@@ -1110,10 +1705,41 @@ class Mol2File(File):
         This function relies on `self.path` attribute to determine the file to read.
         """
 
-        with open(mol2_file_path, "r") as f:
-            lines = [line.strip() for line in f.readlines()]
+        return Mol2File.get_mol2_blocks_from_records(Mol2RecordScanner(mol2_file_path).iter_records())
 
-        mol2_blocks = Mol2File.split_mol2_file_lines_into_mol2_blocks(lines)
+    @staticmethod
+    def read_mol2_blocks_of_molecules(mol2_file_path: str, molecule_names: Iterable[str]) -> List[Mol2Block]:
+        """
+        Reads and parses only the Mol2 blocks of the poses of the supplied molecules.
+
+        If the file has an up-to-date index (see `Mol2IndexFile`), only the gzip members containing
+        the requested poses are decompressed. Otherwise, the file is scanned, but only the requested
+        poses are parsed.
+        """
+
+        molecule_names = set(molecule_names)
+        index_entries = Mol2IndexFile.load_entries_if_fresh(mol2_file_path)
+        if index_entries is not None:
+            entries = [entry for entry in index_entries if entry.name in molecule_names]
+            offset_to_record = Mol2IndexFile.read_records(mol2_file_path, entries)
+            records = [offset_to_record[offset] for offset in sorted(offset_to_record)]
+        else:
+            records = (
+                record
+                for record in Mol2RecordScanner(mol2_file_path).iter_records()
+                if Mol2RecordScanner.get_record_header_fields(record).get("Name") in molecule_names
+            )
+
+        return Mol2File.get_mol2_blocks_from_records(records)
+
+    @staticmethod
+    def get_mol2_blocks_from_records(records: Iterable[Union[bytes, memoryview]]) -> List[Mol2Block]:
+        mol2_blocks = []
+        for record in records:
+            lines = [line.strip() for line in bytes(record).decode("utf-8").splitlines()]
+            if not any(line.startswith(MOL2_HEADER_STARTING_MOL2_BLOCK) for line in lines):
+                continue  # e.g., trailing whitespace
+            mol2_blocks += Mol2File.split_mol2_file_lines_into_mol2_blocks(lines)
 
         return mol2_blocks
 
@@ -1,11 +1,19 @@
 import logging
-from typing import Union, List, Iterable
+from typing import Union, List, Iterable, Optional, Dict, Set, Tuple, Deque
 import os
 from abc import ABC, abstractmethod
-from itertools import groupby
+from itertools import groupby, count
 from operator import itemgetter
 import re
+import signal
+import subprocess
+import time
+import weakref
 from subprocess import CompletedProcess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from dataclasses import dataclass, field
 import xml
 
 import xmltodict
@@ -18,12 +26,81 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+#
+DEFAULT_QUEUE_SNAPSHOT_MAX_AGE_SECONDS = 10
+
+
+@dataclass
+class QueueSnapshot:
+    """The tasks on a job scheduler's queue at one point in time, from a single query of the scheduler.
+
+    If `is_complete` is False, the snapshot only covers the jobs whose IDs were queried."""
+    task_key_to_scheduler_task_id: Dict[Tuple[str, str], str] = field(default_factory=dict)  # (job name, task ID) -> scheduler's ID of the task (e.g., '1234_5')
+    job_id_task_key_to_scheduler_task_id: Dict[Tuple[str, str], str] = field(default_factory=dict)  # (job ID, task ID) -> ^
+    job_names: Set[str] = field(default_factory=set)
+    job_ids: Set[str] = field(default_factory=set)
+    is_complete: bool = True
+    time_created: float = field(default_factory=time.monotonic)
+
+    def add_job(self, job_name: str, job_id: Optional[str] = None) -> None:
+        self.job_names.add(job_name)
+        if job_id is not None:
+            self.job_ids.add(job_id)
+
+    def add_task(self, job_name: str, job_id: Optional[str], task_id: Union[str, int], scheduler_task_id: str) -> None:
+        self.add_job(job_name, job_id)
+        self.task_key_to_scheduler_task_id[(job_name, str(task_id))] = scheduler_task_id
+        if job_id is not None:
+            self.job_id_task_key_to_scheduler_task_id[(job_id, str(task_id))] = scheduler_task_id
+
+    def get_scheduler_task_id(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[str]:
+        """Looks the task up by the IDs of the jobs it may belong to if they are supplied, or else by job name."""
+
+        if job_ids is None:
+            return self.task_key_to_scheduler_task_id.get((job_name, str(task_id)))
+        for job_id in job_ids:
+            scheduler_task_id = self.job_id_task_key_to_scheduler_task_id.get((job_id, str(task_id)))
+            if scheduler_task_id is not None:
+                return scheduler_task_id
+
+        return None
+
+    def has_job(self, job_name: str, job_ids: Optional[Iterable[str]] = None) -> bool:
+        if job_ids is None:
+            return job_name in self.job_names
+        return any(job_id in self.job_ids for job_id in job_ids)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.time_created
+
+
 class JobScheduler(ABC):
+    """
+    Base class of job schedulers.
+
+    Queue membership queries are answered from a `QueueSnapshot`, which is refreshed by a single query of the
+    scheduler at most every `queue_snapshot_max_age_seconds` (env var QUEUE_SNAPSHOT_MAX_AGE_SECONDS), so that
+    monitoring many tasks does not cost one scheduler query per task. The snapshot is invalidated whenever tasks
+    are submitted or cancelled.
+
+    The IDs of submitted jobs are parsed from the output of the submission commands. Queries that supply them
+    (`job_ids`) match jobs exactly, and, where the scheduler supports it, the snapshot only covers those jobs.
+    Queries by job name alone (e.g., of jobs submitted by a previous process) need the whole queue.
+    """
+
     REQUIRED_ENV_VAR_NAMES = []
 
     def __init__(self, name):
         self.name = name
 
+        #
+        self.queue_snapshot_max_age_seconds = float(os.environ.get("QUEUE_SNAPSHOT_MAX_AGE_SECONDS", DEFAULT_QUEUE_SNAPSHOT_MAX_AGE_SECONDS))
+        self._queue_snapshot = None
+        self._submitted_job_ids = set()  # submitted jobs that were on the queue as of the last snapshot
+        self._job_ids_no_longer_on_queue = set()
+        self._job_id_of_submission = weakref.WeakKeyDictionary()  # job ID parsed from each recorded submission (None if unparsable)
+
     @abstractmethod
     def submit(
             self,
@@ -33,18 +110,109 @@ class JobScheduler(ABC):
             log_dir_path: str,
             task_ids: Iterable[Union[str, int]],
             job_timeout_minutes: Union[int, None] = None,
-            extra_submission_cmd_params_str: [str, None] = None
+            extra_submission_cmd_params_str: [str, None] = None,
+            max_tasks_running_at_a_time: Union[int, None] = None,
     ):
-        """returns: subprocess.CompletedProcess"""
+        """returns: subprocess.CompletedProcess
+
+        `max_tasks_running_at_a_time` limits the number of the submitted tasks that the scheduler runs at once,
+        where the scheduler supports it. Schedulers throttle each submitted array job separately, so the limit
+        applies per submission command: if the tasks are split across several submissions (e.g., non-contiguous
+        ranges for SGE, or very long task lists for Slurm), up to this many tasks of each may run at once. Callers
+        needing a global limit must bound the number of tasks they submit (see DockOpt's submission window)."""
+
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job_id_of_submission(self, proc: CompletedProcess) -> Optional[str]:
+        """Parses the ID of the submitted job from the output of a submission command (None if it cannot be found)."""
 
         raise NotImplementedError
 
+    def get_job_ids_of_submissions(self, procs: Iterable[CompletedProcess]) -> List[str]:
+        """IDs of the jobs of the supplied submissions, skipping those whose ID cannot be parsed. Submissions made
+        by this scheduler were parsed (and any failure logged) when they were recorded, so are not parsed again."""
+
+        job_ids = []
+        for proc in procs:
+            if proc in self._job_id_of_submission:
+                job_id = self._job_id_of_submission[proc]
+            else:
+                job_id = self._parse_job_id_of_submission(proc)
+            if job_id is not None:
+                job_ids.append(job_id)
+
+        return job_ids
+
+    def _parse_job_id_of_submission(self, proc: CompletedProcess) -> Optional[str]:
+        job_id = self.get_job_id_of_submission(proc)
+        if job_id is None:
+            logger.warning(f"Failed to parse {self.name} job ID from submission output: {proc.stdout}")
+
+        return job_id
+
+    def __getstate__(self):
+        # weak references cannot be pickled (and the submissions they refer to are not pickled with the scheduler)
+        state = self.__dict__.copy()
+        state["_job_id_of_submission"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._job_id_of_submission = weakref.WeakKeyDictionary()
+
+    def _record_submissions(self, procs: Iterable[CompletedProcess]) -> None:
+        for proc in procs:
+            job_id = self._parse_job_id_of_submission(proc)
+            self._job_id_of_submission[proc] = job_id
+            if job_id is not None:
+                self._submitted_job_ids.add(job_id)
+        self.invalidate_queue_snapshot()
+
     @abstractmethod
-    def job_is_on_queue(self, job_name: str) -> bool:
+    def _query_queue_snapshot(self, job_ids: Optional[Set[str]] = None) -> QueueSnapshot:
+        """Queries the scheduler for every task on the queue (or, if `job_ids` is supplied and the scheduler supports
+        it, only for the tasks of those jobs). Raises an exception if the query fails."""
+
         raise NotImplementedError
 
+    def get_queue_snapshot(self, refresh: bool = False, job_ids: Optional[Iterable[str]] = None) -> QueueSnapshot:
+        """Snapshot of the queue, covering at least the supplied jobs (or the whole queue if `job_ids` is None)."""
+
+        needs_complete_snapshot = job_ids is None or not set(job_ids).issubset(self._submitted_job_ids | self._job_ids_no_longer_on_queue)
+        if (
+            refresh
+            or self._queue_snapshot is None
+            or self._queue_snapshot.age_seconds >= self.queue_snapshot_max_age_seconds
+            or (needs_complete_snapshot and not self._queue_snapshot.is_complete)
+        ):
+            try:
+                self._queue_snapshot = self._query_queue_snapshot(job_ids=(None if needs_complete_snapshot else set(self._submitted_job_ids)))
+            except Exception as e:
+                if self._queue_snapshot is None:
+                    raise
+                logger.warning(f"Failed to query {self.name} queue. Using snapshot from {self._queue_snapshot.age_seconds:.0f} seconds ago. Error: {e}")
+            else:
+                # stop querying jobs that have left the queue, so that the query does not grow with every submission
+                job_ids_no_longer_on_queue = self._submitted_job_ids - self._queue_snapshot.job_ids
+                self._submitted_job_ids -= job_ids_no_longer_on_queue
+                self._job_ids_no_longer_on_queue |= job_ids_no_longer_on_queue
+
+        return self._queue_snapshot
+
+    def invalidate_queue_snapshot(self) -> None:
+        self._queue_snapshot = None
+
+    def job_is_on_queue(self, job_name: str, job_ids: Optional[Iterable[str]] = None) -> bool:
+        return self.get_queue_snapshot(job_ids=job_ids).has_job(job_name, job_ids=job_ids)
+
+    def task_is_on_queue(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> bool:
+        return self.get_queue_snapshot(job_ids=job_ids).get_scheduler_task_id(task_id, job_name, job_ids=job_ids) is not None
+
     @abstractmethod
-    def task_is_on_queue(self, task_id: Union[str, int], job_name: str) -> bool:
+    def cancel_task(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[CompletedProcess]:
+        """returns: subprocess.CompletedProcess, or None if the task is not on the queue"""
+
         raise NotImplementedError
 
 
@@ -63,6 +231,7 @@ class SlurmJobScheduler(JobScheduler):
 
         # set optional env vars
         self.SLURM_SETTINGS = os.environ.get("SLURM_SETTINGS")
+        self.SCANCEL_EXEC = os.environ.get("SCANCEL_EXEC", os.path.join(os.path.dirname(self.SQUEUE_EXEC), "scancel"))
 
         #
         if self.SLURM_SETTINGS:
@@ -77,6 +246,7 @@ class SlurmJobScheduler(JobScheduler):
             task_ids: Iterable[Union[str, int]],
             job_timeout_minutes: Union[int, None] = None,
             extra_submission_cmd_params_str: [str, None] = None,
+            max_tasks_running_at_a_time: Union[int, None] = None,
     ) -> List[CompletedProcess]:
         #
         if extra_submission_cmd_params_str is None:
@@ -99,7 +269,9 @@ class SlurmJobScheduler(JobScheduler):
 
             curr_tasks_array_indices_str = ",".join([str(x) for x in curr_tasks_array_indices + [index_str]])
             if(len(curr_tasks_array_indices_str) >= max_chars_in_tasks_array_str) or (i == num_sets - 1):
-                command_str = f"{self.SBATCH_EXEC} --export=ALL -J {job_name} -o {log_dir_path}/{job_name}_%A_%a.out -e {log_dir_path}/{job_name}_%A_%a.err --signal=B:USR1@120 {extra_submission_cmd_params_str} --array={curr_tasks_array_indices_str}"  # TODO: is `signal` useful / necessary?
+                command_str = f"{self.SBATCH_EXEC} --parsable --export=ALL -J {job_name} -o {log_dir_path}/{job_name}_%A_%a.out -e {log_dir_path}/{job_name}_%A_%a.err --signal=B:USR1@120 {extra_submission_cmd_params_str} --array={curr_tasks_array_indices_str}"  # TODO: is `signal` useful / necessary?
+                if max_tasks_running_at_a_time is not None:
+                    command_str += f"%{max_tasks_running_at_a_time}"  # per submission, not across chunks
                 curr_tasks_array_indices = []
             else:
                 continue
@@ -118,35 +290,59 @@ class SlurmJobScheduler(JobScheduler):
             )  # need to pass env_vars_dict here so that '--export=ALL' in command can pass along all the env vars
             procs.append(proc)
 
+        #
+        self._record_submissions(procs)
+
         return procs
 
-    def job_is_on_queue(self, job_name: str) -> bool:
-        command_str = f"{self.SQUEUE_EXEC} --format='%i %j %t' | grep '{job_name}'"
-        proc = system_call(command_str)
+    def get_job_id_of_submission(self, proc: CompletedProcess) -> Optional[str]:
+        match = re.match(r'^\s*(\d+)', proc.stdout or "")  # `--parsable` prints '<job ID>' or '<job ID>;<cluster>'
+        if match is None:
+            return None
 
-        #
-        if proc.stdout:
-            return True
-        else:
-            return False
+        return match.group(1)
 
-    def task_is_on_queue(self, task_id: Union[str, int], job_name: str) -> bool:
-        command_str = f"{self.SQUEUE_EXEC} -r --format='%i %j %t' | grep '{job_name}'"
+    def _query_queue_snapshot(self, job_ids: Optional[Set[str]] = None) -> QueueSnapshot:
+        command_str = f"{self.SQUEUE_EXEC} -r --noheader --format='%i %t %j'"  # `-r` lists each array task on its own line
+        if job_ids is not None:
+            if not job_ids:
+                return QueueSnapshot(is_complete=False)
+            command_str += f" -j {','.join(sorted(job_ids))}"
         proc = system_call(command_str)
+        if proc.returncode != 0:
+            if job_ids is not None and "Invalid job id" in (proc.stderr or ""):  # all of the jobs have left the queue
+                return QueueSnapshot(is_complete=False)
+            raise Exception(f"Command '{command_str}' failed. stderr: {proc.stderr}")
 
-        #
-        if not proc.stdout:
-            return False
+        return self.get_queue_snapshot_from_squeue_output(proc.stdout, is_complete=(job_ids is None))
 
-        #
-        for line in proc.stdout.split('\n'):
+    @staticmethod
+    def get_queue_snapshot_from_squeue_output(squeue_output: str, is_complete: bool = True) -> QueueSnapshot:
+        """Parses the output of `squeue -r --noheader --format='%i %t %j'`."""
+
+        snapshot = QueueSnapshot(is_complete=is_complete)
+        for line in squeue_output.split('\n'):
             line_stripped = line.strip()
             if line_stripped:
-                job_id, job_name, state = line_stripped.split()
-                if job_id.endswith(f"_{task_id}"):
-                    return True
+                scheduler_task_id, state, job_name = line_stripped.split(maxsplit=2)
+                if "_" in scheduler_task_id:
+                    job_id, task_id = scheduler_task_id.split("_", 1)
+                    snapshot.add_task(job_name, job_id, task_id, scheduler_task_id)
+                else:
+                    snapshot.add_job(job_name, scheduler_task_id)
+
+        return snapshot
 
-        return False
+    def cancel_task(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[CompletedProcess]:
+        scheduler_task_id = self.get_queue_snapshot(refresh=True, job_ids=job_ids).get_scheduler_task_id(task_id, job_name, job_ids=job_ids)
+        if scheduler_task_id is None:
+            return None
+
+        #
+        proc = system_call(f"{self.SCANCEL_EXEC} {scheduler_task_id}")
+        self.invalidate_queue_snapshot()
+
+        return proc
 
 
 class SGEJobScheduler(JobScheduler):
@@ -164,6 +360,7 @@ class SGEJobScheduler(JobScheduler):
 
         # set optional env vars
         self.SGE_SETTINGS = os.environ.get("SGE_SETTINGS")
+        self.QDEL_EXEC = os.environ.get("QDEL_EXEC", os.path.join(os.path.dirname(self.QSTAT_EXEC), "qdel"))
 
         #
         if self.SGE_SETTINGS:
@@ -178,6 +375,7 @@ class SGEJobScheduler(JobScheduler):
             task_ids: Iterable[Union[str, int]],
             job_timeout_minutes: Union[int, None] = None,
             extra_submission_cmd_params_str: [str, None] = None,
+            max_tasks_running_at_a_time: Union[int, None] = None,
     ) -> List[CompletedProcess]:
         #
         if extra_submission_cmd_params_str is None:
@@ -201,6 +399,9 @@ class SGEJobScheduler(JobScheduler):
 
             command_str = f"{self.QSUB_EXEC} -V -N {job_name} -o {log_dir_path} -e {log_dir_path} -cwd {extra_submission_cmd_params_str} -t {array_str}"
 
+            if max_tasks_running_at_a_time is not None:
+                command_str += f" -tc {max_tasks_running_at_a_time}"  # per contiguous range, since each is its own job
+
             if job_timeout_minutes is not None:
                 job_timeout_seconds = 60 * job_timeout_minutes
                 command_str += (
@@ -218,15 +419,17 @@ class SGEJobScheduler(JobScheduler):
             )  # need to pass env_vars_dict here so that '-V' in command can pass along all the env vars
             procs.append(proc)
 
+        #
+        self._record_submissions(procs)
+
         return procs
 
-    def job_is_on_queue(self, job_name: str) -> bool:
-        command_str = f"{self.QSTAT_EXEC} -r | grep '{job_name}'"
-        proc = system_call(command_str)
-        if proc.stdout:
-            return True
-        else:
-            return False
+    def get_job_id_of_submission(self, proc: CompletedProcess) -> Optional[str]:
+        match = re.search(r'Your job(?:-array)? (\d+)', proc.stdout or "")  # e.g., 'Your job-array 1234.1-10:1 ("name") has been submitted'
+        if match is None:
+            return None
+
+        return match.group(1)
 
     def _get_qstat_xml_as_dict(self) -> dict:
         command_str = f"{self.QSTAT_EXEC} -xml"
@@ -238,13 +441,31 @@ class SGEJobScheduler(JobScheduler):
         except xml.parsers.expat.ExpatError as e:
             raise Exception(f"Error parsing XML from command '{command_str}'. \nstdout: \n{proc.stdout}\n\nstderr: {proc.stderr}") from e
 
-    def task_is_on_queue(self, task_id: Union[str, int], job_name: str) -> bool:
-        task_num = int(task_id)
+    @staticmethod
+    def _get_task_nums_from_tasks_str(tasks_str: str) -> List[int]:
+        """Task numbers of a qstat `tasks` field, e.g., '7', '1-100:1', or '1,3-5'."""
 
-        #
-        q_dict = self._get_qstat_xml_as_dict()
+        task_nums = []
+        for part in tasks_str.split(","):
+            match = re.match(r'^(\d+)(?:-(\d+)(?::(\d+))?)?$', part.strip())
+            if match is None:
+                logger.warning(f"Unexpected format of qstat tasks: {tasks_str}")
+                continue
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) is not None else start
+            step = int(match.group(3)) if match.group(3) is not None else 1
+            task_nums += list(range(start, end + 1, step))
+
+        return task_nums
+
+    def _query_queue_snapshot(self, job_ids: Optional[Set[str]] = None) -> QueueSnapshot:
+        # `qstat -j` reports job details rather than task states, so the whole queue is always queried
+        return self.get_queue_snapshot_from_qstat_dict(self._get_qstat_xml_as_dict())
+
+    @classmethod
+    def get_queue_snapshot_from_qstat_dict(cls, q_dict: dict) -> QueueSnapshot:
+        """Parses the output of `qstat -xml`, as parsed by xmltodict."""
 
-        #
         job_list_values = find_key_values_in_dict(q_dict, key='job_list')
 
         #
@@ -258,35 +479,257 @@ class SGEJobScheduler(JobScheduler):
                 raise Exception(f"Unexpected type for `job_list`: {type(obj)}")
 
         #
+        snapshot = QueueSnapshot()
         for job_dict in job_dicts:
-            #
-            if not job_dict.get('JB_name') == job_name:
+            job_name = job_dict.get('JB_name')
+            if job_name is None:
                 continue
+            job_id = job_dict.get('JB_job_number')
+            snapshot.add_job(job_name, job_id)
 
             #
             tasks_str = job_dict.get('tasks')
             if tasks_str is None:
                 continue
+            for task_num in cls._get_task_nums_from_tasks_str(tasks_str):
+                snapshot.add_task(job_name, job_id, task_num, f"{job_id}.{task_num}")
 
-            #
-            pattern = r'^(\d+)[,-](\d+)(:\d+)?$'
-            match = re.match(pattern, tasks_str)
-            if match is not None:
-                if match.group(1) is not None and match.group(2) is not None:
-                    start = int(match.group(1))
-                    end = int(match.group(2))
-                    if (task_num >= start) and (task_num <= end):
-                        #
-                        return True
+        return snapshot
 
-            #
-            pattern = r'^(\d+)$'
-            match = re.match(pattern, tasks_str)
-            if match is not None:
-                if match.group(1) is not None:
-                    num = int(match.group(1))
-                    if task_num == num:
-                        return True
+    def cancel_task(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[CompletedProcess]:
+        scheduler_task_id = self.get_queue_snapshot(refresh=True, job_ids=job_ids).get_scheduler_task_id(task_id, job_name, job_ids=job_ids)
+        if scheduler_task_id is None:
+            return None
+
+        #
+        job_id = scheduler_task_id.split(".")[0]
+        command_str = f"{self.QDEL_EXEC} {job_id} -t {int(task_id)}"
+        if self.SGE_SETTINGS:
+            if File.file_exists(self.SGE_SETTINGS):
+                command_str = f"source {self.SGE_SETTINGS}; {command_str}"
+        proc = system_call(command_str)
+        self.invalidate_queue_snapshot()
+
+        return proc
+
+
+@dataclass
+class LocalTask:
+    """State of a task of a job submitted to `LocalJobScheduler`."""
+    job_id: str
+    task_id: str
+    future: Optional[Future] = None
+    process: Optional[subprocess.Popen] = None
+    cancelled: bool = False
+    command_args: List[str] = field(default_factory=list)
+    env_vars_dict: dict = field(default_factory=dict)
+    log_file_path_prefix: str = ""
+    job_timeout_minutes: Optional[int] = None
+
+
+class LocalJobScheduler(JobScheduler):
+    """
+    Runs the tasks of array jobs as subprocesses on this machine, at most `num_slots` at a time (by default, the number
+    of CPUs, or the value of the env var LOCAL_SCHEDULER_NUM_SLOTS). Intended for workstations and tests.
+
+    If `max_tasks_running_at_a_time` is supplied to `submit`, the tasks of that submission are handed to the slots at
+    most that many at a time, the next one as each finishes (like Slurm's `%N` and SGE's `-tc`, per submission).
+
+    The queue is held in memory, so it is only visible to the process that submitted the jobs.
+    """
+
+    REQUIRED_ENV_VAR_NAMES = []
+    TIMEOUT_GRACE_SECONDS = 120  # time given to a task to save its progress after being signaled that it timed out (as with Slurm's `--signal=B:USR1@120`)
+
+    def __init__(self, num_slots: Optional[int] = None) -> None:
+        super().__init__(name="local")
 
         #
-        return False
+        if num_slots is None:
+            num_slots = int(os.environ.get("LOCAL_SCHEDULER_NUM_SLOTS", os.cpu_count() or 1))
+        if num_slots < 1:
+            raise ValueError(f"Number of slots must be at least 1. Witnessed: {num_slots}")
+        self.num_slots = num_slots
+
+        #
+        self._executor = ThreadPoolExecutor(max_workers=self.num_slots, thread_name_prefix="local_job_scheduler")
+        self._lock = threading.Lock()
+        self._job_nums = count(1)
+        self._job_name_to_task_id_to_task: Dict[str, Dict[str, LocalTask]] = {}
+        self._job_id_to_tasks_awaiting_start: Dict[str, Deque[Tuple[str, LocalTask]]] = {}  # (job name, task) of each task not yet handed to a slot
+
+    def submit(
+            self,
+            job_name: str,
+            script_path: str,
+            env_vars_dict: dict,
+            log_dir_path: str,
+            task_ids: Iterable[Union[str, int]],
+            job_timeout_minutes: Union[int, None] = None,
+            extra_submission_cmd_params_str: [str, None] = None,
+            max_tasks_running_at_a_time: Union[int, None] = None,
+    ) -> List[CompletedProcess]:
+        task_ids = [str(task_id) for task_id in task_ids]
+        if not task_ids:
+            return []
+
+        #
+        job_id = f"{os.getpid()}{next(self._job_nums):04d}"
+        env_vars_dict = {**os.environ, **env_vars_dict, "LOCAL_ARRAY_JOB_ID": job_id}
+        command_args = ["bash", script_path]
+
+        #
+        with self._lock:
+            task_id_to_task = self._job_name_to_task_id_to_task.setdefault(job_name, {})
+            tasks_awaiting_start = self._job_id_to_tasks_awaiting_start.setdefault(job_id, deque())
+            for task_id in task_ids:
+                task = LocalTask(
+                    job_id=job_id,
+                    task_id=task_id,
+                    command_args=command_args,
+                    env_vars_dict={**env_vars_dict, "LOCAL_ARRAY_TASK_ID": task_id},
+                    log_file_path_prefix=os.path.join(log_dir_path, f"{job_name}_{job_id}_{task_id}"),
+                    job_timeout_minutes=job_timeout_minutes,
+                )
+                task_id_to_task[task_id] = task
+                tasks_awaiting_start.append((job_name, task))
+            num_tasks_to_start = len(task_ids) if max_tasks_running_at_a_time is None else max(1, min(max_tasks_running_at_a_time, len(task_ids)))
+            for _ in range(num_tasks_to_start):
+                self._start_next_task_of_job(job_id)
+
+        procs = [CompletedProcess(args=command_args, returncode=0, stdout=f"Submitted local job {job_id} ({len(task_ids)} tasks)\n", stderr="")]
+        self._record_submissions(procs)
+
+        return procs
+
+    def get_job_id_of_submission(self, proc: CompletedProcess) -> Optional[str]:
+        match = re.match(r'^Submitted local job (\d+)', proc.stdout or "")
+        if match is None:
+            return None
+
+        return match.group(1)
+
+    def _start_next_task_of_job(self, job_id: str) -> None:
+        """Hands the next task of a submission that has not been cancelled to a slot. Must be called with the lock held."""
+
+        tasks_awaiting_start = self._job_id_to_tasks_awaiting_start.get(job_id)
+        while tasks_awaiting_start:
+            job_name, task = tasks_awaiting_start.popleft()
+            if not task.cancelled:
+                task.future = self._executor.submit(self._run_task, job_name, task)
+                break
+        if not tasks_awaiting_start:
+            self._job_id_to_tasks_awaiting_start.pop(job_id, None)
+
+    def _run_task(self, job_name: str, task: LocalTask) -> Optional[int]:
+        try:
+            with self._lock:
+                if task.cancelled:
+                    return None
+                with open(f"{task.log_file_path_prefix}.out", "w") as f_out, open(f"{task.log_file_path_prefix}.err", "w") as f_err:
+                    task.process = subprocess.Popen(
+                        task.command_args,
+                        env=task.env_vars_dict,
+                        stdout=f_out,
+                        stderr=f_err,
+                        start_new_session=True,  # so that the task's whole process group can be signaled
+                    )
+
+            #
+            try:
+                timeout_seconds = None if task.job_timeout_minutes is None else max(60 * task.job_timeout_minutes - self.TIMEOUT_GRACE_SECONDS, 0)
+                return task.process.wait(timeout=timeout_seconds)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Task {task.task_id} of local job {job_name} timed out. Signaling it to save its progress.")
+                task.process.send_signal(signal.SIGUSR1)
+                try:
+                    return task.process.wait(timeout=self.TIMEOUT_GRACE_SECONDS)
+                except subprocess.TimeoutExpired:
+                    self._kill_process_group(task.process)
+                    return task.process.wait()
+        except Exception as e:
+            logger.warning(f"Failed to run task {task.task_id} of local job {job_name}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._remove_task(job_name, task)
+                self._start_next_task_of_job(task.job_id)
+
+    def _remove_task(self, job_name: str, task: LocalTask) -> None:
+        """Must be called with the lock held."""
+
+        task_id_to_task = self._job_name_to_task_id_to_task.get(job_name, {})
+        if task_id_to_task.get(task.task_id) is task:  # task may have been resubmitted since
+            del task_id_to_task[task.task_id]
+        if not task_id_to_task:
+            self._job_name_to_task_id_to_task.pop(job_name, None)
+
+    @staticmethod
+    def _kill_process_group(process: subprocess.Popen, sig: int = signal.SIGKILL) -> None:
+        try:
+            os.killpg(os.getpgid(process.pid), sig)
+        except ProcessLookupError:
+            pass  # already exited
+
+    def _query_queue_snapshot(self, job_ids: Optional[Set[str]] = None) -> QueueSnapshot:
+        snapshot = QueueSnapshot()
+        with self._lock:
+            for job_name, task_id_to_task in self._job_name_to_task_id_to_task.items():
+                for task_id, task in task_id_to_task.items():
+                    snapshot.add_task(job_name, task.job_id, task_id, f"{task.job_id}_{task_id}")
+
+        return snapshot
+
+    def _get_task(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[LocalTask]:
+        task = self._job_name_to_task_id_to_task.get(job_name, {}).get(str(task_id))
+        if task is not None and job_ids is not None and task.job_id not in job_ids:
+            return None
+
+        return task
+
+    def job_is_on_queue(self, job_name: str, job_ids: Optional[Iterable[str]] = None) -> bool:  # in-memory state is cheaper to query than a snapshot, and never stale
+        with self._lock:
+            tasks = self._job_name_to_task_id_to_task.get(job_name, {}).values()
+            if job_ids is None:
+                return bool(tasks)
+            job_ids = set(job_ids)
+            return any(task.job_id in job_ids for task in tasks)
+
+    def task_is_on_queue(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> bool:
+        with self._lock:
+            return self._get_task(task_id, job_name, job_ids=job_ids) is not None
+
+    def cancel_task(self, task_id: Union[str, int], job_name: str, job_ids: Optional[Iterable[str]] = None) -> Optional[CompletedProcess]:
+        with self._lock:
+            task = self._get_task(task_id, job_name, job_ids=job_ids)
+            if task is None:
+                return None
+            task.cancelled = True
+            if task.process is None:  # not started yet
+                if task.future is None:  # not yet handed to a slot, so it is skipped when its turn comes
+                    self._remove_task(job_name, task)
+                elif task.future.cancel():
+                    self._remove_task(job_name, task)
+                    self._start_next_task_of_job(task.job_id)
+            else:
+                self._kill_process_group(task.process, signal.SIGTERM)
+
+        return CompletedProcess(args=task.command_args, returncode=0, stdout=f"Cancelled task {task.task_id} of local job {task.job_id}\n", stderr="")
+
+    def shutdown(self, cancel_tasks: bool = False) -> None:
+        """Waits for all submitted tasks to finish (or, if `cancel_tasks`, cancels them first)."""
+
+        if cancel_tasks:
+            with self._lock:
+                job_names_and_task_ids = [(job_name, task_id) for job_name, task_id_to_task in self._job_name_to_task_id_to_task.items() for task_id in task_id_to_task]
+            for job_name, task_id in job_names_and_task_ids:
+                self.cancel_task(task_id, job_name)
+
+        # tasks awaiting start are handed to a slot as others finish, so wait for every task before shutting down the slots
+        while True:
+            with self._lock:
+                futures = [task.future for task_id_to_task in self._job_name_to_task_id_to_task.values() for task in task_id_to_task.values() if task.future is not None]
+            if not futures:
+                break
+            wait(futures)
+        self._executor.shutdown(wait=True)
@@ -2,14 +2,14 @@ import logging
 import subprocess
 from typing import Tuple, List, Optional
 import os
+import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum
 
-from timeout_decorator import timeout
-
 from pydock3.files import Dir, File
 from pydock3.job_schedulers import JobScheduler
+from pydock3.task_completion_watcher import TaskCompletionWatcher, DONE_MARKERS_DIR_NAME, publish_done_marker
 
 from pydock3.docking import __file__ as DOCKING_INIT_FILE_PATH
 
@@ -28,6 +28,7 @@ logger.setLevel(logging.DEBUG)
 
 #
 OUTDOCK_FILE_NAME = "OUTDOCK.0"
+PARTIAL_OUTDOCK_FILE_NAME = "partial_dock_results"  # copy of OUTDOCK synced while DOCK is running (name must not contain 'OUTDOCK', see rundock.bash)
 
 
 #
@@ -58,6 +59,10 @@ class ArrayDockingJob(ABC):
     extra_submission_cmd_params_str: Optional[str] = None
     sleep_seconds_after_copying_output: int = 0
     export_mol2: bool = True
+    write_mol2_index: bool = False
+    write_outdock_scores: bool = False  # requires PYTHON_EXEC (this interpreter) to be executable on the compute nodes
+    partial_output_sync_seconds: int = 0  # if > 0, the OUTDOCK of each running task is synced to its task dir at this interval
+    max_tasks_running_at_a_time: Optional[int] = None  # passed to the job scheduler's own throttle where available (e.g., Slurm's `--array=...%N`), which applies per submission command
     #max_reattempts: int = 0  # TODO
 
     def __post_init__(self):
@@ -74,6 +79,13 @@ class ArrayDockingJob(ABC):
         # create log dirs
         self.log_dir = Dir(os.path.join(self.job_dir.path, "logs"), create=True, reset=False)
 
+        # IDs the job scheduler assigned to the submissions of this job's tasks, so that the scheduler can be queried by ID instead of by name
+        self.scheduler_job_ids = []
+        self._all_scheduler_job_ids_are_known = True
+
+        #
+        self._task_completion_watcher = None  # created on first use
+
     def submit_all_tasks(
             self,
             skip_if_complete: bool = True,
@@ -97,23 +109,11 @@ class ArrayDockingJob(ABC):
         task_ids_to_submit = []
         for task_id in self.task_ids:
             if not (self.task_is_complete(task_id) and skip_if_complete):
-                task_dir = Dir(os.path.join(self.job_dir.path, task_id), create=True, reset=True)  # reset dir
+                self.reset_task_dir(task_id)
                 task_ids_to_submit.append(task_id)
 
         # set env vars dict
-        env_vars_dict = {
-            "EXPORT_DEST": self.job_dir.path,
-            "TMPDIR": self.temp_storage_path,
-            "ARRAY_JOB_DOCKING_CONFIGURATIONS": self.array_job_docking_configurations_file_path,
-            "INPUT_DIR": self.input_molecules_dir_path,
-            "SLEEP_SECONDS_AFTER_COPYING_OUTPUT": str(self.sleep_seconds_after_copying_output),
-        }
-
-        #
-        if self.export_mol2:
-            env_vars_dict["EXPORT_MOL2"] = "true"
-        else:
-            env_vars_dict["EXPORT_MOL2"] = "false"
+        env_vars_dict = self.get_env_vars_dict()
 
         # submit job
         procs = self.job_scheduler.submit(
@@ -124,7 +124,9 @@ class ArrayDockingJob(ABC):
             task_ids=task_ids_to_submit,
             job_timeout_minutes=self.job_timeout_minutes,
             extra_submission_cmd_params_str=self.extra_submission_cmd_params_str,
+            max_tasks_running_at_a_time=self.max_tasks_running_at_a_time,
         )
+        self._add_scheduler_job_ids_of_submissions(procs)
 
         failed_procs = [proc for proc in procs if proc.stderr]
         if failed_procs:
@@ -151,23 +153,66 @@ class ArrayDockingJob(ABC):
         # reset task dir
         task_ids_to_submit = []
         if not (self.task_is_complete(task_id) and skip_if_complete):
-            task_dir = Dir(os.path.join(self.job_dir.path, task_id), create=True, reset=True)  # reset dir
+            self.reset_task_dir(task_id)
             task_ids_to_submit.append(task_id)
 
         # set env vars dict
-        env_vars_dict = {
-            "EXPORT_DEST": self.job_dir.path,
-            "TMPDIR": self.temp_storage_path,
-            "ARRAY_JOB_DOCKING_CONFIGURATIONS": self.array_job_docking_configurations_file_path,
-            "INPUT_DIR": self.input_molecules_dir_path,
-            "SLEEP_SECONDS_AFTER_COPYING_OUTPUT": str(self.sleep_seconds_after_copying_output),
-        }
+        env_vars_dict = self.get_env_vars_dict()
 
-        #
-        if self.export_mol2:
-            env_vars_dict["EXPORT_MOL2"] = "true"
+        # submit job
+        procs = self.job_scheduler.submit(
+            job_name=self.name,
+            script_path=DOCK_RUN_SCRIPT_PATH,
+            env_vars_dict=env_vars_dict,
+            log_dir_path=self.log_dir.path,
+            task_ids=task_ids_to_submit,
+            job_timeout_minutes=self.job_timeout_minutes,
+            extra_submission_cmd_params_str=self.extra_submission_cmd_params_str,
+            max_tasks_running_at_a_time=self.max_tasks_running_at_a_time,
+        )
+        self._add_scheduler_job_ids_of_submissions(procs)
+
+        failed_procs = [proc for proc in procs if proc.stderr]
+        if failed_procs:
+            return JobSubmissionResult.FAILED, failed_procs
         else:
-            env_vars_dict["EXPORT_MOL2"] = "false"
+            return JobSubmissionResult.SUCCESS, []
+
+    def submit_tasks(
+            self,
+            task_ids: List[str],
+            skip_if_complete: bool = True,
+    ) -> Tuple[JobSubmissionResult, List[subprocess.CompletedProcess]]:
+        """
+        Submits the supplied tasks together. Tasks that are complete (if `skip_if_complete`) or still on the job
+        scheduler queue from a previous submission are skipped.
+
+        if job submission is skipped, returns (JobSubmissionResult, [])
+        if job submission is not skipped, returns (JobSubmissionResult, List[subprocess.CompletedProcess])
+        in case of failed submissions and (JobSubmissionResult, []) otherwise.
+        """
+
+        # reset task dirs
+        task_ids_to_submit = []
+        some_task_is_still_on_queue = False
+        for task_id in task_ids:
+            if skip_if_complete and self.task_is_complete(task_id):
+                continue
+            if self.job_scheduler.task_is_on_queue(task_id, job_name=self.name):  # looked up by name since it may have been submitted by a previous process
+                some_task_is_still_on_queue = True
+                self._all_scheduler_job_ids_are_known = False
+                continue
+            self.reset_task_dir(task_id)
+            task_ids_to_submit.append(task_id)
+
+        #
+        if not task_ids_to_submit:
+            if some_task_is_still_on_queue:
+                return JobSubmissionResult.SKIPPED_BECAUSE_STILL_ON_JOB_SCHEDULER_QUEUE, []
+            return JobSubmissionResult.SKIPPED_BECAUSE_ALREADY_COMPLETE, []
+
+        # set env vars dict
+        env_vars_dict = self.get_env_vars_dict()
 
         # submit job
         procs = self.job_scheduler.submit(
@@ -178,7 +223,9 @@ class ArrayDockingJob(ABC):
             task_ids=task_ids_to_submit,
             job_timeout_minutes=self.job_timeout_minutes,
             extra_submission_cmd_params_str=self.extra_submission_cmd_params_str,
+            max_tasks_running_at_a_time=self.max_tasks_running_at_a_time,
         )
+        self._add_scheduler_job_ids_of_submissions(procs)
 
         failed_procs = [proc for proc in procs if proc.stderr]
         if failed_procs:
@@ -186,9 +233,58 @@ class ArrayDockingJob(ABC):
         else:
             return JobSubmissionResult.SUCCESS, []
 
+    def get_env_vars_dict(self) -> dict:
+        """Returns the environmental variables to pass to the run script of each task."""
+
+        env_vars_dict = {
+            "EXPORT_DEST": self.job_dir.path,
+            "TMPDIR": self.temp_storage_path,
+            "ARRAY_JOB_DOCKING_CONFIGURATIONS": self.array_job_docking_configurations_file_path,
+            "INPUT_DIR": self.input_molecules_dir_path,
+            "SLEEP_SECONDS_AFTER_COPYING_OUTPUT": str(self.sleep_seconds_after_copying_output),
+            "PYTHON_EXEC": sys.executable,
+            "PARTIAL_OUTPUT_SYNC_SECONDS": str(self.partial_output_sync_seconds),
+            "DONE_MARKERS_DIR": self.done_markers_dir_path,
+        }
+
+        #
+        if self.export_mol2:
+            env_vars_dict["EXPORT_MOL2"] = "true"
+        else:
+            env_vars_dict["EXPORT_MOL2"] = "false"
+
+        #
+        if self.write_mol2_index:
+            env_vars_dict["WRITE_MOL2_INDEX"] = "true"
+        else:
+            env_vars_dict["WRITE_MOL2_INDEX"] = "false"
+
+        #
+        if self.write_outdock_scores:
+            env_vars_dict["WRITE_OUTDOCK_SCORES"] = "true"
+        else:
+            env_vars_dict["WRITE_OUTDOCK_SCORES"] = "false"
+
+        return env_vars_dict
+
+    def _add_scheduler_job_ids_of_submissions(self, procs: List[subprocess.CompletedProcess]) -> None:
+        job_ids = self.job_scheduler.get_job_ids_of_submissions(procs)
+        if len(job_ids) < len(procs):
+            self._all_scheduler_job_ids_are_known = False
+        self.scheduler_job_ids += job_ids
+
+    def _get_scheduler_job_ids_to_query(self) -> Optional[List[str]]:
+        """IDs of this job's submissions, or None if the job has not been submitted by this process or the ID of a
+        submission is unknown (in which case it is looked up by name)."""
+
+        if not (self.scheduler_job_ids and self._all_scheduler_job_ids_are_known):
+            return None
+
+        return self.scheduler_job_ids
+
     @property
     def is_on_job_scheduler_queue(self):
-        return self.job_scheduler.job_is_on_queue(self.name)
+        return self.job_scheduler.job_is_on_queue(self.name, job_ids=self._get_scheduler_job_ids_to_query())
 
     @property
     def is_complete(self):
@@ -199,52 +295,59 @@ class ArrayDockingJob(ABC):
             ]
         )
 
-    def task_is_complete(self, task_id: str):
-        task_dir_path = os.path.join(self.job_dir.path, task_id)
-        self.reset_directory_cache_with_exponential_backoff(task_dir_path)
+    def get_partial_outdock_file_path(self, task_id: str) -> str:
+        return os.path.join(self.job_dir.path, task_id, PARTIAL_OUTDOCK_FILE_NAME)
 
-        return File.file_exists(os.path.join(task_dir_path, OUTDOCK_FILE_NAME))
+    def cancel_task(self, task_id: str) -> Optional[subprocess.CompletedProcess]:
+        return self.job_scheduler.cancel_task(task_id, job_name=self.name, job_ids=self._get_scheduler_job_ids_to_query())
+
+    @property
+    def done_markers_dir_path(self) -> str:
+        return os.path.join(self.job_dir.path, DONE_MARKERS_DIR_NAME)
+
+    @property
+    def task_completion_watcher(self) -> TaskCompletionWatcher:
+        if self._task_completion_watcher is None:
+            # publish markers for tasks completed by a version of rundock.bash that did not (checked once per task)
+            for task_id in self.task_ids:
+                if not os.path.exists(os.path.join(self.done_markers_dir_path, task_id)) and File.file_exists(os.path.join(self.job_dir.path, task_id, OUTDOCK_FILE_NAME)):
+                    publish_done_marker(self.done_markers_dir_path, task_id)
+            self._task_completion_watcher = TaskCompletionWatcher(self.done_markers_dir_path)
+
+        return self._task_completion_watcher
+
+    def close(self) -> None:
+        """Releases the resources of the task completion watcher (it is re-created if needed)."""
+
+        if self._task_completion_watcher is not None:
+            self._task_completion_watcher.close()
+            self._task_completion_watcher = None
+
+    def __getstate__(self):
+        # the task completion watcher holds an inotify fd, which cannot be pickled
+        state = self.__dict__.copy()
+        state["_task_completion_watcher"] = None
+        return state
+
+    def reset_task_dir(self, task_id: str) -> None:
+        self.task_completion_watcher.forget_task(task_id)
+        task_dir = Dir(os.path.join(self.job_dir.path, task_id), create=True, reset=True)  # reset dir
+
+    def task_is_complete(self, task_id: str, force_scan: bool = False):
+        return self.task_completion_watcher.task_is_complete(task_id, force_scan=force_scan)
 
     def task_failed(self, task_id: str) -> bool:
-        """Check if the supplied array job task failed (i.e., outdock file did not appear despite job being absent from the job scheduler queue)."""
+        """Check if the supplied array job task failed (i.e., done marker did not appear despite job being absent from the job scheduler queue)."""
 
         def _task_failed():
             return (
-                (not self.task_is_complete(task_id)) and
-                (not self.job_scheduler.task_is_on_queue(task_id, job_name=self.name))
+                (not self.task_is_complete(task_id, force_scan=True)) and
+                (not self.job_scheduler.task_is_on_queue(task_id, job_name=self.name, job_ids=self._get_scheduler_job_ids_to_query()))
             )
 
-        task_dir_path = os.path.join(self.job_dir.path, task_id)
-
-        self.reset_directory_cache_with_exponential_backoff(task_dir_path)
         if _task_failed():
             # try again in case distributed file system issue is causing delay
-            self.reset_directory_cache_with_exponential_backoff(task_dir_path)
             if _task_failed():
                 return True
 
         return False
-
-    def reset_directory_cache_with_exponential_backoff(self, dir_path, max_retries=5):
-        retry = 0
-        backoff = 1  # Initial backoff duration in seconds
-
-        while retry < max_retries:
-            try:
-                # Dynamically set the timeout for the reset_directory_cache method
-                @timeout(backoff, timeout_exception=TimeoutError)
-                def reset_directory_with_timeout(dir_path):
-                    Dir.reset_directory_cache(dir_path)
-
-                # Try resetting the directory
-                reset_directory_with_timeout(dir_path)
-
-                # If successful, exit the loop
-                return
-            except TimeoutError:
-                # If a timeout occurs, print message and retry with doubled timeout
-                logger.warning(f"Timeout occurred while attempting to reset directory cache. Retrying with {backoff * 2} seconds timeout...")
-                backoff *= 2  # Double the backoff duration
-                retry += 1
-
-        raise TimeoutError("Failed to reset directory after max retries.")
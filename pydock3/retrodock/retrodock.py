@@ -17,14 +17,15 @@ from pydock3.files import (
     Dir,
     File,
     IndockFile,
-    OutdockFile,
+    load_outdock_scores_dataframe,
 )
 from pydock3.retrodock.retrospective_dataset import RetrospectiveDataset
 from pydock3.criterion.enrichment.roc import ROC
+from pydock3.criterion.enrichment.roc_plot import ROCPlotData, ROCPlotRenderer
 from pydock3.jobs import ArrayDockingJob, OUTDOCK_FILE_NAME
 from pydock3.blastermaster.blastermaster import BlasterFiles, BLASTER_FILE_IDENTIFIER_TO_PROPER_BLASTER_FILE_NAME_DICT
 from pydock3.jobs import JobSubmissionResult
-from pydock3.job_schedulers import SGEJobScheduler, SlurmJobScheduler
+from pydock3.job_schedulers import SGEJobScheduler, SlurmJobScheduler, LocalJobScheduler
 from pydock3.docking import __file__ as DOCKING_INIT_FILE_PATH
 
 #
@@ -41,6 +42,7 @@ DOCK3_EXECUTABLE_PATH = os.path.join(
 SCHEDULER_NAME_TO_CLASS_DICT = {
     "sge": SGEJobScheduler,
     "slurm": SlurmJobScheduler,
+    "local": LocalJobScheduler,
 }
 
 #
@@ -92,13 +94,9 @@ def get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
 ):
     """build dataframe of docking results from outdock files"""
 
-    #
-    actives_outdock_file = OutdockFile(actives_outdock_file_path)
-    decoys_outdock_file = OutdockFile(decoys_outdock_file_path)
-
-    #
-    actives_outdock_df = actives_outdock_file.get_dataframe()
-    decoys_outdock_df = decoys_outdock_file.get_dataframe()
+    # uses the scores files written on the compute nodes when available
+    actives_outdock_df = load_outdock_scores_dataframe(actives_outdock_file_path)
+    decoys_outdock_df = load_outdock_scores_dataframe(decoys_outdock_file_path)
 
     # set is_active column based on outdock file
     actives_outdock_df["is_active"] = [1 for _ in range(len(actives_outdock_df))]
@@ -126,7 +124,7 @@ def get_results_dataframe_from_actives_job_and_decoys_job_outdock_files(
         ("asol", "apolar_desolvation_energy"),
         ("charge", "charge"),
     ]:
-        df[new_col] = df[old_col].apply(lambda s: str_to_float(s))
+        df[new_col] = pd.to_numeric(df[old_col], errors="coerce")
         if new_col != old_col:
             df = df.drop(old_col, axis=1)
 
@@ -260,8 +258,13 @@ def process_retrodock_job_results(
         actives_outdock_file_path: str,
         decoys_outdock_file_path: str,
         save_dir_path: str,
+        roc_plot_renderer: Optional[ROCPlotRenderer] = None,
+        rank: Optional[int] = None,
 ):
-    """process retrodock job results"""
+    """process retrodock job results
+
+    If `roc_plot_renderer` is supplied, the ROC plot is handed off to it (along with `rank`, for its
+    top-k policy) instead of being rendered here."""
 
     # set save file paths
     normalized_log_auc_save_path = os.path.join(save_dir_path, NORMALIZED_LOG_AUC_FILE_NAME)
@@ -284,7 +287,10 @@ def process_retrodock_job_results(
         f.write(f"{roc.normalized_log_auc}\n")
 
     # make plots
-    roc.plot(save_path=roc_plot_save_path)
+    if roc_plot_renderer is not None:
+        roc_plot_renderer.submit(ROCPlotData.from_roc(roc), roc_plot_save_path, rank=rank)
+    else:
+        roc.plot(save_path=roc_plot_save_path)
     make_ridgeline_plot_of_energy_terms(df, save_path=energy_terms_plot_save_path)
     make_split_violin_plot_of_charge(df, save_path=charge_plot_save_path)
 
@@ -511,6 +517,8 @@ class Retrodock(Script):
             #
             if all([job.is_complete for job in retrodock_jobs]):
                 break
+        for job in retrodock_jobs:
+            job.close()
 
         #
         logger.info(f"Finished RetroDock job.")
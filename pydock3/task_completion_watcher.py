@@ -0,0 +1,209 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import struct
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+#
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+#
+DONE_MARKERS_DIR_NAME = "done"  # dir of each array job with one marker file per complete task (name must not contain 'OUTDOCK', see rundock.bash)
+MIN_SECONDS_BETWEEN_DONE_MARKER_SCANS = 1
+NETWORK_FILE_SYSTEM_TYPES = ["nfs", "nfs4", "cifs", "smb3", "smbfs", "lustre", "gpfs", "beegfs", "ceph", "panfs", "afs", "fuse.sshfs"]
+
+# see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT_HEADER_FORMAT = "iIII"
+INOTIFY_EVENT_HEADER_SIZE = struct.calcsize(INOTIFY_EVENT_HEADER_FORMAT)
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+def get_file_system_type_of_path(path: str) -> Optional[str]:
+    """Type of the file system on which `path` is mounted (e.g., 'ext4', 'nfs4'), or None if it cannot be determined."""
+
+    try:
+        with open("/proc/mounts", "r") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+
+    # the mount point that is the longest prefix of the path is the one the path is on
+    path = os.path.realpath(path)
+    file_system_type = None
+    longest_mount_point_length = -1
+    for mount_point, mount_file_system_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > longest_mount_point_length:
+            file_system_type = mount_file_system_type
+            longest_mount_point_length = len(mount_point)
+
+    return file_system_type
+
+
+def path_is_on_network_file_system(path: str) -> bool:
+    file_system_type = get_file_system_type_of_path(path)
+    if file_system_type is None:
+        return True  # assume the worst
+
+    return file_system_type in NETWORK_FILE_SYSTEM_TYPES
+
+
+def publish_done_marker(done_markers_dir_path: str, task_id: str) -> None:
+    """Atomically creates the done marker of a task (the same way rundock.bash does)."""
+
+    os.makedirs(done_markers_dir_path, exist_ok=True)
+    temp_file_path = os.path.join(done_markers_dir_path, f".{task_id}.tmp")
+    with open(temp_file_path, "w"):
+        pass
+    os.replace(temp_file_path, os.path.join(done_markers_dir_path, task_id))
+
+
+class TaskCompletionWatcher(object):
+    """
+    Detects the completion of the tasks of an array job by the done markers that rundock.bash atomically publishes
+    (by rename) into one dir per array job.
+
+    On a local file system, the markers dir is watched with inotify, so that each poll is a single non-blocking read.
+    On a network file system (e.g., NFS), where inotify does not see writes made by other hosts, each poll is instead
+    one `scandir` of the markers dir, done at most once every `min_seconds_between_scans` unless forced. Either way,
+    the metadata I/O per poll does not grow with the number of tasks.
+    """
+
+    def __init__(
+        self,
+        done_markers_dir_path: str,
+        min_seconds_between_scans: float = MIN_SECONDS_BETWEEN_DONE_MARKER_SCANS,
+        use_inotify: Optional[bool] = None,
+    ):
+        self.done_markers_dir_path = done_markers_dir_path
+        self.min_seconds_between_scans = min_seconds_between_scans
+        os.makedirs(self.done_markers_dir_path, exist_ok=True)
+
+        #
+        self.completed_task_ids = set()
+        self._datetime_last_scanned = datetime.min
+
+        #
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux") and not path_is_on_network_file_system(self.done_markers_dir_path)
+        self._inotify_fd = None
+        if use_inotify:
+            try:
+                self._inotify_fd = self._get_inotify_fd_of_watch(self.done_markers_dir_path)
+            except OSError as e:
+                logger.debug(f"Failed to watch {self.done_markers_dir_path} with inotify, falling back to scanning: {e}")
+
+        # pick up markers published before the watch was set up
+        self.poll(force_scan=True)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
+
+    @staticmethod
+    def _get_inotify_fd_of_watch(dir_path: str) -> int:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if libc.inotify_add_watch(fd, os.fsencode(dir_path), IN_MOVED_TO | IN_CLOSE_WRITE) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno))
+
+        return fd
+
+    def _add_completed_task_ids(self, task_ids: List[str]) -> List[str]:
+        new_task_ids = []
+        for task_id in task_ids:
+            if task_id.startswith(".") or task_id in self.completed_task_ids:  # skip temp files of markers being published
+                continue
+            self.completed_task_ids.add(task_id)
+            new_task_ids.append(task_id)
+
+        return new_task_ids
+
+    def _read_inotify_events(self) -> Optional[List[str]]:
+        """Names of the files published since the last read, or None if the event queue overflowed."""
+
+        names = []
+        while True:
+            try:
+                data = os.read(self._inotify_fd, INOTIFY_READ_SIZE)
+            except BlockingIOError:
+                return names
+
+            #
+            offset = 0
+            while offset + INOTIFY_EVENT_HEADER_SIZE <= len(data):
+                _, mask, _, name_length = struct.unpack_from(INOTIFY_EVENT_HEADER_FORMAT, data, offset)
+                offset += INOTIFY_EVENT_HEADER_SIZE
+                name = data[offset:offset + name_length].rstrip(b"\0").decode()
+                offset += name_length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if name:
+                    names.append(name)
+
+    def _scan(self) -> List[str]:
+        self._datetime_last_scanned = datetime.now()
+        try:
+            with os.scandir(self.done_markers_dir_path) as entries:
+                return [entry.name for entry in entries]
+        except FileNotFoundError:
+            return []
+
+    def poll(self, force_scan: bool = False) -> List[str]:
+        """Detects newly complete tasks and returns their IDs."""
+
+        new_task_ids = []
+        if self.uses_inotify:
+            names = self._read_inotify_events()
+            if names is None:  # events were dropped, so fall back to a full scan
+                logger.debug(f"inotify event queue of {self.done_markers_dir_path} overflowed, scanning instead")
+                force_scan = True
+            else:
+                new_task_ids += self._add_completed_task_ids(names)
+                if not force_scan:
+                    return new_task_ids
+        elif not force_scan and datetime.now() < (self._datetime_last_scanned + timedelta(seconds=self.min_seconds_between_scans)):
+            return new_task_ids
+
+        #
+        return new_task_ids + self._add_completed_task_ids(self._scan())
+
+    def task_is_complete(self, task_id: str, force_scan: bool = False) -> bool:
+        self.poll(force_scan=force_scan)
+
+        return task_id in self.completed_task_ids
+
+    def forget_task(self, task_id: str) -> None:
+        """Removes the done marker of a task about to be resubmitted."""
+
+        self.poll()  # consume pending events first so that they cannot re-add the task
+        marker_file_path = os.path.join(self.done_markers_dir_path, task_id)
+        if os.path.exists(marker_file_path):
+            os.remove(marker_file_path)
+        self.completed_task_ids.discard(task_id)
+
+    def close(self) -> None:
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
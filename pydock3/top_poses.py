@@ -1,10 +1,31 @@
 import sys, os
 import subprocess as sp
 import gzip
+import re
 import time
+import heapq
+import itertools
 import multiprocessing
+import pickle
+
+import pandas as pd
 
 from pydock3.util import Script
+from pydock3.files import Mol2RecordScanner, Mol2IndexFile, Mol2IndexEntry, OutdockFile
+
+
+#
+TOP_POSES_STATE_VERSION = 1
+
+# rundock.bash copies the OUTDOCK & mol2 files of the n-th run of a task to `OUTDOCK.{n}` & `test.mol2.gz.{n}`
+OUTDOCK_FILE_NAME_PATTERN = re.compile(r"^OUTDOCK\.(\d+)$")
+MOL2_FILE_NAME_FORMAT = "test.mol2.gz.{}"
+
+
+def is_mol2_sidecar_file_path(file_path: str) -> bool:
+    """Whether a file matched by the mol2 pattern is a pose index (see `Mol2IndexFile`) or a temp file of one being written, rather than a mol2 file."""
+
+    return file_path.endswith(Mol2IndexFile.FILE_SUFFIX) or file_path.endswith(".tmp")
 
 
 def get_to_search(dock_results_dir_path, mol2_regex):
@@ -32,241 +53,459 @@ def get_to_search(dock_results_dir_path, mol2_regex):
         raise Exception(f"Supplied dock results path {dock_results_dir_path} cannot be found!")
 
 
-class MinHeap(object):
-    def __init__(self, max_size=10000, comparator=lambda x, y: x < y):
+class BoundedPoseHeap(object):
+    """Retains the `max_size` lowest-energy poses pushed to it.
+
+    Entries are stored as (-energy, -file_num, -offset, name, data) so that the root of the
+    heap is always the worst pose retained (highest energy, latest in scan order). Pose data
+    is only ever held for the poses currently retained.
+
+    If `best_pose_per_molecule` is True, only the best pose of each molecule is retained, so
+    `max_size` bounds the number of unique molecules. A dict maps each retained molecule name to
+    the key of its best pose; when a better pose of that molecule arrives, the old entry is left
+    in the heap as stale and is discarded lazily once it reaches the root, or during compaction."""
+
+    def __init__(self, max_size=10000, best_pose_per_molecule=False):
+        if max_size < 1:
+            raise ValueError(f"Maximum number of poses to retain must be at least 1. Witnessed: {max_size}")
         self.max_size = max_size
-        self.comparator = comparator
-        self.size = 0
-        self.heap = [None for i in range(max_size + 1)]
-
-    def __swap(self, i, j):
-        tmp = self.heap[i]
-        self.heap[i] = self.heap[j]
-        self.heap[j] = tmp
-
-    # best case: O(1)
-    # worst case: O(log2(n))
-    def insert(self, element):
-        self.size += 1
-        self.heap[self.size] = element
-        if self.size == 1:
-            self.heap[0] = element
+        self.best_pose_per_molecule = best_pose_per_molecule
+        self.heap = []
+        self.name_to_best_key = {}
+        self.num_stale_entries = 0
+
+    def __len__(self):
+        return len(self.heap) - self.num_stale_entries
+
+    def is_full(self):
+        return len(self) >= self.max_size
+
+    def _is_stale(self, entry):
+        return self.best_pose_per_molecule and self.name_to_best_key.get(entry[3]) != entry[:3]
+
+    def _discard_stale_root_entries(self):
+        while self.heap and self._is_stale(self.heap[0]):
+            heapq.heappop(self.heap)
+            self.num_stale_entries -= 1
+
+    def _compact(self):
+        self.heap = [entry for entry in self.heap if not self._is_stale(entry)]
+        heapq.heapify(self.heap)
+        self.num_stale_entries = 0
+
+    def would_accept(self, energy, file_num, offset, name=None):
+        key = (-energy, -file_num, -offset)
+        if self.best_pose_per_molecule and name in self.name_to_best_key:
+            return key > self.name_to_best_key[name]  # replaces the molecule's own pose, so size is unaffected
+        if not self.is_full():
+            return True
+        self._discard_stale_root_entries()
+        return key > self.heap[0][:3]
+
+    # worst case: O(log2(n)) amortized
+    def push(self, energy, file_num, offset, name, data):
+        if not self.would_accept(energy, file_num, offset, name):
+            return False
+
+        entry = (-energy, -file_num, -offset, name, data)
+        if not self.best_pose_per_molecule:
+            if self.is_full():
+                heapq.heapreplace(self.heap, entry)  # pops the worst pose and inserts the new one in the same operation
+            else:
+                heapq.heappush(self.heap, entry)
+            return True
+
+        #
+        if name in self.name_to_best_key:
+            # the molecule's previous best pose becomes stale
+            self.num_stale_entries += 1
+            heapq.heappush(self.heap, entry)
+        elif self.is_full():
+            self._discard_stale_root_entries()
+            worst_entry = heapq.heapreplace(self.heap, entry)
+            del self.name_to_best_key[worst_entry[3]]
+        else:
+            heapq.heappush(self.heap, entry)
+        self.name_to_best_key[name] = entry[:3]
+
+        # keep the number of stale entries (and the pose data they hold) bounded by the number of retained ones
+        if self.num_stale_entries > max(self.max_size, 1024):
+            self._compact()
+
+        return True
+
+    def get_sorted_entries(self):
+        """Returns (energy, file_num, offset, name, data) tuples sorted from best to worst."""
+        return [
+            (-neg_energy, -neg_file_num, -neg_offset, name, data)
+            for neg_energy, neg_file_num, neg_offset, name, data in sorted(self.heap, reverse=True)
+            if not self._is_stale((neg_energy, neg_file_num, neg_offset, name, data))
+        ]
+
+
+def read_poses(poses_file_path, use_index=False):
+    """Yields (offset, name, total_energy, data) for each pose in the supplied mol2 file.
+
+    If `use_index` is True and the file has an up-to-date index, the poses are read from the
+    index without decompressing the file, and `data` is the pose's `Mol2IndexEntry`, from which
+    the pose record can be fetched later. Otherwise, `data` is the pose record, and (if
+    `use_index` is True) the index is written once the whole file has been scanned."""
+
+    if use_index:
+        index_entries = Mol2IndexFile.load_entries_if_fresh(poses_file_path)
+        if index_entries is not None:
+            for entry in index_entries:
+                yield entry.record_offset, entry.name, entry.total_energy, entry
             return
 
-        current = self.size
-        parent = self.size // 2
+    #
+    source_signature = Mol2IndexFile.get_source_signature(poses_file_path)
+    scanner = Mol2RecordScanner(poses_file_path)
+    index_entries = []
+    for entry, record in Mol2IndexFile.get_entries_from_records(scanner.iter_records_with_offsets(), scanner.member_offsets):
+        index_entries.append(entry)
+        yield entry.record_offset, entry.name, entry.total_energy, record
 
-        while self.comparator(self.heap[current], self.heap[parent]):
-            self.__swap(current, parent)
-            current = parent
-            parent = current // 2
+    #
+    if use_index:
+        try:
+            Mol2IndexFile(Mol2IndexFile.get_index_file_path(poses_file_path)).write(index_entries, source_signature)
+        except OSError as e:
+            print(f"Could not write index for {poses_file_path}: {e}")
 
-        self.heap[0] = self.heap[1]
 
-    # best case: O(1)
-    # worst case: O(log2(n))
-    def remove_insert(self, element):
-        popped = self.heap[1]
-        self.heap[1] = element
+def get_top_poses_of_shard(shard):
+    """Scans every file in the shard, keeping a bounded heap of its best poses.
 
-        position = 1
-        while position < (self.size // 2):
-            left_child = 2 * position
-            right_child = 2 * position + 1
+    `shard` is a tuple (numbered_file_paths, top_n, best_pose_per_molecule, use_index), where
+    `numbered_file_paths` is a list of (file_num, file_path) tuples. Returns a tuple
+    (sorted_entries, num_poses_read, num_bytes_read)."""
 
-            if self.comparator(
-                self.heap[position], self.heap[right_child]
-            ) and self.comparator(self.heap[position], self.heap[left_child]):
-                break
+    numbered_file_paths, top_n, best_pose_per_molecule, use_index = shard
+    heap = BoundedPoseHeap(max_size=top_n, best_pose_per_molecule=best_pose_per_molecule)
+    num_poses_read = 0
+    num_bytes_read = 0
+    for file_num, poses_file_path in numbered_file_paths:
+        try:
+            for offset, name, energy, data in read_poses(poses_file_path, use_index=use_index):
+                num_poses_read += 1
+                if not isinstance(data, Mol2IndexEntry):
+                    num_bytes_read += len(data)
+                    data = bytes(data) if heap.would_accept(energy, file_num, offset, name) else None
+                if data is not None:
+                    heap.push(energy, file_num, offset, name, data)
+        except Exception as e:
+            print(f"Encountered error while reading {poses_file_path}: {e}. Skipping rest of file!")
 
-            if self.comparator(self.heap[left_child], self.heap[right_child]):
-                self.__swap(position, left_child)
-                position = left_child
-            else:
-                self.__swap(position, right_child)
-                position = right_child
+    return heap.get_sorted_entries(), num_poses_read, num_bytes_read
 
-        self.heap[0] = self.heap[1]
-        return popped
 
-    def minvalue(self):
-        return self.heap[1]
+def fetch_pose_records(file_path_and_index_entries):
+    """Reads the pose records of the supplied index entries of a single mol2 file.
 
+    Returns a dict of record offset to record."""
 
-class BufferedLineReader(object):
-    def __init__(self, file_name, buffer_size=1024 * 1024):
-        self.buffer_size = buffer_size
-        if ".gz" in file_name:
-            try:
-                self.file = gzip.open(file_name, "rt")
-            except:
-                self.file = open(file_name, "r")
-        else:
-            self.file = open(file_name, "r")
-        self.partial_line = None
-        self.buffer = None
-        self.__read_buffer()
-
-    def __read_buffer(self):
-        del self.buffer
-        self.buffer = self.file.read(self.buffer_size)
-        self.buffer_position = 0
-        self.buffer_length = len(self.buffer)
-
-    def read_line(self):
-        start = self.buffer_position
-        while (
-            self.buffer_position < self.buffer_length
-            and self.buffer[self.buffer_position] != "\n"
-        ):
-            self.buffer_position += 1
-        if (
-            self.buffer_position == self.buffer_length
-        ):  # we reached the end of the buffer without finding a newline
-            if not self.buffer:
-                return ""  # avoid an infinite recursive loop if buffer is empty
-            partial_line = self.buffer[start : self.buffer_position]
-            self.__read_buffer()
-            full_line = (
-                partial_line + self.read_line()
-            )  # bet you didn't expect to see recursion in a read_line function!
-            # if this function is recursing more than once then you're dealing with some monster lines (or a very small buffer)
-            return full_line
-        self.buffer_position += 1
-        return self.buffer[start : self.buffer_position]
-
-
-class Mol2Data(object):
-    def __init__(self, data, total_energy, name):
-        self.buffer = data.encode("utf-8")
-        self.total_energy = total_energy
-        self.name = name
-
-
-def pose_data_producer(processing_queue, paths_enum):
-    for poses_file_path in paths_enum:
+    file_path, index_entries = file_path_and_index_entries
+    return Mol2IndexFile.read_records(file_path, index_entries)
+
+
+def merge_sorted_shard_entries(shard_entries_lists, top_n, best_pose_per_molecule=False, name_index=3):
+    """k-way merges the sorted entries of each shard, returning the best `top_n` overall.
+
+    If `best_pose_per_molecule` is True, a molecule retained by more than one shard is only
+    kept for its best pose. Duplicates are dropped during the merge, before the `top_n` cut, so
+    that `top_n` distinct molecules are returned if there are that many. `name_index` is the
+    position of the molecule name in each entry."""
+
+    merged_entries = heapq.merge(*shard_entries_lists)
+    if best_pose_per_molecule:
+        seen_names = set()
+        merged_entries = (
+            entry for entry in merged_entries
+            if not (entry[name_index] in seen_names or seen_names.add(entry[name_index]))
+        )
+    return list(itertools.islice(merged_entries, top_n))
+
+
+def get_mol2_file_path_of_outdock_file(outdock_file_path):
+    """Returns the path of the mol2 file written by the same run of a task as the supplied OUTDOCK file."""
+
+    match = OUTDOCK_FILE_NAME_PATTERN.match(os.path.basename(outdock_file_path))
+    if match is None:
+        raise Exception(f"OUTDOCK file name not recognized: {outdock_file_path}")
+    return os.path.join(os.path.dirname(outdock_file_path), MOL2_FILE_NAME_FORMAT.format(match.group(1)))
+
+
+def get_top_scores_of_outdock_file(numbered_outdock_file_path_and_top_n):
+    """Returns the best `top_n` (total_energy, file_num, name) tuples of the molecules in an OUTDOCK file, sorted.
+
+    `numbered_outdock_file_path_and_top_n` is a tuple ((file_num, outdock_file_path), top_n, best_pose_per_molecule, use_cache).
+    If `best_pose_per_molecule` is True, only the best score of each molecule is considered. If `use_cache` is True, the
+    parsed OUTDOCK file is cached (see `OutdockFile.get_dataframe`)."""
+
+    (file_num, outdock_file_path), top_n, best_pose_per_molecule, use_cache = numbered_outdock_file_path_and_top_n
+    try:
+        df = OutdockFile(outdock_file_path).get_dataframe(use_cache=use_cache)
+    except Exception as e:
+        print(f"Encountered error while reading {outdock_file_path}: {e}. Skipping file!")
+        return []
+    if df.empty:
+        return []
+
+    #
+    energies = pd.to_numeric(df["Total"], errors="coerce")
+    df = pd.DataFrame({"name": df["id_num"], "total_energy": energies}).dropna()
+    if best_pose_per_molecule:
+        df = df.groupby("name", as_index=False, sort=False)["total_energy"].min()
+    return heapq.nsmallest(
+        top_n,
+        ((total_energy, file_num, name) for name, total_energy in zip(df["name"], df["total_energy"])),
+    )
+
+
+def get_best_pose_records_of_molecules(mol2_file_path_and_names):
+    """Returns a dict of molecule name to the record of its lowest-energy pose in the supplied mol2 file.
+
+    Only the requested molecules' poses are read if the file has an up-to-date index."""
+
+    mol2_file_path, names = mol2_file_path_and_names
+    names = set(names)
+
+    #
+    index_entries = Mol2IndexFile.load_entries_if_fresh(mol2_file_path)
+    if index_entries is not None:
+        name_to_best_entry = {}
+        for entry in index_entries:
+            if entry.name in names and (entry.name not in name_to_best_entry or entry.total_energy < name_to_best_entry[entry.name].total_energy):
+                name_to_best_entry[entry.name] = entry
         try:
-            reader = BufferedLineReader(poses_file_path)
-            buff = ""
-            energy = 99999
-            name = ""
-            line = reader.read_line()
-        except:
-            print(
-                f"Encountered error while trying to open {poses_file_path}. Skipping!"
-            )
-            return
+            offset_to_record = Mol2IndexFile.read_records(mol2_file_path, list(name_to_best_entry.values()))
+        except Exception as e:
+            print(f"Encountered error while reading {mol2_file_path}: {e}. Skipping file!")
+            return {}
+        return {name: offset_to_record[entry.record_offset] for name, entry in name_to_best_entry.items()}
 
-        error = 0
-        processing_queue.put(0)
+    #
+    name_to_best_energy_and_record = {}
+    try:
+        scanner = Mol2RecordScanner(mol2_file_path)
+        for entry, record in Mol2IndexFile.get_entries_from_records(scanner.iter_records_with_offsets(), scanner.member_offsets):
+            if entry.name in names and (entry.name not in name_to_best_energy_and_record or entry.total_energy < name_to_best_energy_and_record[entry.name][0]):
+                name_to_best_energy_and_record[entry.name] = (entry.total_energy, bytes(record))
+    except Exception as e:
+        print(f"Encountered error while reading {mol2_file_path}: {e}. Skipping rest of file!")
 
-        while line:
-            if line.startswith("##########                 Name"):
-                if buff:
-                    processing_queue.put(Mol2Data(buff, energy, name))
-                    buff = ""
-                    energy = 99999
-                name = line.split(":")[1].strip()
-            elif line.startswith("##########         Total Energy"):
-                energy = float(line.split(":")[1].strip())
+    return {name: record for name, (total_energy, record) in name_to_best_energy_and_record.items()}
 
-            buff += line
-            try:
-                line = reader.read_line()
-            except:
-                print(
-                    f"Encountered error while reading {poses_file_path}. Stopping read."
-                )
-                error = 1
 
-        if error == 0:
-            processing_queue.put(Mol2Data(buff, energy, name))
+def get_file_signature(file_path):
+    """Returns (size, mtime_ns) of the supplied file, or None if it cannot be stat'd."""
 
-        processing_queue.put(poses_file_path)
-    processing_queue.put(1)
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
 
 
-def energy_is_greater_than_other_energy(m_1, m_2):
-    return m_1.total_energy > m_2.total_energy
+def load_top_poses_state(state_file_path):
+    """Returns the state saved by `save_top_poses_state`, or None if there is no readable state."""
+
+    if not os.path.isfile(state_file_path):
+        return None
+    try:
+        with open(state_file_path, "rb") as f:
+            state = pickle.load(f)
+    except Exception as e:
+        print(f"Could not read top poses state {state_file_path}: {e}. Ignoring it.")
+        return None
+    if state.get("version") != TOP_POSES_STATE_VERSION:
+        return None
+    return state
+
+
+def save_top_poses_state(state_file_path, state):
+    """Saves the state atomically, so that an interrupted run never leaves a partially-written state."""
+
+    temp_file_path = f"{state_file_path}.{os.getpid()}.tmp"
+    with open(temp_file_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file_path, state_file_path)
 
 
 class TopPoses(Script):
+    """Writes the `top_n` lowest-energy poses found in the mol2 files of a docking run.
+
+    Unless `resume` is False, the retained poses and a manifest of the files consumed (path, size,
+    mtime) are saved next to the output as `{output_file_path}.state`. A later run with the same
+    `top_n` and `best_pose_per_molecule` only scans files that are new or have changed since, and
+    merges them into the saved poses. If a file that contributed saved poses has changed or
+    disappeared, the poses it displaced cannot be recovered, so everything is rescanned."""
+
     def __init__(self):
         #
         super().__init__()
 
-    def run(self, dock_results_dir_path, mol2_regex="test.mol2.gz.*", output_file_path="top_poses.mol2.gz", top_n=10000):
-        heap = MinHeap(max_size=top_n, comparator=energy_is_greater_than_other_energy)
-        processing_queue = multiprocessing.Queue(maxsize=50)
-        pose_data_producer_process = multiprocessing.Process(
-            target=pose_data_producer,
-            args=(processing_queue, get_to_search(dock_results_dir_path, mol2_regex)),
-        )
+    def run(self, dock_results_dir_path, mol2_regex="test.mol2.gz.*", output_file_path="top_poses.mol2.gz", top_n=10000, num_workers=None, best_pose_per_molecule=False, use_index=True, resume=True):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
 
-        pose_data_producer_process.start()
-
-        i = 0
-        hit_max = False
-        while True:
-            try:
-                pose = processing_queue.get(True, 10)
-            except:
-                break
-
-            # int signals start the clock
-            if type(pose) == int:
-                if pose == 0:  # timer start
-                    i = 0
-                    start_time_u = time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID)
-                    start_time_r = time.time()
-                if pose == 1:  # end processing
-                    break
-                continue
-
-            # str signals to stop the clock, and also print the file_name (which will be the item)
-            elif type(pose) == str:
-                end_time_u = time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID)
-                end_time_r = time.time()
-                elapsed_u = end_time_u - start_time_u
-                elapsed_r = end_time_r - start_time_r
-                print(i, "poses read from", pose)
-                print(
-                    "time (user): {:15f}, time (real): {:15f}".format(
-                        elapsed_u, elapsed_r
-                    )
-                )
-                print(
-                    "pps  (user): {:15f}, pps  (real): {:15f}".format(
-                        i / elapsed_u, i / elapsed_r
+        #
+        file_paths = [
+            file_path for file_path in get_to_search(dock_results_dir_path, mol2_regex)
+            if not is_mol2_sidecar_file_path(file_path)
+        ]
+        file_path_to_file_num = {file_path: file_num for file_num, file_path in enumerate(file_paths)}
+        file_path_to_signature = {file_path: get_file_signature(file_path) for file_path in file_paths}
+
+        # restore the poses retained from files that have not changed since the previous run
+        state_file_path = f"{output_file_path}.state"
+        state_params = {"top_n": top_n, "best_pose_per_molecule": best_pose_per_molecule}
+        previous_entries = []
+        previous_manifest = {}
+        if resume:
+            state = load_top_poses_state(state_file_path)
+            if state is not None and state["params"] == state_params:
+                changed_file_paths = {
+                    file_path for file_path, signature in state["manifest"].items()
+                    if file_path_to_signature.get(file_path) != signature
+                }
+                if any(file_path in changed_file_paths for energy, file_path, offset, name, data in state["entries"]):
+                    print(f"{len(changed_file_paths)} previously consumed files have changed or disappeared. Rescanning all files.")
+                else:
+                    previous_manifest = {
+                        file_path: signature for file_path, signature in state["manifest"].items()
+                        if file_path not in changed_file_paths
+                    }
+                    previous_entries = sorted(
+                        (energy, file_path_to_file_num[file_path], offset, name, data)
+                        for energy, file_path, offset, name, data in state["entries"]
                     )
-                )
-                continue
+        numbered_file_paths = [
+            (file_num, file_path) for file_num, file_path in enumerate(file_paths)
+            if previous_manifest.get(file_path) != file_path_to_signature[file_path]
+        ]
+        if previous_manifest:
+            print(f"{len(previous_manifest)} files already consumed according to {state_file_path}")
 
-            if heap.size == top_n:
-                if not hit_max:
-                    print("hit max poses for heap!")
-                    hit_max = True
+        #
+        num_shards = max(1, min(num_workers, len(numbered_file_paths)))
+        shards = [(numbered_file_paths[i::num_shards], top_n, best_pose_per_molecule, use_index) for i in range(num_shards)]
+        print(f"{len(numbered_file_paths)} files to search across {num_shards} shards")
 
-                if energy_is_greater_than_other_energy(pose, heap.minvalue()):
-                    del pose
-                    continue
+        #
+        start_time_r = time.time()
+        shard_entries_lists = [previous_entries]
+        num_poses_read = 0
+        num_bytes_read = 0
+        with multiprocessing.Pool(processes=num_shards) as pool:
+            for shard_entries, shard_num_poses_read, shard_num_bytes_read in pool.imap_unordered(get_top_poses_of_shard, shards):
+                shard_entries_lists.append(shard_entries)
+                num_poses_read += shard_num_poses_read
+                num_bytes_read += shard_num_bytes_read
+
+            #
+            top_entries = merge_sorted_shard_entries(shard_entries_lists, top_n, best_pose_per_molecule)
+
+            # fetch the records of the poses that were ranked using an index
+            file_num_to_index_entries = {}
+            for energy, file_num, offset, name, data in top_entries:
+                if isinstance(data, Mol2IndexEntry):
+                    file_num_to_index_entries.setdefault(file_num, []).append(data)
+            file_nums = list(file_num_to_index_entries.keys())
+            file_num_to_offset_to_record = dict(zip(
+                file_nums,
+                pool.map(fetch_pose_records, [(file_paths[file_num], file_num_to_index_entries[file_num]) for file_num in file_nums]),
+            ))
+        top_entries = [
+            (energy, file_num, offset, name, file_num_to_offset_to_record[file_num][offset] if isinstance(data, Mol2IndexEntry) else data)
+            for energy, file_num, offset, name, data in top_entries
+        ]
+        elapsed_r = max(time.time() - start_time_r, 1e-9)
+        print(num_poses_read, "poses read")
+        print("time (real): {:15f}, pps (real): {:15f}, MB/s (real): {:15f}".format(elapsed_r, num_poses_read / elapsed_r, num_bytes_read / elapsed_r / 1e6))
+        print("done processing!")
 
-                else:
-                    # pops the minimum value and inserts the new value in the same operation
-                    popped = heap.remove_insert(pose)
-                    del popped
-            else:
-                heap.insert(pose)
+        with gzip.open(output_file_path, "w") as f:
+            for energy, file_num, offset, name, data in top_entries:
+                f.write(data)
+
+        #
+        if resume:
+            manifest = dict(previous_manifest)
+            for file_num, file_path in numbered_file_paths:
+                if file_path_to_signature[file_path] is not None:
+                    manifest[file_path] = file_path_to_signature[file_path]
+            state = {
+                "version": TOP_POSES_STATE_VERSION,
+                "params": state_params,
+                "manifest": manifest,
+                "entries": [
+                    (energy, file_paths[file_num], offset, name, data)
+                    for energy, file_num, offset, name, data in top_entries
+                ],
+            }
+            save_top_poses_state(state_file_path, state)
+
+    def run_from_outdock(self, dock_results_dir_path, outdock_regex="OUTDOCK.*", output_file_path="top_poses.mol2.gz", top_n=10000, num_workers=None, best_pose_per_molecule=False, use_outdock_cache=True):
+        """Two-phase alternative to `run`, ranking molecules by the scores in the OUTDOCK files.
+
+        First, every OUTDOCK file is parsed to find the global best `top_n` (molecule, task run)
+        pairs by total energy. Then only the mol2 files containing winners are opened, and only the
+        best pose of each winning molecule is extracted from them. Mol2 decompression therefore
+        scales with the number of hits rather than the size of the library (for mol2 files with an
+        index; others are still scanned, but only if they contain a winner).
+
+        If `use_outdock_cache` is True (default), parsed OUTDOCK files are cached next to them, which speeds up
+        re-running on the same results."""
+
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
 
-            i += 1
+        #
+        outdock_file_paths = [
+            file_path for file_path in get_to_search(dock_results_dir_path, outdock_regex)
+            if OUTDOCK_FILE_NAME_PATTERN.match(os.path.basename(file_path))
+        ]
+        print(f"{len(outdock_file_paths)} OUTDOCK files to search")
 
-        print("done processing!")
+        #
+        start_time_r = time.time()
+        with multiprocessing.Pool(processes=max(1, min(num_workers, len(outdock_file_paths)))) as pool:
+            # phase 1: rank molecules by OUTDOCK score
+            scores_lists = pool.map(
+                get_top_scores_of_outdock_file,
+                [(numbered_outdock_file_path, top_n, best_pose_per_molecule, use_outdock_cache) for numbered_outdock_file_path in enumerate(outdock_file_paths)],
+                chunksize=16,
+            )
+            winners = merge_sorted_shard_entries(scores_lists, top_n, best_pose_per_molecule=best_pose_per_molecule, name_index=2)
+            print(f"phase 1: {len(winners)} winners found across {len(outdock_file_paths)} OUTDOCK files")
+
+            # phase 2: extract the winners' poses from the mol2 files that contain them
+            file_num_to_names = {}
+            for total_energy, file_num, name in winners:
+                file_num_to_names.setdefault(file_num, []).append(name)
+            file_nums = list(file_num_to_names.keys())
+            file_num_to_name_to_record = dict(zip(
+                file_nums,
+                pool.map(
+                    get_best_pose_records_of_molecules,
+                    [(get_mol2_file_path_of_outdock_file(outdock_file_paths[file_num]), file_num_to_names[file_num]) for file_num in file_nums],
+                ),
+            ))
+            print(f"phase 2: {len(file_nums)} mol2 files opened")
+        elapsed_r = max(time.time() - start_time_r, 1e-9)
+        print("time (real): {:15f}".format(elapsed_r))
 
-        data_index = sorted(
-            [(i, heap.heap[i].total_energy) for i in range(heap.size)],
-            key=lambda m: m[1],
-        )
+        #
+        num_poses_missing = 0
         with gzip.open(output_file_path, "w") as f:
-            for idx, out_energy in data_index:
-                # gzip data can simply be concatenated together, so this works fine.
-                f.write(heap.heap[idx].buffer)
+            for total_energy, file_num, name in winners:
+                record = file_num_to_name_to_record[file_num].get(name)
+                if record is None:
+                    num_poses_missing += 1
+                    continue
+                f.write(record)
+        if num_poses_missing > 0:
+            print(f"{num_poses_missing} winners had no pose in their mol2 file")
+        print("done processing!")
@@ -155,3 +155,16 @@ def get_ordinal(n: int) -> str:
 def sort_list_by_another_list(list_to_be_sorted: list, list_to_sort_by: list) -> list:
     """Sort one list by the sort order of another list"""
     return tuple(zip(*sorted(zip(list_to_be_sorted, list_to_sort_by), key=lambda x: x[1])))[0]
+
+
+def get_cache_dir_path(*sub_dir_names: str) -> str:
+    """Get path of (and create) pydock3's cache directory, respecting $XDG_CACHE_HOME. Can be overridden by $PYDOCK3_CACHE_DIR."""
+    cache_dir_path = os.environ.get("PYDOCK3_CACHE_DIR")
+    if not cache_dir_path:
+        cache_dir_path = os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+            "pydock3",
+        )
+    cache_dir_path = os.path.join(cache_dir_path, *sub_dir_names)
+    os.makedirs(cache_dir_path, exist_ok=True)
+    return cache_dir_path
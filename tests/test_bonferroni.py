@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from pydock3.criterion.enrichment import bonferroni
+from pydock3.criterion.enrichment.bonferroni import (
+    RANDOM_DATA_DIR_PATH,
+    get_table_file_path,
+    get_table_n_actives_list,
+    read_table_file,
+    get_random_classifier_performance_arrays,
+    get_bonferroni_correction,
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYDOCK3_CACHE_DIR", str(tmp_path / "cache"))
+    bonferroni._load_packed_tables.cache_clear()
+    get_random_classifier_performance_arrays.cache_clear()
+    yield
+    bonferroni._load_packed_tables.cache_clear()
+    get_random_classifier_performance_arrays.cache_clear()
+
+
+def test_packed_tables_agree_with_table_files():
+    packed_tables = bonferroni._load_packed_tables(RANDOM_DATA_DIR_PATH)
+    assert packed_tables is not None
+
+    n_actives_list = get_table_n_actives_list()
+    assert n_actives_list == list(range(1, len(n_actives_list) + 1))
+    for n_actives in n_actives_list:
+        np.testing.assert_array_equal(bonferroni._load_table(n_actives, RANDOM_DATA_DIR_PATH), read_table_file(n_actives))
+
+
+def test_editing_table_file_invalidates_packed_tables(tmp_path):
+    tables_dir = str(tmp_path / "tables")
+    os.makedirs(tables_dir)
+    for n_actives in [1, 2]:
+        shutil.copy(get_table_file_path(n_actives), tables_dir)
+    original_table = bonferroni._load_table(2, tables_dir)
+
+    #
+    with open(get_table_file_path(2, tables_dir), "r") as f:
+        lines = f.readlines()
+    with open(get_table_file_path(2, tables_dir), "w") as f:
+        f.writelines(lines[:-1])  # drop last row
+    bonferroni._load_packed_tables.cache_clear()
+
+    edited_table = bonferroni._load_table(2, tables_dir)
+    assert edited_table.shape[0] == original_table.shape[0] - 1
+    np.testing.assert_array_equal(edited_table, read_table_file(2, tables_dir))
+
+
+def test_bonferroni_correction_is_first_row_under_threshold():
+    n_actives, n_configurations, signif_level = 20, 50, 0.01
+    table = read_table_file(n_actives)
+    expected = table[np.argmax(table[:, 4] <= signif_level / n_configurations), 0]
+
+    assert get_bonferroni_correction(n_actives, n_configurations, signif_level) == expected
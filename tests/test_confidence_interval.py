@@ -0,0 +1,58 @@
+import numpy as np
+
+from pydock3.criterion.enrichment.roc import get_default_alpha
+from pydock3.criterion.enrichment.logauc import get_normalized_log_aucs_of_ranked_booleans
+from pydock3.criterion.enrichment.confidence_interval import (
+    get_bootstrap_normalized_log_aucs,
+    get_bootstrap_confidence_interval,
+    get_jackknife_normalized_log_aucs,
+    get_confidence_interval,
+)
+
+
+def get_random_ranked_booleans(num_molecules=300, fraction_actives=0.1, seed=1):
+    return np.random.default_rng(seed).random(num_molecules) < fraction_actives
+
+
+def test_bootstrap_does_not_depend_on_chunk_size():
+    ranked_booleans = get_random_ranked_booleans()
+    normalized_log_aucs = get_bootstrap_normalized_log_aucs(ranked_booleans, num_resamples=110)
+
+    for chunk_size in [1, 25, 60, 1000]:
+        np.testing.assert_allclose(
+            get_bootstrap_normalized_log_aucs(ranked_booleans, num_resamples=110, chunk_size=chunk_size),
+            normalized_log_aucs,
+            rtol=0, atol=1e-12,
+        )
+
+
+def test_bootstrap_is_reproducible_by_default():
+    ranked_booleans = get_random_ranked_booleans()
+
+    assert get_bootstrap_confidence_interval(ranked_booleans, num_resamples=100) == get_bootstrap_confidence_interval(ranked_booleans, num_resamples=100)
+    assert get_confidence_interval(ranked_booleans, method="bootstrap", num_resamples=100) == get_bootstrap_confidence_interval(ranked_booleans, num_resamples=100)
+    assert not np.array_equal(
+        get_bootstrap_normalized_log_aucs(ranked_booleans, num_resamples=100, random_state=1),
+        get_bootstrap_normalized_log_aucs(ranked_booleans, num_resamples=100, random_state=2),
+    )
+
+
+def test_bootstrap_interval_contains_estimate():
+    ranked_booleans = get_random_ranked_booleans()
+    lower, upper = get_bootstrap_confidence_interval(ranked_booleans, num_resamples=200)
+
+    assert lower <= get_normalized_log_aucs_of_ranked_booleans(ranked_booleans)[0] <= upper
+
+
+def test_jackknife_matches_brute_force():
+    ranked_booleans = get_random_ranked_booleans(num_molecules=80, fraction_actives=0.25)
+    alpha = get_default_alpha(int(np.count_nonzero(~ranked_booleans)))
+
+    #
+    positions = np.concatenate([np.flatnonzero(ranked_booleans), np.flatnonzero(~ranked_booleans)])
+    expected = np.array([
+        get_normalized_log_aucs_of_ranked_booleans(np.delete(ranked_booleans, position), alpha=alpha)[0]
+        for position in positions
+    ])
+
+    np.testing.assert_allclose(get_jackknife_normalized_log_aucs(ranked_booleans), expected, rtol=0, atol=1e-12)
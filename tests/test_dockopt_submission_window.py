@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pydock3.dockopt.dockopt import SubmissionWindow
+
+
+def get_docking_configurations(n):
+    return [SimpleNamespace(configuration_num=str(i)) for i in range(1, n + 1)]
+
+
+def get_configuration_nums(docking_configurations):
+    return [dc.configuration_num for dc in docking_configurations]
+
+
+def test_first_refill_fills_window():
+    window = SubmissionWindow(get_docking_configurations(5), size=2)
+
+    assert get_configuration_nums(window.pop_docking_configurations_to_submit()) == ["1", "2"]
+    assert window.task_ids_in_window == {"1", "2"}
+    assert window.num_docking_configurations_awaiting_submission == 3
+
+
+def test_full_window_is_not_refilled():
+    window = SubmissionWindow(get_docking_configurations(5), size=2, min_seconds_between_refills=0)
+    window.pop_docking_configurations_to_submit()
+
+    assert window.pop_docking_configurations_to_submit() == []
+
+
+def test_released_slots_are_refilled_in_order():
+    window = SubmissionWindow(get_docking_configurations(5), size=2, min_seconds_between_refills=0)
+    window.pop_docking_configurations_to_submit()
+    window.release("2")
+
+    assert get_configuration_nums(window.pop_docking_configurations_to_submit()) == ["3"]
+    assert window.task_ids_in_window == {"1", "3"}
+
+
+def test_refills_are_throttled_unless_window_is_empty():
+    window = SubmissionWindow(get_docking_configurations(5), size=2, min_seconds_between_refills=3600)
+    window.pop_docking_configurations_to_submit()
+    window.release("1")
+
+    assert window.pop_docking_configurations_to_submit() == []
+
+    window.release("2")
+    assert get_configuration_nums(window.pop_docking_configurations_to_submit()) == ["3", "4"]
+
+
+def test_held_task_takes_slot():
+    window = SubmissionWindow(get_docking_configurations(3), size=1, min_seconds_between_refills=0)
+    window.pop_docking_configurations_to_submit()
+    window.release("1")
+    window.hold("1")  # resubmitted
+
+    assert window.pop_docking_configurations_to_submit() == []
+
+
+def test_window_drains_every_configuration_once():
+    window = SubmissionWindow(get_docking_configurations(7), size=3, min_seconds_between_refills=0)
+    submitted = []
+    while window.num_docking_configurations_awaiting_submission > 0 or window.task_ids_in_window:
+        submitted += get_configuration_nums(window.pop_docking_configurations_to_submit())
+        assert len(window.task_ids_in_window) <= 3
+        for task_id in sorted(window.task_ids_in_window)[:1]:
+            window.release(task_id)
+
+    assert submitted == [str(i) for i in range(1, 8)]
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        SubmissionWindow(get_docking_configurations(1), size=0)
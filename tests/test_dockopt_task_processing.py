@@ -0,0 +1,36 @@
+from pydock3.criterion.enrichment.logauc import NormalizedLogAUC
+from pydock3.dockopt.dockopt import process_retrodock_task_outdock_files
+
+from test_outdock_file import OUTDOCK_TEXT, write_outdock_file
+
+
+def write_decoys_outdock_file(dir_path):
+    outdock_file_path = write_outdock_file(dir_path)
+    with open(outdock_file_path, "w") as f:
+        f.write(OUTDOCK_TEXT.replace("ZINC000000000001", "ZINC000000000003").replace("ZINC000000000002", "ZINC000000000004"))
+
+    return outdock_file_path
+
+
+def test_confidence_interval_is_computed_for_task(tmp_path):
+    task_result = process_retrodock_task_outdock_files(
+        "1", write_outdock_file(str(tmp_path / "a")), write_decoys_outdock_file(str(tmp_path / "d")), NormalizedLogAUC(), confidence_interval_method="bootstrap",
+    )
+
+    assert task_result.loading_error is None
+    assert task_result.criterion_confidence_interval is not None
+
+
+def test_too_few_actives_to_resample_skips_confidence_interval(tmp_path):
+    actives_outdock_file_path = write_outdock_file(str(tmp_path / "a"))
+    with open(actives_outdock_file_path, "w") as f:
+        f.write("\n".join(line for line in OUTDOCK_TEXT.split("\n") if "ZINC000000000002" not in line))
+    task_result = process_retrodock_task_outdock_files(
+        "1", actives_outdock_file_path, write_decoys_outdock_file(str(tmp_path / "d")), NormalizedLogAUC(), confidence_interval_method="bootstrap",
+    )
+
+    assert task_result.loading_error is None
+    assert task_result.criterion_error is None
+    assert task_result.num_actives_scored == 1
+    assert task_result.criterion_value is not None
+    assert task_result.criterion_confidence_interval is None
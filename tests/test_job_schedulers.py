@@ -0,0 +1,154 @@
+import pickle
+from subprocess import CompletedProcess
+
+import xmltodict
+
+from pydock3.job_schedulers import JobScheduler, QueueSnapshot, SlurmJobScheduler, SGEJobScheduler
+
+
+SQUEUE_OUTPUT = """
+1234_1 R dockopt_step_1_actives_1
+1234_2 PD dockopt_step_1_actives_1
+1235_7 R dockopt_step_1_decoys_1
+999 R some_other_job
+"""
+
+QSTAT_XML = """<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>1234</JB_job_number>
+      <JB_name>dockopt_step_1_actives_1</JB_name>
+      <state>r</state>
+      <tasks>3</tasks>
+    </job_list>
+  </queue_info>
+  <job_info>
+    <job_list state="pending">
+      <JB_job_number>1234</JB_job_number>
+      <JB_name>dockopt_step_1_actives_1</JB_name>
+      <state>qw</state>
+      <tasks>5-9:2</tasks>
+    </job_list>
+    <job_list state="pending">
+      <JB_job_number>1240</JB_job_number>
+      <JB_name>dockopt_step_1_decoys_1</JB_name>
+      <state>qw</state>
+      <tasks>1,4-5</tasks>
+    </job_list>
+  </job_info>
+</job_info>
+"""
+
+
+def test_squeue_output_is_parsed_into_tasks_by_name_and_job_id():
+    snapshot = SlurmJobScheduler.get_queue_snapshot_from_squeue_output(SQUEUE_OUTPUT)
+
+    assert snapshot.get_scheduler_task_id("2", "dockopt_step_1_actives_1") == "1234_2"
+    assert snapshot.get_scheduler_task_id("7", "dockopt_step_1_decoys_1", job_ids=["1235"]) == "1235_7"
+    assert snapshot.get_scheduler_task_id("7", "dockopt_step_1_decoys_1", job_ids=["1234"]) is None
+    assert snapshot.get_scheduler_task_id("3", "dockopt_step_1_actives_1") is None
+    assert snapshot.has_job("some_other_job")
+    assert snapshot.has_job("", job_ids=["999"])
+    assert snapshot.is_complete
+
+
+def test_empty_squeue_output_is_empty_snapshot():
+    snapshot = SlurmJobScheduler.get_queue_snapshot_from_squeue_output("", is_complete=False)
+
+    assert not snapshot.job_names
+    assert not snapshot.is_complete
+
+
+def test_qstat_xml_is_parsed_into_running_and_pending_tasks():
+    snapshot = SGEJobScheduler.get_queue_snapshot_from_qstat_dict(xmltodict.parse(QSTAT_XML))
+
+    for task_num in [3, 5, 7, 9]:
+        assert snapshot.get_scheduler_task_id(task_num, "dockopt_step_1_actives_1") == f"1234.{task_num}"
+    assert snapshot.get_scheduler_task_id(6, "dockopt_step_1_actives_1") is None
+    for task_num in [1, 4, 5]:
+        assert snapshot.get_scheduler_task_id(task_num, "dockopt_step_1_decoys_1", job_ids=["1240"]) == f"1240.{task_num}"
+    assert snapshot.job_ids == {"1234", "1240"}
+
+
+def test_qstat_xml_of_single_job_is_parsed():
+    q_dict = xmltodict.parse(
+        "<job_info><queue_info><job_list><JB_job_number>7</JB_job_number><JB_name>j</JB_name><tasks>2</tasks></job_list></queue_info><job_info/></job_info>"
+    )
+
+    assert SGEJobScheduler.get_queue_snapshot_from_qstat_dict(q_dict).get_scheduler_task_id(2, "j") == "7.2"
+
+
+class FakeJobScheduler(JobScheduler):
+    """Job scheduler whose queue is set by the test, recording the job IDs of each query."""
+
+    def __init__(self):
+        super().__init__(name="fake")
+        self.queue_snapshot_max_age_seconds = 0
+        self.job_id_to_task_ids = {}
+        self.queried_job_ids = []
+
+    def submit(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def get_job_id_of_submission(self, proc):
+        return proc.stdout
+
+    def submit_job(self, job_id, task_ids):
+        self.job_id_to_task_ids[job_id] = task_ids
+        self._record_submissions([CompletedProcess(args=[], returncode=0, stdout=job_id, stderr="")])
+
+    def _query_queue_snapshot(self, job_ids=None):
+        self.queried_job_ids.append(None if job_ids is None else set(job_ids))
+        snapshot = QueueSnapshot(is_complete=(job_ids is None))
+        for job_id, task_ids in self.job_id_to_task_ids.items():
+            if job_ids is None or job_id in job_ids:
+                for task_id in task_ids:
+                    snapshot.add_task("job", job_id, task_id, f"{job_id}_{task_id}")
+        return snapshot
+
+    def cancel_task(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+def test_jobs_that_left_queue_are_no_longer_queried():
+    scheduler = FakeJobScheduler()
+    scheduler.submit_job("1", ["1"])
+    scheduler.submit_job("2", ["2"])
+
+    assert scheduler.task_is_on_queue("1", "job", job_ids=["1"])
+    assert scheduler.queried_job_ids[-1] == {"1", "2"}
+
+    #
+    del scheduler.job_id_to_task_ids["1"]
+    assert not scheduler.task_is_on_queue("1", "job", job_ids=["1"])
+    assert scheduler.task_is_on_queue("2", "job", job_ids=["2"])
+    assert scheduler.queried_job_ids[-1] == {"2"}
+
+    # jobs known to have left the queue do not force a query of the whole queue
+    assert not scheduler.task_is_on_queue("1", "job", job_ids=["1"])
+    assert None not in scheduler.queried_job_ids
+
+
+def test_unknown_job_ids_need_whole_queue():
+    scheduler = FakeJobScheduler()
+    scheduler.submit_job("1", ["1"])
+
+    assert not scheduler.task_is_on_queue("5", "job", job_ids=["5"])
+    assert scheduler.queried_job_ids[-1] is None
+
+
+def test_submissions_are_parsed_once(caplog):
+    scheduler = FakeJobScheduler()
+    proc = CompletedProcess(args=[], returncode=0, stdout=None, stderr="")
+    scheduler._record_submissions([proc])
+
+    assert scheduler.get_job_ids_of_submissions([proc]) == []
+    assert len([record for record in caplog.records if "Failed to parse" in record.getMessage()]) == 1
+
+
+def test_scheduler_is_picklable_after_submission():
+    scheduler = FakeJobScheduler()
+    scheduler.submit_job("1", ["1"])
+
+    assert pickle.loads(pickle.dumps(scheduler))._submitted_job_ids == {"1"}
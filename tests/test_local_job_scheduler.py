@@ -0,0 +1,87 @@
+import os
+import time
+
+from pydock3.job_schedulers import LocalJobScheduler
+
+
+def wait_until(condition, timeout_seconds=10.):
+    deadline = time.monotonic() + timeout_seconds
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+
+    return True
+
+
+def submit_sleeping_tasks(scheduler, tmp_path, task_ids):
+    script_path = str(tmp_path / "task.bash")
+    with open(script_path, "w") as f:
+        f.write('touch "$STARTED_DIR/$LOCAL_ARRAY_TASK_ID"\nsleep 60\n')
+    started_dir_path = str(tmp_path / "started")
+    os.makedirs(started_dir_path)
+    scheduler.submit("job", script_path, {"STARTED_DIR": started_dir_path}, str(tmp_path), task_ids)
+
+    return started_dir_path
+
+
+def test_cancel_pending_task_removes_it_without_running_it(tmp_path):
+    scheduler = LocalJobScheduler(num_slots=1)
+    started_dir_path = submit_sleeping_tasks(scheduler, tmp_path, ["1", "2"])
+    assert wait_until(lambda: os.path.exists(os.path.join(started_dir_path, "1")))
+
+    assert scheduler.cancel_task("2", "job") is not None
+    assert not scheduler.task_is_on_queue("2", "job")
+    assert scheduler.task_is_on_queue("1", "job")
+
+    scheduler.shutdown(cancel_tasks=True)
+    assert not os.path.exists(os.path.join(started_dir_path, "2"))
+    assert not scheduler.job_is_on_queue("job")
+
+
+def test_cancel_running_task_kills_it(tmp_path):
+    scheduler = LocalJobScheduler(num_slots=2)
+    started_dir_path = submit_sleeping_tasks(scheduler, tmp_path, ["1"])
+    assert wait_until(lambda: os.path.exists(os.path.join(started_dir_path, "1")))
+
+    assert scheduler.cancel_task("1", "job") is not None
+    assert wait_until(lambda: not scheduler.task_is_on_queue("1", "job"))
+    assert scheduler.cancel_task("1", "job") is None
+
+    scheduler.shutdown()
+
+
+def test_max_tasks_running_at_a_time_limits_tasks_of_submission(tmp_path):
+    script_path = str(tmp_path / "task.bash")
+    with open(script_path, "w") as f:
+        f.write('date +%s.%N > "$TIMES_DIR/$LOCAL_ARRAY_TASK_ID"\nsleep 0.3\ndate +%s.%N >> "$TIMES_DIR/$LOCAL_ARRAY_TASK_ID"\n')
+    times_dir_path = str(tmp_path / "times")
+    os.makedirs(times_dir_path)
+    scheduler = LocalJobScheduler(num_slots=4)
+    scheduler.submit("job", script_path, {"TIMES_DIR": times_dir_path}, str(tmp_path), ["1", "2", "3", "4"], max_tasks_running_at_a_time=2)
+    scheduler.shutdown()
+
+    #
+    intervals = []
+    for task_id in ["1", "2", "3", "4"]:
+        with open(os.path.join(times_dir_path, task_id)) as f:
+            intervals.append(tuple(float(line) for line in f))
+    for start, _ in intervals:
+        assert sum(1 for other_start, other_end in intervals if other_start <= start < other_end) <= 2
+
+
+def test_cancel_task_awaiting_start_of_limited_submission(tmp_path):
+    scheduler = LocalJobScheduler(num_slots=4)
+    script_path = str(tmp_path / "task.bash")
+    with open(script_path, "w") as f:
+        f.write('touch "$STARTED_DIR/$LOCAL_ARRAY_TASK_ID"\nsleep 0.3\n')
+    started_dir_path = str(tmp_path / "started")
+    os.makedirs(started_dir_path)
+    scheduler.submit("job", script_path, {"STARTED_DIR": started_dir_path}, str(tmp_path), ["1", "2", "3"], max_tasks_running_at_a_time=1)
+
+    assert scheduler.cancel_task("2", "job") is not None
+    assert not scheduler.task_is_on_queue("2", "job")
+
+    scheduler.shutdown()
+    assert sorted(os.listdir(started_dir_path)) == ["1", "3"]
+    assert not scheduler.job_is_on_queue("job")
@@ -0,0 +1,48 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from pydock3.criterion.enrichment.logauc import NormalizedLogAUC, TieAwareNormalizedLogAUC, get_normalized_log_aucs, get_normalized_log_aucs_of_ranked_booleans, get_tie_aware_normalized_log_aucs
+
+
+def get_brute_force_tie_aware_normalized_log_auc(energies, is_active):
+    """Mean normalized LogAUC over every order in which molecules with equal energy can be ranked."""
+
+    energies = np.asarray(energies, dtype=np.float64)
+    is_active = np.asarray(is_active, dtype=bool)
+    orders = np.array(list(permutations(range(is_active.size))))
+    ranked_booleans = np.array([is_active[order][np.argsort(energies[order], kind="stable")] for order in orders])
+
+    return get_normalized_log_aucs_of_ranked_booleans(ranked_booleans).mean()
+
+
+def test_tie_aware_normalized_log_auc_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        is_active = np.zeros(7, dtype=bool)
+        is_active[rng.choice(7, size=rng.integers(1, 6), replace=False)] = True
+        energies = rng.integers(0, 3, size=7).astype(np.float64)
+        energies[rng.random(7) < 0.2] = np.nan
+
+        np.testing.assert_allclose(
+            get_tie_aware_normalized_log_aucs(energies, is_active)[0],
+            get_brute_force_tie_aware_normalized_log_auc(energies, is_active),
+            rtol=0, atol=1e-12,
+        )
+
+
+def test_tie_aware_normalized_log_auc_equals_normalized_log_auc_without_ties():
+    rng = np.random.default_rng(1)
+    energies = rng.permutation(50).astype(np.float64).reshape(2, 25)
+    is_active = np.arange(25) % 4 == 0
+
+    np.testing.assert_allclose(get_tie_aware_normalized_log_aucs(energies, is_active), get_normalized_log_aucs(energies, is_active), rtol=0, atol=1e-12)
+
+
+def test_tie_aware_criterion_takes_booleans_like_other_criteria():
+    booleans = [True, False, True, False, False, True, False]
+    energies = [-9., -8., -8., -7., -7., -7., -6.]
+
+    assert TieAwareNormalizedLogAUC().calculate(booleans) == NormalizedLogAUC().calculate(booleans)
+    assert TieAwareNormalizedLogAUC().calculate(booleans, energies=energies) == pytest.approx(get_tie_aware_normalized_log_aucs(energies, booleans)[0])
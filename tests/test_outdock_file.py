@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+
+from pydock3.files import OutdockFile, load_outdock_scores_dataframe
+
+
+HEADER_LINE = "  mol#           id_num     flexiblecode  matched    nscored  time hac    setnum    matnum   rank charge    elect +  gist +   vdW   + psol +  asol + tStrain + mStrain + rec_d + r_hyd =    Total"
+
+OUTDOCK_TEXT = "\n".join([
+    "open the file: /ligands/a.db2.gz",
+    HEADER_LINE,
+    "     1      ZINC000000000001      1    100     10   0.5   20      1      1      1   0.00   -1.00   0.00  -20.00   1.00   0.50   0.00   0.00   0.00   0.00   -19.50",
+    "     2      ZINC000000000002      1    100     10   0.5   20      1      1      1   0.00   -2.00   0.00  -10.00   1.00   0.50   0.00   0.00   0.00   0.00   -10.50",
+    "close the file: /ligands/a.db2.gz",
+    "elapsed time (sec): 1.0",
+    "",
+])
+
+
+def write_outdock_file(dir_path):
+    os.makedirs(dir_path, exist_ok=True)
+    outdock_file_path = os.path.join(dir_path, "OUTDOCK.0")
+    with open(outdock_file_path, "w") as f:
+        f.write(OUTDOCK_TEXT)
+
+    return outdock_file_path
+
+
+def test_cached_dataframe_is_stored_next_to_outdock_and_matches_parse(tmp_path):
+    outdock_file_path = write_outdock_file(str(tmp_path / "1"))
+    outdock_file = OutdockFile(outdock_file_path)
+    df = outdock_file.get_dataframe()
+
+    assert os.path.dirname(os.path.dirname(outdock_file.cache_file_path)) == str(tmp_path / "1")
+    assert os.path.isfile(outdock_file.cache_file_path)
+    assert [file_name for file_name in os.listdir(str(tmp_path / "1")) if "OUTDOCK" in file_name] == ["OUTDOCK.0"]  # rundock.bash counts these
+    pd.testing.assert_frame_equal(outdock_file.load_cached_dataframe(), df)
+    pd.testing.assert_frame_equal(outdock_file.get_dataframe(), outdock_file.parse_dataframe())
+    assert list(load_outdock_scores_dataframe(outdock_file_path)["Total"]) == [-19.5, -10.5]
+
+
+def test_stale_cached_dataframe_is_not_used(tmp_path):
+    outdock_file_path = write_outdock_file(str(tmp_path / "1"))
+    outdock_file = OutdockFile(outdock_file_path)
+    outdock_file.get_dataframe()
+
+    #
+    with open(outdock_file_path, "w") as f:
+        f.write(OUTDOCK_TEXT.replace("-19.50", "-119.50"))
+
+    assert outdock_file.load_cached_dataframe() is None
+    assert list(outdock_file.get_dataframe()["Total"]) == [-119.5, -10.5]
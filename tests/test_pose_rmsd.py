@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from pydock3.criterion.pose import rmsd
+from pydock3.criterion.pose.rmsd import NegativePoseRMSD, get_pose_rmsds, get_pose_rmsds_of_mol2_file
+
+
+REFERENCE_ATOMS = [("C1", "C", 0., 0., 0.), ("C2", "C", 1.5, 0., 0.), ("O1", "O", 2.2, 1.1, 0.), ("O2", "O", 2.2, -1.1, 0.)]
+
+
+def write_reference_ligand_file(file_path):
+    with open(file_path, "w") as f:
+        for i, (atom_name, element, x, y, z) in enumerate(REFERENCE_ATOMS, 1):
+            f.write(f"HETATM{i:5d} {atom_name:<4s} LIG A   1    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00          {element:>2s}\n")
+        f.write("END\n")
+
+
+def get_mol2_block_str(molecule_name, atoms):
+    lines = ["@<TRIPOS>MOLECULE", molecule_name, f" {len(atoms)} 0 0 0 0", "SMALL", "USER_CHARGES", "", "@<TRIPOS>ATOM"]
+    for i, (atom_name, atom_type, x, y, z) in enumerate(atoms, 1):
+        lines.append(f"{i:7d} {atom_name:<8s}{x:10.4f}{y:10.4f}{z:10.4f} {atom_type:<5s}    1 LIG      0.0000")
+
+    return "\n".join(lines) + "\n"
+
+
+def test_swapped_symmetric_atoms_only_count_when_matched_by_name(tmp_path):
+    reference_ligand_file_path = str(tmp_path / "xtal-lig.pdb")
+    write_reference_ligand_file(reference_ligand_file_path)
+    mol2_file_path = str(tmp_path / "test.mol2")
+    with open(mol2_file_path, "w") as f:
+        # carboxylate oxygens named the other way round, with a hydrogen that is ignored
+        f.write(get_mol2_block_str("ZINC1", [("C1", "C.3", 0., 0., 0.), ("C2", "C.2", 1.5, 0., 0.), ("O1", "O.co2", 2.2, -1.1, 0.), ("O2", "O.co2", 2.2, 1.1, 0.), ("H1", "H", -1., 0., 0.)]))
+        f.write(get_mol2_block_str("ZINC1", [("C1", "C.3", 1., 0., 0.), ("C2", "C.2", 2.5, 0., 0.), ("O1", "O.co2", 3.2, 1.1, 0.), ("O2", "O.co2", 3.2, -1.1, 0.), ("H1", "H", 0., 0., 0.)]))
+
+    assert get_pose_rmsds_of_mol2_file(mol2_file_path, reference_ligand_file_path) == {"ZINC1": 0.}
+    assert get_pose_rmsds_of_mol2_file(mol2_file_path, reference_ligand_file_path, match_atoms_by="name") == {"ZINC1": pytest.approx(1.)}
+    assert NegativePoseRMSD().calculate(mol2_file_path, reference_ligand_file_path) == 0.
+
+
+def get_random_poses(num_poses=30, seed=0):
+    rng = np.random.default_rng(seed)
+    atom_names = np.array([f"C{i}" for i in range(1, 9)] + ["N1", "N2", "O1", "O2", "O3", "S1"])
+    elements = np.array([atom_name.rstrip("0123456789") for atom_name in atom_names])
+    reference_coords = rng.uniform(0., 6., size=(atom_names.size, 3))
+    pose_coords = reference_coords + rng.normal(0., 0.8, size=(num_poses, atom_names.size, 3))
+
+    return pose_coords, atom_names, elements, reference_coords
+
+
+def test_element_matched_rmsd_does_not_depend_on_atom_order():
+    pose_coords, atom_names, elements, reference_coords = get_random_poses()
+    rmsds = get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements)
+
+    order = np.random.default_rng(1).permutation(atom_names.size)
+    for match_atoms_by in ["element", "name"]:
+        np.testing.assert_allclose(
+            get_pose_rmsds(pose_coords[:, order], atom_names[order], elements[order], reference_coords, atom_names, elements, match_atoms_by=match_atoms_by),
+            get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements, match_atoms_by=match_atoms_by),
+        )
+
+    # renaming the atoms of an element does not matter either
+    renamed_atom_names = atom_names.copy()
+    renamed_atom_names[:8] = renamed_atom_names[:8][::-1]
+    np.testing.assert_allclose(get_pose_rmsds(pose_coords, renamed_atom_names, elements, reference_coords, atom_names, elements), rmsds)
+
+
+def test_element_matched_rmsd_is_at_most_name_matched_rmsd():
+    pose_coords, atom_names, elements, reference_coords = get_random_poses()
+    element_matched_rmsds = get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements)
+    name_matched_rmsds = get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements, match_atoms_by="name")
+
+    assert np.all(element_matched_rmsds <= name_matched_rmsds + 1e-12)
+    assert np.any(element_matched_rmsds < name_matched_rmsds)
+
+
+def test_matching_by_enumeration_agrees_with_hungarian_algorithm(monkeypatch):
+    pose_coords, atom_names, elements, reference_coords = get_random_poses()
+    rmsds = get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements)
+    monkeypatch.setattr(rmsd, "MAX_NUM_ATOMS_TO_MATCH_BY_ENUMERATION", 0)
+
+    np.testing.assert_allclose(get_pose_rmsds(pose_coords, atom_names, elements, reference_coords, atom_names, elements), rmsds)
+
+
+def test_poses_with_other_atoms_are_nan():
+    pose_coords, atom_names, elements, reference_coords = get_random_poses(num_poses=2)
+    other_elements = elements.copy()
+    other_elements[0] = "N"
+
+    assert np.all(np.isnan(get_pose_rmsds(pose_coords, atom_names, other_elements, reference_coords, atom_names, elements)))
@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import pytest
+
+from pydock3.files import Dir
+from pydock3.jobs import ArrayDockingJob, OUTDOCK_FILE_NAME
+from pydock3.task_completion_watcher import TaskCompletionWatcher, publish_done_marker
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "scan"])
+def use_inotify(request):
+    return request.param
+
+
+def test_detects_markers_published_before_and_after_watch(tmp_path, use_inotify):
+    done_markers_dir_path = str(tmp_path / "done")
+    publish_done_marker(done_markers_dir_path, "1")
+    watcher = TaskCompletionWatcher(done_markers_dir_path, min_seconds_between_scans=0, use_inotify=use_inotify)
+
+    assert watcher.task_is_complete("1")
+    assert not watcher.task_is_complete("2")
+
+    publish_done_marker(done_markers_dir_path, "2")
+    assert watcher.poll() == ["2"]
+    assert watcher.task_is_complete("2")
+    watcher.close()
+
+
+def test_ignores_temp_files_of_markers_being_published(tmp_path, use_inotify):
+    done_markers_dir_path = str(tmp_path / "done")
+    watcher = TaskCompletionWatcher(done_markers_dir_path, min_seconds_between_scans=0, use_inotify=use_inotify)
+    with open(os.path.join(done_markers_dir_path, ".3.tmp"), "w"):
+        pass
+
+    assert watcher.poll(force_scan=True) == []
+    watcher.close()
+
+
+def test_forgotten_task_is_incomplete_until_marker_is_republished(tmp_path, use_inotify):
+    done_markers_dir_path = str(tmp_path / "done")
+    publish_done_marker(done_markers_dir_path, "1")
+    watcher = TaskCompletionWatcher(done_markers_dir_path, min_seconds_between_scans=0, use_inotify=use_inotify)
+    watcher.forget_task("1")
+
+    assert not watcher.task_is_complete("1", force_scan=True)
+
+    publish_done_marker(done_markers_dir_path, "1")
+    assert watcher.task_is_complete("1")
+    watcher.close()
+
+
+def test_array_docking_job_is_picklable_with_watcher(tmp_path):
+    configurations_file_path = str(tmp_path / "configurations.txt")
+    with open(configurations_file_path, "w") as f:
+        f.write("1 a\n2 b\n")
+    job = ArrayDockingJob(
+        name="job",
+        job_dir=Dir(str(tmp_path / "job"), create=True),
+        input_molecules_dir_path=str(tmp_path),
+        job_scheduler=None,
+        temp_storage_path=str(tmp_path),
+        array_job_docking_configurations_file_path=configurations_file_path,
+    )
+    with open(os.path.join(job.job_dir.path, "1", OUTDOCK_FILE_NAME), "w"):
+        pass  # completed before done markers existed
+
+    assert job.task_is_complete("1")
+    assert not job.task_is_complete("2")
+
+    unpickled_job = pickle.loads(pickle.dumps(job))
+    assert unpickled_job.task_is_complete("1")
+    job.close()
+    unpickled_job.close()
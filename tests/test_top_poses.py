@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from pydock3.top_poses import BoundedPoseHeap, is_mol2_sidecar_file_path, merge_sorted_shard_entries
+
+
+def test_merge_returns_best_entries_across_shards():
+    shard_entries_lists = [
+        [(-10., 0, 0, "a", b""), (-5., 0, 1, "b", b"")],
+        [(-8., 1, 0, "c", b""), (-1., 1, 1, "d", b"")],
+    ]
+
+    assert [entry[3] for entry in merge_sorted_shard_entries(shard_entries_lists, top_n=3)] == ["a", "c", "b"]
+
+
+def test_merge_keeps_duplicate_molecules_by_default():
+    shard_entries_lists = [
+        [(-10., 0, 0, "a", b""), (-9., 0, 1, "a", b"")],
+        [(-8., 1, 0, "b", b"")],
+    ]
+
+    assert [entry[3] for entry in merge_sorted_shard_entries(shard_entries_lists, top_n=2)] == ["a", "a"]
+
+
+def test_merge_drops_duplicate_molecules_before_top_n_cut():
+    shard_entries_lists = [
+        [(-10., 0, 0, "a", b""), (-9., 0, 1, "b", b""), (-2., 0, 2, "d", b"")],
+        [(-9.5, 1, 0, "a", b""), (-8., 1, 1, "b", b""), (-3., 1, 2, "c", b"")],
+    ]
+    top_entries = merge_sorted_shard_entries(shard_entries_lists, top_n=3, best_pose_per_molecule=True)
+
+    assert [(entry[0], entry[3]) for entry in top_entries] == [(-10., "a"), (-9., "b"), (-3., "c")]
+
+
+def test_merge_of_outdock_scores_deduplicates_by_name_index():
+    scores_lists = [
+        [(-10., 0, "a"), (-9., 0, "a"), (-1., 0, "c")],
+        [(-9.5, 1, "a"), (-4., 1, "b")],
+    ]
+    winners = merge_sorted_shard_entries(scores_lists, top_n=3, best_pose_per_molecule=True, name_index=2)
+
+    assert winners == [(-10., 0, "a"), (-4., 1, "b"), (-1., 0, "c")]
+
+
+def test_heap_shards_merged_match_brute_force():
+    rng = random.Random(0)
+    poses = [(rng.uniform(-50., 0.), file_num, offset, f"mol{rng.randrange(40)}") for file_num in range(6) for offset in range(50)]
+    top_n = 15
+
+    #
+    shard_entries_lists = []
+    for shard_index in range(3):
+        heap = BoundedPoseHeap(max_size=top_n, best_pose_per_molecule=True)
+        for energy, file_num, offset, name in poses:
+            if file_num % 3 == shard_index:
+                heap.push(energy, file_num, offset, name, b"")
+        shard_entries_lists.append(heap.get_sorted_entries())
+    top_entries = merge_sorted_shard_entries(shard_entries_lists, top_n, best_pose_per_molecule=True)
+
+    #
+    name_to_best_pose = {}
+    for pose in sorted(poses):
+        name_to_best_pose.setdefault(pose[3], pose)
+    expected = sorted(name_to_best_pose.values())[:top_n]
+
+    assert [entry[:4] for entry in top_entries] == expected
+
+
+def test_pose_indexes_and_their_temp_files_are_not_mol2_files():
+    assert not is_mol2_sidecar_file_path("1/test.mol2.gz.0")
+    assert is_mol2_sidecar_file_path("1/test.mol2.gz.0.index")
+    assert is_mol2_sidecar_file_path("1/test.mol2.gz.0.index.0123456789abcdef.tmp")
+
+
+def test_heap_must_retain_at_least_one_pose():
+    with pytest.raises(ValueError):
+        BoundedPoseHeap(max_size=0)